@@ -1,7 +1,9 @@
 from typing import Dict, Any, Optional, Tuple, List, cast
 from sqlalchemy.orm import Session
 import logging
+from datetime import datetime, timezone
 import numpy as np
+from ...core.analytics.rolling import best_mean_curve
 from ...db.models import TbActivity, TbAthlete
 from ...repositories.power_records_repo import (
     update_best_powers as repo_update_best_powers,
@@ -9,6 +11,8 @@ from ...repositories.power_records_repo import (
     update_max_elevation_gain as repo_update_max_elevation_gain,
 )
 from ...repositories.best_power_file_repo import update_with_activity_curve as repo_update_best_power_file
+from ...repositories.activity_best_power_repo import save_activity_best_powers as repo_save_activity_best_powers
+from ...repositories.activity_curve_repo import upsert_activity_curve as repo_upsert_activity_curve
 from ...schemas.activities import SegmentRecord
 
 logger = logging.getLogger(__name__)
@@ -24,6 +28,19 @@ def _get_activity_athlete_by_external_id(db: Session, external_id: int) -> Optio
     return activity, athlete
 
 
+def _activity_start_date(activity_data: Dict[str, Any], activity_obj: Optional[TbActivity]) -> Optional[datetime]:
+    """活动开始时间（带 UTC 时区）：Strava start_date 为 UTC；回退的 tb_activity.start_date 对 Strava 活动同样按 UTC 存储。"""
+    raw = activity_data.get('start_date')
+    if raw:
+        try:
+            parsed = datetime.fromisoformat(str(raw).replace('Z', '+00:00'))
+            return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    stored = getattr(activity_obj, 'start_date', None)
+    return stored.replace(tzinfo=timezone.utc) if stored is not None else None
+
+
 def _best_avg_over_window(vals: List[int], window: int) -> int:
     if not vals or len(vals) < window:
         return 0
@@ -37,26 +54,10 @@ def _best_avg_over_window(vals: List[int], window: int) -> int:
 
 
 def _best_power_curve(vals: List[int]) -> List[int]:
-    """计算 1..N 每个窗口长度下的最佳平均功率曲线。
-
-    备注：
-        - 旧实现使用两层 Python 循环，复杂度 O(n^2) 且运行在解释器里，数据量稍大就会卡顿。
-        - 这里改用 numpy 前缀和，将「长度为 w 的窗口和」改写为向量化减法，
-          每个窗口长度仍需 O(n) 次运算，但都在 C 层完成，显著降低 Python 端开销。
-    """
+    """计算 1..N 每个窗口长度下的最佳平均功率曲线（前缀和内核见 core/analytics/rolling.py）。"""
     if not vals:
         return []
-
-    arr = np.asarray(vals, dtype=np.float64)
-    n = arr.size
-    prefix = np.concatenate(([0.0], arr.cumsum()))
-    best = np.empty(n, dtype=np.int32)
-
-    for window in range(1, n + 1):
-        window_sums = prefix[window:] - prefix[:-window]
-        best[window - 1] = int(round(window_sums.max() / window))
-
-    return best.tolist()
+    return np.rint(best_mean_curve(vals)).astype(np.int32).tolist()
 
 
 def analyze_best_powers(
@@ -136,6 +137,7 @@ def analyze_best_powers(
 
             dist_m = int(activity_data.get('distance') or 0)
             elev_gain = int(activity_data.get('total_elevation_gain') or 0)
+            repo_save_activity_best_powers(db, athlete_id, activity_id, best_powers, dist_m, elev_gain)
 
             if dist_m > 0:
                 try:
@@ -157,6 +159,10 @@ def analyze_best_powers(
                     repo_update_best_power_file(athlete_id, best_curve)
                 except Exception:
                     pass
+                try:
+                    repo_upsert_activity_curve(athlete_id, activity_id, _activity_start_date(activity_data, activity_obj), best_curve)
+                except Exception:
+                    logger.exception("[activity-curve][write-error] activity_id=%s", activity_id)
 
         return best_powers, segment_records or None
     except Exception:
@@ -5,128 +5,59 @@ Strava 流数据抽取模块
 - 将 Strava API 返回的流（key_by_type=true）转换为内部统一格式；
 - 支持将 velocity_smooth 转换为 speed（KM/H）；
 - 支持生成 best_power 曲线（时间窗最大均值）；
-- 为缺失的衍生指标（VAM、torque、spi、power_hr_ratio、w_balance）补齐数据。
+- 为缺失的衍生指标（VAM、torque、spi、power_hr_ratio、w_balance，跑步另有 gap）补齐数据。
 
 返回格式约定：
     [{ 'type': 字段名, 'data': 列表, 'series_type': 'time'|'distance', 'original_size': N, 'resolution': 'high' }]
 """
 
 from typing import Dict, Any, List, Optional
-import math
 import logging
 import numpy as np
 
+from ...core.analytics.derived import derive_streams
+from ...core.analytics.rolling import as_array, best_mean_curve
+from ...core.analytics.wbal import tau_model_for
+
 logger = logging.getLogger(__name__)
 
 
 def _best_power_curve(vals: List[int]) -> List[int]:
-    """计算 1..N 每个窗口长度下的最佳平均功率曲线。
-
-    备注：
-        - 旧实现使用两层 Python 循环，复杂度 O(n^2) 且运行在解释器里，数据量稍大就会卡顿。
-        - 这里改用 numpy 前缀和，将「长度为 w 的窗口和」改写为向量化减法，
-          每个窗口长度仍需 O(n) 次运算，但都在 C 层完成，显著降低 Python 端开销。
-    """
+    """计算 1..N 每个窗口长度下的最佳平均功率曲线（前缀和内核见 core/analytics/rolling.py）。"""
     if not vals:
         return []
+    return np.rint(best_mean_curve(vals)).astype(np.int32).tolist()
 
-    arr = np.asarray(vals, dtype=np.float64)
-    n = arr.size
-    prefix = np.concatenate(([0.0], arr.cumsum()))
-    best = np.empty(n, dtype=np.int32)
-
-    for window in range(1, n + 1):
-        window_sums = prefix[window:] - prefix[:-window]
-        best[window - 1] = int(round(window_sums.max() / window))
-
-    return best.tolist()
-
-
-def _calculate_power_hr_ratio(powers: List[Optional[int]], heart_rates: List[Optional[int]]) -> List[float]:
-    result: List[float] = []
-    size = min(len(powers), len(heart_rates))
-    for idx in range(size):
-        p = powers[idx] or 0
-        hr = heart_rates[idx] or 0
-        ratio = round(p / hr, 2) if p > 0 and hr > 0 else 0.0
-        result.append(ratio)
-    return result
 
+# 衍生流计算所需的源通道：frame 键 -> Strava 流键（按顺序取第一个存在的）
+_FRAME_SOURCES = {
+    'time': ('time',),
+    'altitude': ('altitude', 'altitude_smooth'),
+    'power': ('watts', 'power'),
+    'heart_rate': ('heartrate',),
+    'cadence': ('cadence',),
+    'speed': ('velocity_smooth',),
+    'distance': ('distance',),
+}
 
-def _calculate_spi(powers: List[Optional[int]], cadence: List[Optional[int]]) -> List[float]:
-    result: List[float] = []
-    size = min(len(powers), len(cadence))
-    for idx in range(size):
-        p = powers[idx] or 0
-        cad = cadence[idx] or 0
-        spi = round(p / cad, 2) if p > 0 and cad > 0 else 0.0
-        result.append(spi)
-    return result
 
-
-def _calculate_torque(powers: List[Optional[int]], cadence: List[Optional[int]]) -> List[int]:
-    result: List[int] = []
-    size = min(len(powers), len(cadence))
-    for idx in range(size):
-        p = powers[idx] or 0
-        cad = cadence[idx] or 0
-        if p > 0 and cad > 0:
-            torque = p / (cad * 2 * math.pi / 60.0)
-            result.append(int(round(torque)))
-        else:
-            result.append(0)
-    return result
-
-
-def _calculate_vam(timestamps: List[Optional[int]], altitudes: List[Optional[float]], window_seconds: int = 50) -> List[int]:
-    if not timestamps or not altitudes:
-        return []
-    size = min(len(timestamps), len(altitudes))
-    vam: List[int] = []
-    for i in range(size):
-        try:
-            t_end = timestamps[i] or 0
-            t_start = t_end - window_seconds
-            idx_start = i
-            while idx_start > 0 and (timestamps[idx_start] or 0) > t_start:
-                idx_start -= 1
-            if idx_start == i:
-                vam.append(0)
-                continue
-            delta_alt = (altitudes[i] or 0.0) - (altitudes[idx_start] or 0.0)
-            delta_time = (timestamps[i] or 0) - (timestamps[idx_start] or 0)
-            if delta_time <= 0:
-                vam.append(0)
-                continue
-            vam_value = delta_alt / (delta_time / 3600.0)
-            vam.append(int(round(vam_value * 1.4)))
-        except Exception:
-            vam.append(0)
-    return [v if -5000 <= v <= 5000 else 0 for v in vam]
+def _stream_frame(stream_data: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """将 Strava 流一次性规整为 float64 数组（None 按 0 处理）；缺失的通道为空数组。"""
+    frame: Dict[str, np.ndarray] = {}
+    for name, sources in _FRAME_SOURCES.items():
+        data: Any = []
+        for key in sources:
+            item = stream_data.get(key)
+            if isinstance(item, dict) and item.get('data'):
+                data = item['data']
+                break
+        frame[name] = as_array(data)
+    return frame
 
 
-def _calculate_w_balance(
-    powers: List[Optional[int]],
-    ftp: Optional[int],
-    w_prime: Optional[int],
-) -> List[float]:
-    if not powers:
-        return []
-    if not ftp or ftp <= 0 or not w_prime or w_prime <= 0:
-        return [0.0] * len(powers)
-    balance = float(w_prime)
-    series: List[float] = []
-    tau = 546.0
-    cp = float(ftp)
-    for p in powers:
-        power_val = float(p or 0)
-        if power_val > cp * 1.05:
-            balance -= (power_val - cp)
-        elif power_val < cp * 0.95:
-            balance += (w_prime - balance) / tau
-        balance = max(0.0, min(float(w_prime), balance))
-        series.append(round(balance / 1000.0, 1))
-    return series
+def _is_running(activity_data: Optional[Dict[str, Any]]) -> bool:
+    sport_type = (activity_data or {}).get('sport_type') or ''
+    return sport_type.lower() in ['run', 'trail_run', 'virtual_run']
 
 
 def enrich_with_derived_streams(
@@ -134,68 +65,45 @@ def enrich_with_derived_streams(
     activity_data: Optional[Dict[str, Any]] = None,
     athlete_entry: Optional[Any] = None,
 ) -> Dict[str, Any]:
+    """补齐缺失的衍生流（与 FIT 解析共用 core/analytics/derived.py 的内核）。"""
     if not isinstance(stream_data, dict):
         return stream_data
 
     # 防止原数据被意外修改，浅拷贝一份字典引用
     enriched = dict(stream_data)
-
-    time_stream = enriched.get('time', {})
-    altitude_stream = enriched.get('altitude') or enriched.get('altitude_smooth')
-    power_stream = enriched.get('watts') or enriched.get('power')
-    heartrate_stream = enriched.get('heartrate')
-    cadence_stream = enriched.get('cadence')
-
-    time_data = list(time_stream.get('data', [])) if isinstance(time_stream, dict) else []
-    altitude_data = list(altitude_stream.get('data', [])) if isinstance(altitude_stream, dict) else []
-    power_data = [int(p) if p is not None else 0 for p in (power_stream.get('data', []) if isinstance(power_stream, dict) else [])]
-    heartrate_data = [int(h) if h is not None else 0 for h in (heartrate_stream.get('data', []) if isinstance(heartrate_stream, dict) else [])]
-    cadence_data = [int(c) if c is not None else 0 for c in (cadence_stream.get('data', []) if isinstance(cadence_stream, dict) else [])]
-
-    if 'power_hr_ratio' not in enriched and power_data and heartrate_data:
-        arr = _calculate_power_hr_ratio(power_data, heartrate_data)
-        if arr:
-            enriched['power_hr_ratio'] = {
-                'data': arr,
-                'series_type': 'time',
-                'original_size': len(arr),
-                'resolution': 'high',
-            }
-
-    if 'spi' not in enriched and power_data and cadence_data:
-        arr = _calculate_spi(power_data, cadence_data)
-        if arr:
-            enriched['spi'] = {
-                'data': arr,
-                'series_type': 'time',
-                'original_size': len(arr),
-                'resolution': 'high',
-            }
-
-    if 'torque' not in enriched and power_data and cadence_data:
-        arr = _calculate_torque(power_data, cadence_data)
-        if arr:
-            enriched['torque'] = {
-                'data': arr,
-                'series_type': 'time',
-                'original_size': len(arr),
-                'resolution': 'high',
-            }
-
-    if 'vam' not in enriched and time_data and altitude_data:
-        arr = _calculate_vam(time_data, altitude_data)
-        if arr:
-            enriched['vam'] = {
-                'data': arr,
-                'series_type': 'time',
-                'original_size': len(arr),
-                'resolution': 'high',
-            }
-
-    if 'w_balance' not in enriched and power_data:
-        arr = _calculate_w_balance(power_data, athlete_entry.ftp, athlete_entry.w_balance)
+    frame = _stream_frame(enriched)
+
+    # 各衍生流的输入通道：任一为空时不生成
+    requirements = {
+        'power_hr_ratio': ('power', 'heart_rate'),
+        'spi': ('power', 'cadence'),
+        'torque': ('power', 'cadence'),
+        'vam': ('time', 'altitude'),
+        'w_balance': ('power',),
+        'gap': ('speed', 'altitude', 'distance'),
+    }
+    # 坡度调整配速只用于跑步图表
+    if not _is_running(activity_data):
+        requirements.pop('gap')
+    missing = [
+        name for name, inputs in requirements.items()
+        if name not in enriched and all(frame[key].size for key in inputs)
+    ]
+    if not missing:
+        return enriched
+
+    athlete_info = {
+        'ftp': getattr(athlete_entry, 'ftp', None),
+        'wj': getattr(athlete_entry, 'w_balance', None),
+        'tau_model': tau_model_for(getattr(athlete_entry, 'id', None)),
+    }
+    derived = derive_streams(
+        frame['time'], frame['altitude'], frame['power'], frame['heart_rate'], frame['cadence'],
+        athlete_info, missing, speed=frame['speed'], distance=frame['distance'],
+    )
+    for name, arr in derived.items():
         if arr:
-            enriched['w_balance'] = {
+            enriched[name] = {
                 'data': arr,
                 'series_type': 'time',
                 'original_size': len(arr),
@@ -210,10 +118,7 @@ def extract_stream_data(stream_data: Dict[str, Any], keys: List[str], resolution
     result: List[Dict[str, Any]] = []
     
     # 判断是否为跑步活动
-    is_running = False
-    if activity_data:
-        sport_type = activity_data.get('sport_type', '').lower()
-        is_running = sport_type in ['run', 'trail_run', 'virtual_run']
+    is_running = _is_running(activity_data)
     
     try:
         for field in keys:
@@ -1,15 +1,26 @@
 """Strava 分项分析（整体/功率/心率/速度/海拔/温度/区间/训练效果）。"""
 from typing import Dict, Any, Optional, List, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
 from ...core.analytics.time_utils import format_time as _fmt
-from ...core.analytics.power import normalized_power as _np, work_above_ftp as _work_above_ftp, w_balance_decline as _w_decline
+from ...core.analytics.power import work_above_ftp as _work_above_ftp, w_balance_decline as _w_decline
+from ...core.analytics.context import AnalysisContext
 from ...core.analytics.hr import (
-    recovery_rate as _hr_recovery,
-    efficiency_index as _efficiency_index,
+    masked_recovery_rate as _hr_recovery,
+    masked_efficiency_index as _efficiency_index,
     hr_lag_seconds as _hr_lag,
-    decoupling_rate as _decouple
+    hr_lag_profile as _hr_lag_profile,
+    masked_decoupling_rate as _decouple
+)
+from ...config import ELEVATION_HYSTERESIS_M
+from ...core.analytics.altitude import elevation_profile
+from ...core.analytics.cadence import (
+    COASTING_MIN_SPEED_MS,
+    avg_stride_length as _stride,
+    coasting_seconds as _coasting,
+    pedal_dynamics as _pedal_dynamics,
+    total_strokes as _total_strokes,
 )
-from ...core.analytics.altitude import total_descent as _total_descent, uphill_downhill_distance_km as _updown
 from ...core.analytics.training import (
     aerobic_effect as _aerobic,
     anaerobic_effect as _anaerobic,
@@ -70,7 +81,7 @@ def analyze_overall(activity_data: Dict[str, Any], stream_data: Dict[str, Any],
         return None
 
 
-def analyze_power(activity_data: Dict[str, Any], stream_data: Dict[str, Any], external_id: int, db: Session, activity_athlete_pair: Optional[Tuple[TbActivity, TbAthlete]] = None, activity_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+def analyze_power(activity_data: Dict[str, Any], stream_data: Dict[str, Any], external_id: int, db: Session, activity_athlete_pair: Optional[Tuple[TbActivity, TbAthlete]] = None, activity_type: Optional[str] = None, context: Optional[AnalysisContext] = None) -> Optional[Dict[str, Any]]:
     if 'watts' not in stream_data:
         return None
     try:
@@ -79,7 +90,8 @@ def analyze_power(activity_data: Dict[str, Any], stream_data: Dict[str, Any], ex
         valid_powers = [int(p) for p in power if p and p > 0]
         if not valid_powers: return None
         if activity_type in ["ride", "virtualride", "ebikeride"]:
-            np_val = _np(valid_powers)
+            context = context or AnalysisContext.from_strava(stream_data)
+            np_val = context.normalized_power
             avg_power = int(activity_data.get('average_watts')) if activity_data.get('average_watts') else int(sum(valid_powers) / len(valid_powers))
             ftp = int(activity_athlete_pair[1].ftp)
             wbal = stream_data.get('w_balance', {}).get('data', []) if isinstance(stream_data.get('w_balance'), dict) else stream_data.get('w_balance', [])
@@ -87,6 +99,7 @@ def analyze_power(activity_data: Dict[str, Any], stream_data: Dict[str, Any], ex
                 'avg_power': avg_power,
                 'max_power': int(activity_data.get('max_watts')) if activity_data.get('max_watts') else (int(max(valid_powers)) if valid_powers else None),
                 'normalized_power': np_val,
+                'x_power': context.x_power,
                 'intensity_factor': round(np_val / ftp, 2) if ftp > 0 else None,
                 'total_work': round(sum(valid_powers) / 1000, 0),
                 'variability_index': round(np_val / avg_power, 2) if avg_power > 0 else None,
@@ -102,6 +115,7 @@ def analyze_power(activity_data: Dict[str, Any], stream_data: Dict[str, Any], ex
                 'max_power': int(activity_data.get('max_watts')) if activity_data.get('max_watts') else (int(max(power)) if power else None),
                 'total_work': round(sum(power)/1000, 0),
                 'normalized_power': None,
+                'x_power': None,
                 'intensity_factor': None,
                 'variability_index': None,
                 'weighted_average_power': None,
@@ -114,15 +128,16 @@ def analyze_power(activity_data: Dict[str, Any], stream_data: Dict[str, Any], ex
         return None
 
 
-def analyze_heartrate(activity_data: Dict[str, Any], stream_data: Dict[str, Any], activity_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+def analyze_heartrate(activity_data: Dict[str, Any], stream_data: Dict[str, Any], activity_type: Optional[str] = None, context: Optional[AnalysisContext] = None) -> Optional[Dict[str, Any]]:
     if 'heartrate' not in stream_data:
         return None
     try:
+        context = context or AnalysisContext.from_strava(stream_data)
         hr = [h if h is not None else 0 for h in stream_data.get('heartrate', {}).get('data', [])]
         result = {
             'avg_heartrate'          : int(activity_data.get('average_heartrate')) if activity_data.get('average_heartrate') else (int(sum(hr)/len(hr)) if hr else None),
             'max_heartrate'          : int(activity_data.get('max_heartrate')) if activity_data.get('max_heartrate') else (int(max(hr)) if hr else None),
-            'heartrate_recovery_rate': _hr_recovery(hr),
+            'heartrate_recovery_rate': _hr_recovery(context.hr),
         }
         
         if activity_type in ["ride", "virtualride", "ebikeride"] and 'watts' in stream_data:
@@ -130,18 +145,20 @@ def analyze_heartrate(activity_data: Dict[str, Any], stream_data: Dict[str, Any]
             power_stream = stream_data.get('watts', {})
             power_data = power_stream.get('data', []) if isinstance(power_stream, dict) else power_stream
             if power_data and hr:
-                eff_index = _efficiency_index(power_data, hr)
-                result['efficiency_index'] = eff_index
-                result['heartrate_lag'] = _hr_lag(power_data, hr)
-                result['decoupling_rate'] = _decouple(power_data, hr)
+                result['efficiency_index'] = _efficiency_index(context.normalized_power, context.hr)
+                result['heartrate_lag'] = _hr_lag(context.power, hr)
+                result['heartrate_lag_profile'] = _hr_lag_profile(context.power, hr)
+                result['decoupling_rate'] = _decouple(context.power, context.hr)
             else:
                 result['efficiency_index'] = None
                 result['heartrate_lag'] = None
+                result['heartrate_lag_profile'] = None
                 result['decoupling_rate'] = None
         else:
             # 非骑行活动，返回 null
             result['efficiency_index'] = None
             result['heartrate_lag'] = None
+            result['heartrate_lag_profile'] = None
             result['decoupling_rate'] = None
         
         return result
@@ -149,82 +166,33 @@ def analyze_heartrate(activity_data: Dict[str, Any], stream_data: Dict[str, Any]
         return None
 
 
-def analyze_cadence(activity_data: Dict[str, Any], stream_data: Dict[str, Any], activity_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+def analyze_cadence(activity_data: Dict[str, Any], stream_data: Dict[str, Any], activity_type: Optional[str] = None, context: Optional[AnalysisContext] = None) -> Optional[Dict[str, Any]]:
     if 'cadence' not in stream_data:
         return None
     try:
-        cad = [c if c is not None else 0 for c in stream_data.get('cadence', {}).get('data', [])]
-        if not cad: return None
-        
+        context = context or AnalysisContext.from_strava(stream_data)
+        cad_raw = np.nan_to_num(context.array('cadence'))
+        if cad_raw.size == 0: return None
         
         # 如果是跑步活动，踏频需要乘以2（单侧步频 -> 总步频）
-        if activity_type in ["run", "trail_run", "virtual_run"]:
-            cad = [c * 2 for c in cad]
+        cad = cad_raw * 2 if activity_type in ["run", "trail_run", "virtual_run"] else cad_raw
         
         result = {
-            'avg_cadence': int(sum(cad)/len(cad)) if cad else None,
-            'max_cadence': int(max(cad)) if cad else None,
+            'avg_cadence': int(cad.mean()),
+            'max_cadence': int(cad.max()),
         }
         
         # 对于骑行活动，计算左右平衡、扭矩效率、踏板平顺度等指标
         if activity_type in ["ride", "virtualride", "ebikeride"]:
-            # 左右平衡
-            lrb = stream_data.get('left_right_balance', {}).get('data', []) if isinstance(stream_data.get('left_right_balance'), dict) else stream_data.get('left_right_balance', [])
-            if lrb:
-                valid_lrb = [v for v in lrb if v is not None and v >= 0]
-                if valid_lrb:
-                    avg_lrb = sum(valid_lrb) / len(valid_lrb)
-                    # left_right_balance 通常是百分比（0-100），需要转换为左右值
-                    # 假设值是左脚的百分比
-                    left_pct = int(round(avg_lrb))
-                    right_pct = 100 - left_pct
-                    result['left_right_balance'] = {'left': left_pct, 'right': right_pct}
-                else:
-                    result['left_right_balance'] = None
-            else:
-                result['left_right_balance'] = None
-            
-            # 扭矩效率
-            lte = stream_data.get('left_torque_effectiveness', {}).get('data', []) if isinstance(stream_data.get('left_torque_effectiveness'), dict) else stream_data.get('left_torque_effectiveness', [])
-            rte = stream_data.get('right_torque_effectiveness', {}).get('data', []) if isinstance(stream_data.get('right_torque_effectiveness'), dict) else stream_data.get('right_torque_effectiveness', [])
-            if lte:
-                valid_lte = [v for v in lte if v is not None and v >= 0]
-                result['left_torque_effectiveness'] = round(sum(valid_lte) / len(valid_lte), 2) if valid_lte else None
-            else:
-                result['left_torque_effectiveness'] = None
-            if rte:
-                valid_rte = [v for v in rte if v is not None and v >= 0]
-                result['right_torque_effectiveness'] = round(sum(valid_rte) / len(valid_rte), 2) if valid_rte else None
-            else:
-                result['right_torque_effectiveness'] = None
-            
-            # 踏板平顺度
-            lps = stream_data.get('left_pedal_smoothness', {}).get('data', []) if isinstance(stream_data.get('left_pedal_smoothness'), dict) else stream_data.get('left_pedal_smoothness', [])
-            rps = stream_data.get('right_pedal_smoothness', {}).get('data', []) if isinstance(stream_data.get('right_pedal_smoothness'), dict) else stream_data.get('right_pedal_smoothness', [])
-            if lps:
-                valid_lps = [v for v in lps if v is not None and v >= 0]
-                result['left_pedal_smoothness'] = round(sum(valid_lps) / len(valid_lps), 2) if valid_lps else None
-            else:
-                result['left_pedal_smoothness'] = None
-            if rps:
-                valid_rps = [v for v in rps if v is not None and v >= 0]
-                result['right_pedal_smoothness'] = round(sum(valid_rps) / len(valid_rps), 2) if valid_rps else None
-            else:
-                result['right_pedal_smoothness'] = None
+            result.update(_pedal_dynamics(context))
             
             # 总踏频（转数）
             try:
-                t = stream_data.get('time', {}).get('data', [])
-                if t and len(t) == len(cad):
-                    acc = 0.0
-                    prev = t[0]
-                    for i in range(1, len(t)):
-                        dt = max(0, (t[i] or 0) - (prev or 0))
-                        acc += (cad[i] or 0) * (dt / 60.0)
-                        prev = t[i]
-                    result['total_strokes'] = int(round(acc))
+                t = context.array('time')
+                if t.size and t.size == cad.size:
+                    result['total_strokes'] = _total_strokes(cad, np.nan_to_num(t))
                 else:
-                    result['total_strokes'] = int(round(sum(cad) / 60.0))
+                    result['total_strokes'] = int(round(float(cad.sum()) / 60.0))
             except Exception:
                 result['total_strokes'] = None
         else:
@@ -237,38 +205,23 @@ def analyze_cadence(activity_data: Dict[str, Any], stream_data: Dict[str, Any],
             result['total_strokes'] = None
         
         if activity_type in ["run", "trail_run", "virtual_run"]:
-            vel = stream_data.get('velocity_smooth', {}).get('data', [])
-            cad = stream_data.get('cadence', {}).get('data', [])
-            if vel and cad and len(vel) == len(cad):
-                valid_pairs = [
-                    (v, c * 2) for v, c in zip(vel, cad)  # cadence 需要乘以2
-                    if v is not None and c is not None and v > 0 and c > 0
-                ]
-                
-                if valid_pairs:
-                    # 步幅(m/step) = 速度(m/s) * 60 / 踏频(steps/min)
-                    stride_lengths = [v * 60.0 / c for v, c in valid_pairs]
-                    result['avg_stride_length'] = round(sum(stride_lengths) / len(stride_lengths), 2)
+            vel = context.array('velocity_smooth')
+            raw = context.array('cadence')
+            # cadence 需要乘以2；步幅(m/step) = 速度(m/s) * 60 / 踏频(steps/min)
+            result['avg_stride_length'] = _stride(vel, raw * 2) if vel.size and vel.size == raw.size else None
         else:
             result['avg_stride_length'] = None
-        print(result['avg_stride_length'])
         return result
     except Exception:
         return None
 
 
-def analyze_speed(activity_data: Dict[str, Any], stream_data: Dict[str, Any], activity_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+def analyze_speed(activity_data: Dict[str, Any], stream_data: Dict[str, Any], activity_type: Optional[str] = None, context: Optional[AnalysisContext] = None) -> Optional[Dict[str, Any]]:
     try:
         # compute coasting_time from velocity_smooth and watts if available
-        vel = stream_data.get('velocity_smooth', {}).get('data', [])
-        watts = stream_data.get('watts', {}).get('data', []) if 'watts' in stream_data else []
-        coasting = 0
-        if vel:
-            for i in range(len(vel)):
-                v = vel[i] or 0.0
-                p = (watts[i] if i < len(watts) else 0) or 0.0
-                if v < 0.27778 or p < 10:
-                    coasting += 1
+        context = context or AnalysisContext.from_strava(stream_data)
+        vel = context.array('velocity_smooth')
+        coasting = _coasting(vel, context.array('watts'), COASTING_MIN_SPEED_MS) if vel.size else 0
         return {
             'avg_speed'    : round(activity_data.get('average_speed') * 3.6, 1),
             'max_speed'    : round(activity_data.get('max_speed') * 3.6, 1),
@@ -353,14 +306,19 @@ def analyze_altitude(activity_data: Dict[str, Any], stream_data: Dict[str, Any])
         return None
     try:
         grades = stream_data.get('grade_smooth', {}).get('data', [])
+        profile = elevation_profile(
+            stream_data.get('altitude', {}).get('data', []),
+            stream_data.get('distance', {}).get('data', []),
+            hysteresis=ELEVATION_HYSTERESIS_M,
+        )
         return {
             'elevation_gain': int(activity_data.get('total_elevation_gain')),
             'max_altitude': int(activity_data.get('elev_high')),
             'max_grade': round(max(grades) if grades else 0, 1),
-            'total_descent': _total_descent(stream_data.get('altitude', {}).get('data', [])),
+            'total_descent': int(profile.descent),
             'min_altitude': int(activity_data.get('elev_low')),
-            'uphill_distance': _updown(stream_data.get('altitude', {}).get('data', []), stream_data.get('distance', {}).get('data', []))[0],
-            'downhill_distance': _updown(stream_data.get('altitude', {}).get('data', []), stream_data.get('distance', {}).get('data', []))[1],
+            'uphill_distance': profile.uphill_km,
+            'downhill_distance': profile.downhill_km,
         }
     except Exception:
         return None
@@ -3,15 +3,27 @@ Strava 低精度流数据补齐模块
 
 功能：
 - is_low_resolution：检测 Strava 流是否为低精度（时间间隔较大，可能触发 10k 限制）
-- prepare_for_upsampling：在每个流项中注入时间参考，便于后续补齐
-- upsample_low_resolution：将低精度流补齐到 1Hz（按 moving_time 推断目标长度）
+- upsample_streams：时间感知的补齐引擎，按真实 time 通道展开到 1 Hz 网格，所有通道一次完成，返回数组
+- upsample_low_resolution：对 Strava 流字典补齐，返回新字典（不修改传入的原始流字典）
 
-说明：
-- 本模块不追求高精度数值插值，仅使用“重复采样/就近取值”，避免引入额外噪声；
-- 适用于需要统一粒度进行分析的场景（比如功率曲线、节奏分析等）。
+补齐规则：
+- 网格为 time 通道覆盖的整秒；相邻样本间隔超过中位间隔 PAUSE_GAP_FACTOR 倍视为暂停，
+  暂停段只保留前一样本的一个名义间隔，其余秒数不生成（与原生 1 Hz 流在暂停处的时间跳变一致）；
+- 每个网格秒用 np.searchsorted 定位其前后原始样本：
+  功率/心率/踏频等按前值填充，海拔/距离/速度/坡度线性插值（忽略缺失样本），经纬度取最近样本；
+- time 通道本身替换为网格秒。
 """
 
-from typing import Dict, Any
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# 线性插值的通道（连续物理量）
+LINEAR_CHANNELS = frozenset({'altitude', 'altitude_smooth', 'distance', 'velocity_smooth', 'grade_smooth'})
+# 取最近样本的通道
+NEAREST_CHANNELS = frozenset({'latlng'})
+# 相邻样本间隔超过中位间隔的该倍数视为暂停
+PAUSE_GAP_FACTOR = 3.0
 
 
 def is_low_resolution(stream_data: Dict[str, Any]) -> bool:
@@ -32,46 +44,133 @@ def is_low_resolution(stream_data: Dict[str, Any]) -> bool:
     return avg > 5.0
 
 
-def prepare_for_upsampling(stream_data: Dict[str, Any]) -> Dict[str, Any]:
-    if not stream_data or 'time' not in stream_data:
-        return stream_data
-    time_data = stream_data['time'].get('data', [])
-    if not time_data:
-        return stream_data
-    prepared = dict(stream_data)
-    for k, v in prepared.items():
-        if k != 'time' and isinstance(v, dict) and 'data' in v:
-            v['_time_reference'] = {'time': time_data}
-    return prepared
+def _time_axis(time_data: Any) -> Optional[np.ndarray]:
+    """time 通道转为单调不减的 float64 数组；缺失值沿用前值，全部缺失时返回 None。"""
+    t = np.asarray(time_data if time_data is not None else [], dtype=np.float64).ravel()
+    valid = np.isfinite(t)
+    if not valid.any():
+        return None
+    t = np.where(valid, t, -np.inf)
+    t = np.maximum.accumulate(t)
+    return np.where(np.isfinite(t), t, t[valid][0])
+
+
+def upsample_grid(t: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    由原始时间轴生成 1 Hz 网格。
+
+    返回 (grid, left, frac)：grid 为保留的整秒；left 为其所在区间的左端样本下标；
+    frac 为其在 [t[left], t[left+1]] 中的位置（0..1，最后一个样本处为 0）。
+    """
+    n = t.size
+    gaps = np.diff(t)
+    positive = gaps[gaps > 0]
+    nominal = float(np.median(positive)) if positive.size else 1.0
+    # 每个样本覆盖的秒数：暂停段只保留一个名义间隔
+    span = np.append(gaps, 1.0)
+    span = np.where(span > nominal * PAUSE_GAP_FACTOR, nominal, span)
+
+    grid = np.arange(np.ceil(t[0]), np.floor(t[-1]) + 1)
+    left = np.searchsorted(t, grid, side='right') - 1
+    keep = (grid - t[left]) < np.maximum(span[left], 1.0)
+    grid, left = grid[keep], left[keep]
+
+    right = np.minimum(left + 1, n - 1)
+    width = t[right] - t[left]
+    frac = np.divide(grid - t[left], width, out=np.zeros_like(grid), where=width > 0)
+    return grid, left, frac
+
+
+def _source_array(data: Any) -> np.ndarray:
+    """原始数据转数组：数值列表为数值数组，含 None 或不规则元素时为 object 数组（保留原值）。"""
+    try:
+        return np.asarray(data)
+    except ValueError:
+        return np.fromiter(data, dtype=object, count=len(data))
+
 
+def _interpolate(data: Any, t: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """线性插值（None 视为缺失，只用有效样本插值）；全部缺失时为 NaN。"""
+    values = np.array(data, dtype=np.float64)[:t.size]
+    axis = t[:values.size]
+    valid = np.isfinite(values)
+    if not valid.any():
+        return np.full(grid.size, np.nan)
+    if valid.all():
+        return np.interp(grid, axis, values)
+    return np.interp(grid, axis[valid], values[valid])
 
-def _upsample_series(data: list, target_size: int) -> list:
-    if not data:
-        return []
-    if len(data) >= target_size:
+
+def upsample_streams(
+    time_data: Any,
+    channels: Dict[str, Any],
+) -> Optional[Dict[str, np.ndarray]]:
+    """
+    按真实时间轴将各通道补齐到 1 Hz，返回 {通道名: 数组}（含 'time'）。
+
+    线性插值通道为 float64（缺失处 NaN），其余通道保持原始 dtype（含 None 时为 object）。
+    time 通道不可用时返回 None。
+    """
+    t = _time_axis(time_data)
+    if t is None:
+        return None
+    grid, left, frac = upsample_grid(t)
+    nearest = np.minimum(left + (frac >= 0.5), t.size - 1)
+
+    result: Dict[str, np.ndarray] = {'time': grid.astype(np.int64)}
+    for key, data in channels.items():
+        if key == 'time':
+            continue
+        if data is None or len(data) == 0:
+            result[key] = np.empty(0)
+            continue
+        if key in LINEAR_CHANNELS:
+            result[key] = _interpolate(data, t, grid)
+            continue
+        source = _source_array(data)
+        index = nearest if key in NEAREST_CHANNELS else left
+        result[key] = source[np.minimum(index, len(source) - 1)]
+    return result
+
+
+def _stretch(data: Any, target_size: int) -> Any:
+    """time 通道不可用时的回退：按下标比例拉伸到 target_size。"""
+    if not data or len(data) >= target_size:
         return data
-    upsampled = []
-    step = len(data) / target_size
-    for i in range(target_size):
-        idx = min(int(i * step), len(data) - 1)
-        upsampled.append(data[idx])
-    return upsampled
+    index = (np.arange(target_size) * (len(data) / target_size)).astype(np.int64)
+    return _source_array(data)[np.minimum(index, len(data) - 1)].tolist()
+
+
+def _to_list(values: np.ndarray) -> list:
+    out = values.tolist()
+    if values.dtype.kind == 'f' and np.isnan(values).any():
+        return [None if v != v else v for v in out]
+    return out
 
 
 def upsample_low_resolution(stream_data: Dict[str, Any], moving_time_seconds: int) -> Dict[str, Any]:
-    if not moving_time_seconds or moving_time_seconds <= 0:
+    """补齐 Strava 流字典，返回新字典；传入的原始字典及其流项均不被修改。"""
+    if not stream_data:
         return stream_data
-    target_size = moving_time_seconds + 1
-    result = {}
+
+    items = {
+        key: item for key, item in stream_data.items()
+        if isinstance(item, dict) and 'data' in item
+    }
+    time_item = items.get('time') or {}
+    arrays = upsample_streams(time_item.get('data'), {key: item['data'] for key, item in items.items()})
+    if arrays is None and (not moving_time_seconds or moving_time_seconds <= 0):
+        return stream_data
+
+    result: Dict[str, Any] = {}
     for key, item in stream_data.items():
-        if not isinstance(item, dict) or 'data' not in item:
+        if key not in items:
             result[key] = item
             continue
         data = item['data']
-        if key == 'latlng':
-            up = _upsample_series(data, target_size)
-            result[key] = dict(item, data=up, original_size=len(data), upsampled_size=len(up))
+        if arrays is not None:
+            up = _to_list(arrays[key])
         else:
-            up = _upsample_series(data, target_size)
-            result[key] = dict(item, data=up, original_size=len(data), upsampled_size=len(up))
+            up = _stretch(data, moving_time_seconds + 1)
+        result[key] = dict(item, data=up, original_size=len(data), upsampled_size=len(up))
     return result
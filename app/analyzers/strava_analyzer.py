@@ -7,6 +7,7 @@ from typing import Dict, Any, Optional, List
 from sqlalchemy.orm import Session
 import logging
 from ..schemas.activities import AllActivityDataResponse
+from ..core.analytics.context import AnalysisContext
 from .strava import upsampling as _ups, extract as _extract, metrics as _metrics, best_powers as _best
 
 
@@ -39,8 +40,7 @@ class StravaAnalyzer:
             athlete_entry: 本地/远程运动员能力信息（ftp、w' 等），用于推导衍生流
         """
         if stream_data and _ups.is_low_resolution(stream_data):
-            prepared    = _ups.prepare_for_upsampling(stream_data)
-            stream_data = _ups.upsample_low_resolution(prepared, activity_data.get('moving_time', 0))
+            stream_data = _ups.upsample_low_resolution(stream_data, activity_data.get('moving_time', 0))
 
         stream_data = _extract.enrich_with_derived_streams(stream_data, activity_data, athlete_entry)
         streams = _extract.extract_stream_data(stream_data, keys, resolution, activity_data) if keys else None
@@ -64,10 +64,12 @@ class StravaAnalyzer:
 
 
         overall = _metrics.analyze_overall(activity_data, stream_data, external_id, db, activity_athlete_pair, activity_type)
-        power = _metrics.analyze_power(activity_data, stream_data, external_id, db, activity_athlete_pair, activity_type)
-        heartrate = _metrics.analyze_heartrate(activity_data, stream_data, activity_type)
-        cadence = _metrics.analyze_cadence(activity_data, stream_data, activity_type)
-        speed = _metrics.analyze_speed(activity_data, stream_data)
+        # 各分区共享的数组视图（NP、清洗后心率、踏频/速度数组只构建一次）
+        context = AnalysisContext.from_strava(stream_data)
+        power = _metrics.analyze_power(activity_data, stream_data, external_id, db, activity_athlete_pair, activity_type, context)
+        heartrate = _metrics.analyze_heartrate(activity_data, stream_data, activity_type, context)
+        cadence = _metrics.analyze_cadence(activity_data, stream_data, activity_type, context)
+        speed = _metrics.analyze_speed(activity_data, stream_data, context=context)
         training_effect = _metrics.analyze_training_effect(activity_data, stream_data, external_id, db, activity_athlete_pair, activity_type)
         altitude = _metrics.analyze_altitude(activity_data, stream_data)
         temp = _metrics.analyze_temperature(activity_data, stream_data)
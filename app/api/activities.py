@@ -2,7 +2,9 @@
 Activities API routes (moved from app/activities/router.py)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional
 import logging
@@ -11,6 +13,8 @@ import os
 from ..utils import get_db
 from ..schemas.activities import AllActivityDataResponse, IntervalsResponse
 from ..config import is_cache_enabled
+from ..infrastructure import http_cache
+from ..streams import binary_format
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +23,92 @@ def _is_cache_enabled():
     return is_cache_enabled()
 
 
+# 命中缓存时，不超过该大小的文件整体读入后返回，更大的文件以 FileResponse 分块发送
+_INLINE_RESPONSE_MAX_BYTES = 256 * 1024
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for token in request.headers.get("accept-encoding", "").lower().split(","):
+        name, _, params = token.strip().partition(";")
+        if name.strip() not in ("gzip", "*"):
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+# /all 的响应随 Accept（JSON/二进制流容器）与 Accept-Encoding（gzip）变化
+_ALL_VARY = "Accept, Accept-Encoding"
+
+
+def _all_representation(request: Request) -> str:
+    """/all 响应的表示形式：bin（二进制流容器）、gzip（预压缩 JSON）或 json；不同表示形式的 ETag 不同。"""
+    if binary_format.wants_binary(request.headers.get("accept")):
+        return "bin"
+    if _accepts_gzip(request):
+        return "gzip"
+    return "json"
+
+
+def _all_headers(version: str, representation: str) -> dict:
+    return {
+        "Vary": _ALL_VARY,
+        "ETag": http_cache.make_etag(version, representation),
+        "Cache-Control": http_cache.NO_CACHE,
+    }
+
+
+def _cached_file_response(request: Request, file_path: str, version: str) -> Response:
+    """
+    缓存文件即响应体：按原始字节返回。
+
+    - If-None-Match 命中时直接返回 304，不读取缓存文件；
+    - Accept 请求二进制流容器时返回 {file}.json.bin 副本；
+    - 否则客户端支持时返回 gzip 预压缩副本。
+
+    副本首次请求时才生成（gzip 压缩、二进制编码），且会整体读入小文件，需在线程池中调用，不阻塞事件循环。
+    """
+    from ..infrastructure.cache_manager import BINARY_SUFFIX, activity_cache_manager
+    representation = _all_representation(request)
+    etag = http_cache.make_etag(version, representation)
+    if http_cache.if_none_match(request, etag):
+        return http_cache.not_modified(etag, http_cache.NO_CACHE, _ALL_VARY)
+    media_type = "application/json"
+    if representation == "bin":
+        bin_path = activity_cache_manager.get_variant_file(file_path, BINARY_SUFFIX, binary_format.encode_all_json)
+        if bin_path is None:
+            raise OSError(f"无法生成二进制副本: {file_path}")
+        file_path, media_type = bin_path, binary_format.MEDIA_TYPE
+    elif representation == "gzip":
+        gz_path = activity_cache_manager.get_compressed_file(file_path)
+        if gz_path:
+            file_path = gz_path
+        else:
+            representation = "json"
+    headers = {**_all_headers(version, representation), "X-Cache": "HIT"}
+    if representation == "gzip":
+        headers["Content-Encoding"] = "gzip"
+    if os.path.getsize(file_path) > _INLINE_RESPONSE_MAX_BYTES:
+        return FileResponse(file_path, media_type=media_type, headers=headers)
+    with open(file_path, "rb") as f:
+        body = f.read()
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
 router = APIRouter(prefix="/activities", tags=["活动"])
 
 @router.get("/{activity_id}/all", response_model=AllActivityDataResponse)
 async def get_activity_all_data(
     activity_id: int,
+    request: Request,
     access_token: Optional[str] = Query(None, description="Strava API访问令牌"),
     keys: Optional[str] = Query(None, description="需要返回的流数据字段，用逗号分隔，如：time,distance,watts,heartrate。如果为空则返回所有字段"),
-    resolution: Optional[str] = Query("high", description="数据分辨率：low, medium, high"),
+    resolution: Optional[str] = Query("high", description="数据分辨率：low, medium, high, overview"),
     db: Session = Depends(get_db),
 ):
     try:
@@ -37,37 +119,29 @@ async def get_activity_all_data(
             keys=keys,
         )
         if _is_cache_enabled():
-            cached = activity_cache_manager.get_cache(db, activity_id, cache_key)
-            if cached:
-                logger.info(f"[cache-hit] all activity data id={activity_id}")
-                return AllActivityDataResponse(**cached)
+            cache_entry = activity_cache_manager.get_cache_entry(db, activity_id, cache_key)
+            if cache_entry:
+                try:
+                    response = await run_in_threadpool(_cached_file_response, request, *cache_entry)
+                    logger.info(f"[cache-hit] all activity data id={activity_id}")
+                    return response
+                except OSError as e:
+                    # 文件在校验后被 GC/失效删除：按未命中处理
+                    logger.warning(f"[cache-hit][read-failed] id={activity_id}: {e}")
         else:
             logger.info("[cache-disabled] skip cache lookup")
 
-        from ..services.activity_service import activity_service
-        from ..repositories.oauth_repo import get_access_token_by_athlete_id
-        from ..repositories.activity_repo import get_activity_athlete
+        from ..services.activity_cache_service import compute_and_cache_all_data
 
-        activity_entry, athlete_entry = get_activity_athlete(db, activity_id)
-        # print(activity_entry.upload_fit_url)
-        if activity_entry.upload_fit_url: access_token = None
-        else: access_token = get_access_token_by_athlete_id(db, athlete_entry.id)
-        result = activity_service.get_all_data(db, activity_id, access_token, keys, resolution)
-
-        if _is_cache_enabled():
-            try:
-                metadata = {
-                    "source": "strava_api" if access_token else "local_database",
-                    "keys": keys,
-                    "resolution": resolution,
-                    "data_upsampled": bool(access_token),
-                }
-                payload = result.model_dump() if hasattr(result, 'model_dump') else result
-                activity_cache_manager.set_cache(db, activity_id, cache_key, payload, metadata)
-                logger.info(f"[cache-set] activity id={activity_id}")
-            except Exception as ce:
-                logger.warning(f"[cache-failed] id={activity_id}: {ce}")
-        return result
+        body, version = compute_and_cache_all_data(db, activity_id, keys, resolution, cache_key)
+        # 未命中时响应体未压缩：gzip 与 json 表示形式的 ETag 不同，按实际返回的 json 标记
+        if binary_format.wants_binary(request.headers.get("accept")):
+            return Response(
+                content=binary_format.encode_all_json(body),
+                media_type=binary_format.MEDIA_TYPE,
+                headers=_all_headers(version, "bin"),
+            )
+        return Response(content=body, media_type="application/json", headers=_all_headers(version, "json"))
     except HTTPException:
         raise
     except Exception as e:
@@ -78,6 +152,8 @@ async def get_activity_all_data(
 @router.get("/{activity_id}/intervals/simple", response_model=IntervalsResponse)
 async def get_activity_intervals_common(
     activity_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
 ):
     """
@@ -88,6 +164,7 @@ async def get_activity_intervals_common(
           1. /activities/{activity_id}/intervals
           2. /activities/{activity_id}/intervals/simple
         - 均读取 /data/intervals/{activity_id}.json，内容相同
+        - ETag 由区间文件的修改时间与大小决定，If-None-Match 命中时返回 304，不读取文件
 
     参数:
         activity_id: 活动ID
@@ -100,7 +177,15 @@ async def get_activity_intervals_common(
         HTTPException 500 - 读取或解析文件时发生错误
     """
     try:
-        from ..infrastructure.intervals_manager import load_intervals
+        from ..infrastructure.intervals_manager import intervals_version, load_intervals
+
+        version = intervals_version(activity_id)
+        if version is not None:
+            etag = http_cache.make_etag("intervals", activity_id, version)
+            if http_cache.if_none_match(request, etag):
+                return http_cache.not_modified(etag, http_cache.NO_CACHE)
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = http_cache.NO_CACHE
 
         intervals_data = load_intervals(activity_id)
 
@@ -131,6 +216,31 @@ async def clear_activity_cache(activity_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"清除缓存时发生错误: {str(e)}")
 
 
+@router.post("/cache/athlete/{athlete_id}/refresh")
+async def refresh_athlete_cache(
+    athlete_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """运动员阈值（FTP/LTHR/最大心率/W′ 等）变化后，在后台重算该运动员已过期的 /all 缓存。
+
+    不调用本接口时，过期缓存也会在下次访问时按需重算；其它运动员的缓存不受影响。
+    """
+    try:
+        from ..infrastructure.cache_manager import activity_cache_manager
+        from ..services.activity_cache_service import refresh_stale_athlete_cache
+
+        stale_count = len(activity_cache_manager.list_stale_entries(db, athlete_id))
+        if stale_count:
+            background_tasks.add_task(refresh_stale_athlete_cache, athlete_id)
+        return {
+            "message": "已提交后台刷新任务" if stale_count else "该运动员没有过期缓存",
+            "data": {"athlete_id": athlete_id, "stale_count": stale_count, "status": "scheduled" if stale_count else "fresh"},
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"刷新缓存时发生错误: {str(e)}")
+
+
 @router.delete("/cache")
 async def clear_all_cache(db: Session = Depends(get_db)):
     try:
@@ -152,6 +262,34 @@ async def get_cache_status(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"获取缓存状态时发生错误: {str(e)}")
 
 
+@router.post("/cache/gc")
+async def run_cache_gc(
+    full: bool = Query(False, description="true 循环执行直到无可回收项；false 只执行一轮（增量）"),
+    db: Session = Depends(get_db),
+):
+    """手动触发缓存 GC：清理过期/禁用条目、按 LRU 淘汰超出字节预算的条目、删除孤儿文件。"""
+    try:
+        from ..infrastructure.cache_gc import activity_cache_gc
+        result = activity_cache_gc.run_once(db, full=full)
+        if result.get("status") == "failed":
+            raise HTTPException(status_code=500, detail=f"缓存 GC 失败: {result.get('message')}")
+        return {"message": "缓存 GC 执行完成" if result.get("status") == "success" else result.get("message"), "data": result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"缓存 GC 时发生错误: {str(e)}")
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(db: Session = Depends(get_db)):
+    """缓存统计：条目数、字节数、磁盘文件与孤儿文件、预算配置及最近一次 GC 结果。"""
+    try:
+        from ..infrastructure.cache_gc import activity_cache_gc
+        return {"message": "获取缓存统计成功", "data": activity_cache_gc.summary(db)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取缓存统计时发生错误: {str(e)}")
+
+
 @router.post("/cache/toggle")
 async def toggle_cache(enable: bool = Query(..., description="true 开启，false 关闭")):
     try:
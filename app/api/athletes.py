@@ -3,16 +3,26 @@ Athletes API routes
 
 包含：
 - POST /athletes/{athlete_id}/daily-state/update：更新运动员每日状态
+- POST /athletes/{athlete_id}/power-records/rebuild：按单次活动最佳功率重建该运动员 Top3
+- POST /athletes/power-records/rebuild：重建全部运动员 Top3
+- GET  /athletes/{athlete_id}/power-curve：指定时间窗（from/to）内的最佳功率曲线
+- GET  /athletes/{athlete_id}/ftp-estimate：基于最佳功率曲线的 FTP 估算（按曲线版本缓存）
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional
-from datetime import date
+from datetime import date, datetime, time
 import logging
 
 from ..utils import get_db
-from ..schemas.athletes import DailyStateUpdateResponse, DailyStateDetail
+from ..schemas.athletes import (
+    AthletePowerCurveResponse,
+    DailyStateDetail,
+    FTPEstimateResponse,
+    DailyStateUpdateResponse,
+    PowerRecordsRebuildResponse,
+)
 from ..services.daily_state_service import daily_state_service
 
 logger = logging.getLogger(__name__)
@@ -86,3 +96,132 @@ async def update_daily_state(
         logger.exception("[daily-state-api][error] athlete_id=%s", athlete_id)
         raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
 
+
+@router.post("/power-records/rebuild", response_model=PowerRecordsRebuildResponse)
+async def rebuild_all_power_records(
+    backfill: bool = Query(False, description="重建前先从 FIT 文件回填尚未写入窄表的历史骑行活动"),
+    backfill_limit: Optional[int] = Query(None, ge=1, description="本次最多回填的活动数，不传则不限"),
+    db: Session = Depends(get_db),
+):
+    """重建全部运动员的功率/距离/爬升 Top3（窄表 + 尚未回填活动的现有纪录）。"""
+    return _rebuild_power_records(db, None, backfill, backfill_limit)
+
+
+@router.post("/{athlete_id}/power-records/rebuild", response_model=PowerRecordsRebuildResponse)
+async def rebuild_athlete_power_records(
+    athlete_id: int,
+    backfill: bool = Query(False, description="重建前先从 FIT 文件回填尚未写入窄表的历史骑行活动"),
+    backfill_limit: Optional[int] = Query(None, ge=1, description="本次最多回填的活动数，不传则不限"),
+    db: Session = Depends(get_db),
+):
+    """重建指定运动员的功率/距离/爬升 Top3（窄表 + 尚未回填活动的现有纪录）。
+
+    用于活动删除或重新上传后修复 tb_athlete_power_records 中的陈旧纪录。
+    """
+    return _rebuild_power_records(db, athlete_id, backfill, backfill_limit)
+
+
+def _rebuild_power_records(
+    db: Session,
+    athlete_id: Optional[int],
+    backfill: bool = False,
+    backfill_limit: Optional[int] = None,
+) -> PowerRecordsRebuildResponse:
+    from ..repositories.activity_best_power_repo import rebuild_power_records
+    from ..services.power_records_service import backfill_activity_best_powers
+
+    try:
+        backfilled = backfill_activity_best_powers(db, athlete_id, backfill_limit) if backfill else 0
+        count = rebuild_power_records(db, athlete_id)
+        return PowerRecordsRebuildResponse(
+            message="重建完成" if count else "无可用的功率纪录数据",
+            status="success",
+            athlete_id=athlete_id,
+            rebuilt_athletes=count,
+            backfilled_activities=backfilled,
+        )
+    except Exception as e:
+        logger.exception("[power-records-api][error] athlete_id=%s", athlete_id)
+        raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
+
+
+def _parse_date_param(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} 日期格式错误，应为 YYYY-MM-DD，收到：{value}")
+
+
+@router.get("/{athlete_id}/power-curve", response_model=AthletePowerCurveResponse)
+async def get_athlete_power_curve(
+    athlete_id: int,
+    from_param: Optional[str] = Query(None, alias="from", description="起始日期，格式：YYYY-MM-DD，不传则不限"),
+    to_param: Optional[str] = Query(None, alias="to", description="结束日期（含当天），格式：YYYY-MM-DD，不传则不限"),
+):
+    """返回运动员在时间窗内所有活动合并的最佳功率曲线（如最近 28/90/365 天）。
+
+    基于逐活动存储的 MMP 曲线做区间最大查询，仅包含已写入逐活动曲线的活动。
+    """
+    from ..repositories.activity_curve_repo import query_best_curve
+
+    start_day = _parse_date_param(from_param, "from")
+    end_day = _parse_date_param(to_param, "to")
+    if start_day and end_day and start_day > end_day:
+        raise HTTPException(status_code=400, detail="from 不能晚于 to")
+
+    try:
+        curve, count = query_best_curve(
+            athlete_id,
+            datetime.combine(start_day, time.min) if start_day else None,
+            datetime.combine(end_day, time.max) if end_day else None,
+        )
+    except Exception as e:
+        logger.exception("[power-curve-api][error] athlete_id=%s", athlete_id)
+        raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
+
+    if curve is None:
+        raise HTTPException(status_code=404, detail="该时间窗内没有可用的功率曲线")
+    return AthletePowerCurveResponse(
+        athlete_id=athlete_id,
+        from_date=start_day.isoformat() if start_day else None,
+        to_date=end_day.isoformat() if end_day else None,
+        activity_count=count,
+        length=int(curve.size),
+        best_curve=curve.tolist(),
+    )
+
+
+@router.get("/{athlete_id}/ftp-estimate", response_model=FTPEstimateResponse)
+async def get_athlete_ftp_estimate(
+    athlete_id: int,
+    window_days: Optional[int] = Query(None, ge=0, description="使用最近 N 天的曲线估算，0 表示历史全局曲线，不传则使用服务端默认窗口"),
+):
+    """返回运动员的 FTP 估算（综合值、子估计、权重、覆盖与可信度）。
+
+    结果按曲线文件版本缓存，曲线未变化时直接复用上次估算。
+    """
+    from ..config import FTP_ESTIMATE_WINDOW_DAYS
+    from ..core.analytics.ftp_estimator import get_ftp_estimate
+
+    # 只有未传参时才使用默认窗口；0（参数或配置）表示历史全局曲线
+    days = (FTP_ESTIMATE_WINDOW_DAYS if window_days is None else window_days) or None
+    try:
+        estimate = get_ftp_estimate(athlete_id, window_days=days)
+    except Exception as e:
+        logger.exception("[ftp-estimate-api][error] athlete_id=%s", athlete_id)
+        raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
+
+    if estimate.ftp is None and estimate.confidence == "none":
+        raise HTTPException(status_code=404, detail="未找到该运动员的最佳功率曲线记录")
+    return FTPEstimateResponse(
+        athlete_id=athlete_id,
+        window_days=days,
+        ftp=estimate.ftp,
+        components=estimate.components,
+        weights=estimate.weights,
+        coverage=estimate.coverage,
+        confidence=estimate.confidence,
+        notes=estimate.notes,
+    )
@@ -6,7 +6,7 @@
 - 将单项获取的接口集中在此文件中统一维护。
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import Optional
 import logging
@@ -27,11 +27,12 @@ from ...schemas.activities import (
     TrainingEffectResponse,
     MultiStreamRequest,
     MultiStreamResponse,
-    StreamDataItem,
 )
 from ...core.analytics import zones as ZoneAnalyzer
 from ...streams.models import Resolution
+from ...streams import downsample
 from ...infrastructure.data_manager import activity_data_manager
+from ...api.streams import stream_response, validate_window
 
 
 logger = logging.getLogger(__name__)
@@ -353,21 +354,28 @@ async def get_activity_training_effect(
 
 
 @router.post("/{activity_id}/multi-streams", response_model=MultiStreamResponse)
-async def get_activity_multi_streams(activity_id: int, request: MultiStreamRequest, db: Session = Depends(get_db)):
+async def get_activity_multi_streams(activity_id: int, request: MultiStreamRequest, http_request: Request, db: Session = Depends(get_db)):
     try:
         try:
             resolution = Resolution(request.resolution)
         except ValueError:
-            raise HTTPException(status_code=400, detail="无效的分辨率参数，必须是 low、medium 或 high")
-        streams_data = activity_data_manager.get_activity_streams(db, activity_id, request.keys, resolution)
+            raise HTTPException(status_code=400, detail="无效的分辨率参数，必须是 low、medium、high 或 overview")
+        if request.algorithm is not None and request.algorithm not in downsample.ALGORITHMS:
+            raise HTTPException(status_code=400, detail=f"无效的降采样算法，必须是 {'、'.join(downsample.ALGORITHMS)}")
+        validate_window(request.start, request.end, request.axis)
+        streams_data = activity_data_manager.get_activity_streams(
+            db, activity_id, request.keys, resolution, request.target_points, request.algorithm,
+            request.start, request.end, request.axis,
+        )
         response_data = []
         for field in request.keys:
             stream_item = next((item for item in streams_data if item["type"] == field), None)
-            if stream_item and stream_item["data"]:
-                response_data.append(StreamDataItem(type=field, data=stream_item["data"]))
-            else:
-                response_data.append(StreamDataItem(type=field, data=None))
-        return MultiStreamResponse(response_data)
+            data = stream_item.get("data") if stream_item else None
+            if data is not None and len(data) == 0:
+                data = None
+            response_data.append({"type": field, "data": data})
+        # 流数据为内部生成的可信数据：跳过逐元素校验，按 Accept 头编码为 JSON 或二进制容器
+        return stream_response(http_request, response_data)
     except HTTPException:
         raise
     except Exception as e:
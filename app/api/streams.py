@@ -3,25 +3,78 @@
 
 包含：
 - GET /activities/{activity_id}/available：获取活动可用的流数据类型；
-- GET /activities/{activity_id}/streams：按 key 获取指定活动的某一类流数据。
+- GET /activities/{activity_id}/streams：按 key 获取指定活动的某一类流数据
+  （可按 resolution 或 target_points 降采样，算法可通过 algorithm 指定；
+  start/end 指定时间或距离窗口时只返回窗口内数据，点数与整条流相同量级）。
 
 说明：
 - 路由仅做参数校验与调用 stream_crud；
-- 返回格式尽量与前端期望保持一致，若 key 不可用，返回空列表。
+- 返回格式尽量与前端期望保持一致，若 key 不可用，返回空列表；
+- 请求头 Accept: application/vnd.fitapi.streams 时以二进制容器返回流数据（见 app/streams/binary_format.py），
+  默认仍为 JSON；
+- /streams 返回 ETag（请求参数、FIT 内容哈希、运动员阈值版本、算法版本与表示形式共同决定），
+  If-None-Match 命中时返回 304；只由 FIT 决定的通道附带 immutable 的 Cache-Control。
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from ..utils import get_db
 from ..streams import schemas, models
 from ..streams.crud import stream_crud
+from ..streams import binary_format, downsample
+from ..infrastructure import http_cache
+from ..infrastructure.cache_manager import activity_cache_manager
+from ..infrastructure.fast_json import FastJSONResponse
 
 
 router = APIRouter(prefix="/activities", tags=["streams"])
 
 
+def stream_response(request: Request, streams: List[Dict[str, Any]]) -> Response:
+    """
+    按 Accept 头返回流数据：显式请求 application/vnd.fitapi.streams 时返回二进制容器，
+    否则返回 JSON（流数据为内部生成的数值数组，直接编码，跳过 jsonable_encoder 的逐元素遍历）。
+    """
+    headers = {"Vary": "Accept"}
+    if binary_format.wants_binary(request.headers.get("accept")):
+        return Response(content=binary_format.encode(streams), media_type=binary_format.MEDIA_TYPE, headers=headers)
+    return FastJSONResponse(streams, headers=headers)
+
+
+def validate_window(start: Optional[float], end: Optional[float], axis: str) -> None:
+    """校验窗口参数，不合法时抛出 400。"""
+    if axis not in models.WINDOW_AXES:
+        raise HTTPException(status_code=400, detail=f"无效的窗口坐标轴，必须是 {'、'.join(models.WINDOW_AXES)}")
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="窗口起点不能大于终点")
+
+
+def _stream_etag(
+    db: Session,
+    request: Request,
+    activity_id: int,
+    key: str,
+    resolution: models.Resolution,
+    target_points: Optional[int],
+    algorithm: Optional[str],
+    start: Optional[float],
+    end: Optional[float],
+    axis: str,
+) -> Optional[str]:
+    """流数据响应的 ETag；本进程尚未下载过该活动的 FIT（内容哈希未知）时返回 None。"""
+    fit_hash = stream_crud.fit_content_hash(activity_id)
+    if fit_hash is None:
+        return None
+    window = models.round_window(start, end, axis) if (start is not None or end is not None) else None
+    cache_key = f"streams:{key}:{resolution.value}:{target_points}:{algorithm}:{axis}:{window}"
+    version = activity_cache_manager.current_content_version(db, activity_id, cache_key, fit_hash)
+    representation = "bin" if binary_format.wants_binary(request.headers.get("accept")) else "json"
+    return http_cache.make_etag(version, representation)
+
+
 @router.get("/{activity_id}/available")
 def get_available_streams(activity_id: int, db: Session = Depends(get_db)):
     try:
@@ -44,18 +97,45 @@ def get_available_streams(activity_id: int, db: Session = Depends(get_db)):
 @router.get("/{activity_id}/streams")
 def get_activity_streams(
     activity_id: int,
+    request: Request,
     key: str = Query(...),
     resolution: models.Resolution = Query(models.Resolution.HIGH),
+    target_points: Optional[int] = Query(None, ge=1, description="目标点数（按视口宽度请求），指定时优先于 resolution"),
+    algorithm: Optional[str] = Query(None, description="降采样算法：lttb、minmax、stride；默认按通道选择"),
+    start: Optional[float] = Query(None, ge=0, description="窗口起点（axis=time 为秒，axis=distance 为米）"),
+    end: Optional[float] = Query(None, ge=0, description="窗口终点（axis=time 为秒，axis=distance 为米）"),
+    axis: str = Query("time", description="窗口坐标轴：time 或 distance"),
     db: Session = Depends(get_db),
 ):
     try:
+        if algorithm is not None and algorithm not in downsample.ALGORITHMS:
+            raise HTTPException(status_code=400, detail=f"无效的降采样算法，必须是 {'、'.join(downsample.ALGORITHMS)}")
+        validate_window(start, end, axis)
+        cache_control = http_cache.NO_CACHE if key in models.ATHLETE_DEPENDENT_STREAMS else http_cache.IMMUTABLE
+        etag_args = (db, request, activity_id, key, resolution, target_points, algorithm, start, end, axis)
+        # FIT 内容哈希已知时，在解析/降采样之前完成条件请求校验
+        etag = _stream_etag(*etag_args)
+        if etag is not None and http_cache.if_none_match(request, etag):
+            return http_cache.not_modified(etag, cache_control, "Accept")
+
         result = stream_crud.get_available_streams(db, activity_id)
         available_streams = result["available_streams"]
 
         if key not in available_streams:
             return []
 
-        return stream_crud.get_activity_streams(db, activity_id, [key], resolution)
+        if etag is None:
+            etag = _stream_etag(*etag_args)
+            if etag is not None and http_cache.if_none_match(request, etag):
+                return http_cache.not_modified(etag, cache_control, "Accept")
+        streams = stream_crud.get_activity_streams(
+            db, activity_id, [key], resolution, target_points, algorithm, start, end, axis
+        )
+        response = stream_response(request, streams)
+        if etag is not None:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = cache_control
+        return response
 
     except HTTPException:
         raise
@@ -16,11 +16,29 @@
      若未设置，则会回退读取仓库根目录的 `.cache_config` 文件（内容：enabled=true/false）；
      两者都未设置时，默认启用缓存。
    - `CACHE_DIR`：缓存文件落盘目录，默认 `./data/activity_cache`
+   - `CACHE_MAX_BYTES`：缓存目录总字节预算，默认 2147483648（2 GiB），超出后按最近访问时间（LRU）淘汰
+   - `CACHE_MAX_AGE_DAYS`：缓存最长保留天数，默认 30（写入 expires_at）；0 表示不按年龄淘汰
+   - `CACHE_GC_INTERVAL_SECONDS`：后台缓存 GC 间隔（秒），默认 600；0 表示不启动后台 GC
+   - `CACHE_GC_BATCH_SIZE`：单轮 GC 最多删除的条目/文件数，默认 500（增量执行，避免长时间占用）
+   - `STREAM_CACHE_MAX_BYTES`：进程内按通道缓存的流数据字节预算，默认 268435456（256 MiB），超出后按 LRU 淘汰
    - `LOG_LEVEL`：日志等级，默认 INFO（可选 DEBUG/INFO/WARN/ERROR 等）
 
 3) Strava 相关
    - `STRAVA_TIMEOUT`：调用 Strava API 的超时时间（秒），默认 10
 
+4) 分析参数
+   - `FTP_ESTIMATE_WINDOW_DAYS`：自动估算 FTP 时使用最近 N 天的功率曲线，默认 0（始终使用历史全局曲线）；
+     逐活动曲线回填完成后再开启
+   - `FTP_ESTIMATE_WINDOW_MIN_SECONDS` / `FTP_ESTIMATE_WINDOW_MIN_ACTIVITIES`：近期窗口曲线的最低覆盖，
+     默认 1200 秒 / 3 个活动；不足时回退历史全局曲线
+   - `ANALYSIS_ALGORITHM_VERSION`：分析算法版本号，写入 /all 缓存依赖信息；
+     算法口径变化时递增，旧缓存会在下次访问时按需重算
+   - `WBAL_MODEL`：W′bal 模型，differential（默认，逐秒微分）或 integral（Skiba 积分）
+   - `WBAL_TAU_MODEL`：W′ 恢复时间常数模型，fixed（默认，546 s）、skiba 或 differential
+   - `WBAL_TAU_MODEL_OVERRIDES`：按运动员覆盖 τ 模型，格式 "athlete_id:model,..."，如 "12:skiba,15:differential"
+   - `ELEVATION_HYSTERESIS_M`：累计爬升/下降的滞回阈值（米），默认 0（逐点累加）；
+     设为 2~5 可抑制气压计/GPS 噪声，非 0 值计入 /all 缓存的算法版本
+
 用法建议：
 - 本地开发：在 shell 中临时导出环境变量，或在启动脚本中写死；
 - 生产环境：统一由部署平台注入环境变量（Docker/K8s/进程管理器）。
@@ -58,6 +76,16 @@ LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
 # CACHE_DIR 为持久化缓存文件的根目录（活动聚合结果落盘路径）
 CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(os.getcwd(), 'data', 'activity_cache'))
 
+# 缓存 GC：总字节预算 / 最长保留天数 / 后台执行间隔 / 单轮删除上限
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+CACHE_MAX_AGE_DAYS = int(os.environ.get('CACHE_MAX_AGE_DAYS', '30'))
+CACHE_GC_INTERVAL_SECONDS = int(os.environ.get('CACHE_GC_INTERVAL_SECONDS', '600'))
+CACHE_GC_BATCH_SIZE = int(os.environ.get('CACHE_GC_BATCH_SIZE', '500'))
+
+# 进程内流数据缓存（按 活动×通道×分辨率 存一份）的字节预算
+STREAM_CACHE_MAX_BYTES = int(os.environ.get('STREAM_CACHE_MAX_BYTES', str(256 * 1024 ** 2)))
+
+
 def is_cache_enabled() -> bool:
     """
     统一判断是否启用缓存。
@@ -84,6 +112,25 @@ def is_cache_enabled() -> bool:
 STRAVA_TIMEOUT = int(os.environ.get('STRAVA_TIMEOUT', '10'))
 
 
+# 分析参数（Analytics）
+# FTP_ESTIMATE_WINDOW_DAYS 为 FTP 自动估算所用的近期窗口（天），0 表示历史全局曲线；
+# 逐活动曲线只含上线后分析过的活动，窗口曲线短于 MIN_SECONDS 或活动数少于 MIN_ACTIVITIES 时回退全局曲线
+FTP_ESTIMATE_WINDOW_DAYS = int(os.environ.get('FTP_ESTIMATE_WINDOW_DAYS', '0'))
+FTP_ESTIMATE_WINDOW_MIN_SECONDS = int(os.environ.get('FTP_ESTIMATE_WINDOW_MIN_SECONDS', '1200'))
+FTP_ESTIMATE_WINDOW_MIN_ACTIVITIES = int(os.environ.get('FTP_ESTIMATE_WINDOW_MIN_ACTIVITIES', '3'))
+
+# ANALYSIS_ALGORITHM_VERSION 为分析算法版本；与运动员阈值版本一起决定 /all 缓存是否仍然有效
+ANALYSIS_ALGORITHM_VERSION = os.environ.get('ANALYSIS_ALGORITHM_VERSION', '1')
+
+# W′bal 模型与恢复时间常数模型（见 app/core/analytics/wbal.py）；按运动员覆盖的 τ 模型计入其阈值版本
+WBAL_MODEL = os.environ.get('WBAL_MODEL', 'differential').lower()
+WBAL_TAU_MODEL = os.environ.get('WBAL_TAU_MODEL', 'fixed').lower()
+WBAL_TAU_MODEL_OVERRIDES = os.environ.get('WBAL_TAU_MODEL_OVERRIDES', '')
+
+# ELEVATION_HYSTERESIS_M 为爬升/下降的滞回（死区）总宽度（米，见 app/core/analytics/altitude.py）
+ELEVATION_HYSTERESIS_M = float(os.environ.get('ELEVATION_HYSTERESIS_M', '0'))
+
+
 # 数据库（Database）
 def get_database_url() -> str:
     """
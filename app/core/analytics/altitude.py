@@ -1,87 +1,161 @@
-from typing import List
-
-
-def elevation_gain(altitude_data: List[float]) -> float:
-    filtered = []
-    for alt in altitude_data:
-        if alt is None:
-            continue
-        if alt > 5000 or alt < -500:
-            continue
-        if filtered and abs(alt - filtered[-1]) > 100:
-            continue
-        filtered.append(alt)
-    if len(filtered) < 2:
+"""
+海拔分析核心算法（NumPy 向量化）
+
+elevation_profile 一次完成全部海拔指标，本地 FIT、Strava 与最佳分段记录共用：
+- 爬升 / 下降：先按异常值规则过滤海拔（None/非有限值、超出 [-500, 5000] m、与上一个保留样本相差超过 100 m
+  的样本剔除），可选滞回阈值（死区滤波）抑制气压计/GPS 噪声，再对相邻差值分别累加正负部分；
+- 最大坡度、上/下坡距离：按原始下标对齐的海拔与距离，以 interval_points 个样本为跨度计算。
+
+hysteresis=0（默认）时与逐点累加的结果一致；滞回阈值为死区总宽度（米），
+海拔在死区内的起伏不计入爬升/下降。
+"""
+
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from .rolling import as_array, first_within
+
+# 海拔有效范围（米）与相邻保留样本允许的最大跳变（米）
+ELEVATION_MIN = -500
+ELEVATION_MAX = 5000
+ELEVATION_MAX_JUMP = 100
+
+
+@dataclass
+class ElevationProfile:
+    gain: float = 0.0           # 累计爬升（米）
+    descent: float = 0.0        # 累计下降（米）
+    max_grade: float = 0.0      # 最大坡度绝对值（%，保留 2 位小数）
+    uphill_km: float = 0.0      # 上坡距离（公里，保留 2 位小数）
+    downhill_km: float = 0.0    # 下坡距离（公里，保留 2 位小数）
+
+
+def altitude_valid_mask(altitude_data: Any) -> np.ndarray:
+    """
+    海拔有效样本掩码（下标与原始流对齐）。
+
+    跳变规则依赖上一个保留值：相邻有效样本之间不超过 100 m 的链段整段保留，
+    只在链段断点处向后查找第一个与断点前保留值重新接上的样本。
+    """
+    arr = as_array(altitude_data, missing=None)
+    mask = np.zeros(arr.size, dtype=bool)
+    idx = np.flatnonzero(np.isfinite(arr) & (arr >= ELEVATION_MIN) & (arr <= ELEVATION_MAX))
+    if idx.size == 0:
+        return mask
+    values = arr[idx]
+    keep = np.ones(values.size, dtype=bool)
+    breaks = np.flatnonzero(np.abs(np.diff(values)) > ELEVATION_MAX_JUMP) + 1
+    pos = 0
+    while True:
+        k = int(np.searchsorted(breaks, pos, side='right'))
+        if k >= breaks.size:
+            break
+        b = int(breaks[k])
+        resume = first_within(values, b, float(values[b - 1]), ELEVATION_MAX_JUMP)
+        keep[b:resume] = False
+        if resume >= values.size:
+            break
+        pos = resume
+    mask[idx[keep]] = True
+    return mask
+
+
+def deadband(values: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    死区（滞回）滤波：y[0] = x[0]，y[i] = clip(y[i-1], x[i] − threshold/2, x[i] + threshold/2)。
+
+    钳位函数的复合仍是钳位函数，逐点递推按前缀复合做对数步扫描（O(n log n)，全部向量化）。
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if threshold <= 0 or x.size < 2:
+        return x
+    half = threshold / 2.0
+    lo = x - half
+    hi = x + half
+    lo[0] = hi[0] = x[0]
+    step = 1
+    while step < x.size:
+        prev_lo, prev_hi = lo[:-step], hi[:-step]
+        cur_lo, cur_hi = lo[step:], hi[step:]
+        lo[step:], hi[step:] = np.clip(prev_lo, cur_lo, cur_hi), np.clip(prev_hi, cur_lo, cur_hi)
+        step *= 2
+    return lo
+
+
+def _gain_descent(altitude_data: Any, hysteresis: float) -> Tuple[float, float]:
+    arr = as_array(altitude_data, missing=None)
+    filtered = deadband(arr[altitude_valid_mask(arr)], hysteresis)
+    if filtered.size < 2:
+        return 0.0, 0.0
+    diffs = np.diff(filtered)
+    return float(diffs[diffs > 0].sum()), float(-diffs[diffs < 0].sum())
+
+
+def _span_deltas(altitude: Any, distance: Any, interval_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """跨 interval_points 个样本的海拔差与距离差（缺失样本为 NaN，参与的比较均为 False）。"""
+    alt = as_array(altitude, missing=None)
+    dist = as_array(distance, missing=None)
+    n = min(alt.size, dist.size)
+    if n <= interval_points:
+        return np.empty(0), np.empty(0)
+    return alt[interval_points:n] - alt[:n - interval_points], dist[interval_points:n] - dist[:n - interval_points]
+
+
+def _max_grade(delta_alt: np.ndarray, delta_dis: np.ndarray, min_distance_interval: float) -> float:
+    valid = (delta_dis > min_distance_interval) & (delta_dis < 1000)
+    grades = np.abs(delta_alt[valid] / delta_dis[valid] * 100.0)
+    grades = grades[grades <= 50]
+    return round(float(grades.max()), 2) if grades.size else 0.0
+
+
+def _updown_km(delta_alt: np.ndarray, delta_dis: np.ndarray, min_distance_interval: float) -> Tuple[float, float]:
+    far = delta_dis > min_distance_interval
+    uphill = float(delta_dis[far & (delta_alt > 1)].sum())
+    downhill = float(delta_dis[far & (delta_alt < -1)].sum())
+    return round(uphill / 1000.0, 2), round(downhill / 1000.0, 2)
+
+
+def elevation_profile(
+    altitude: Any,
+    distance: Optional[Any] = None,
+    hysteresis: float = 0.0,
+    interval_points: int = 5,
+    min_distance_interval: float = 50.0,
+) -> ElevationProfile:
+    """一次计算爬升、下降、最大坡度与上/下坡距离；无距离流时坡度与距离指标为 0。"""
+    profile = ElevationProfile()
+    if altitude is None or len(altitude) == 0:
+        return profile
+    alt = as_array(altitude, missing=None)
+    profile.gain, profile.descent = _gain_descent(alt, hysteresis)
+    if distance is not None and len(distance) > 0:
+        delta_alt, delta_dis = _span_deltas(alt, distance, interval_points)
+        profile.max_grade = _max_grade(delta_alt, delta_dis, min_distance_interval)
+        profile.uphill_km, profile.downhill_km = _updown_km(delta_alt, delta_dis, min_distance_interval)
+    return profile
+
+
+def elevation_gain(altitude_data: List[float], hysteresis: float = 0.0) -> float:
+    if altitude_data is None or len(altitude_data) == 0:
         return 0.0
-    gain = 0.0
-    for i in range(1, len(filtered)):
-        d = filtered[i] - filtered[i - 1]
-        if d > 0:
-            gain += d
-    return gain
+    return _gain_descent(altitude_data, hysteresis)[0]
 
 
-def total_descent(altitude_data: List[int]) -> int:
-    if not altitude_data:
+def total_descent(altitude_data: List[int], hysteresis: float = 0.0) -> int:
+    if altitude_data is None or len(altitude_data) == 0:
         return 0
-    total = 0.0
-    descending = False
-    start_alt = altitude_data[0]
-    min_alt = altitude_data[0]
-    for i in range(1, len(altitude_data)):
-        prev, curr = altitude_data[i - 1], altitude_data[i]
-        if curr < prev:
-            if not descending:
-                descending = True
-                start_alt = prev
-                min_alt = curr
-            else:
-                if curr < min_alt:
-                    min_alt = curr
-        else:
-            if descending:
-                total += start_alt - min_alt
-                descending = False
-    if descending:
-        total += start_alt - min_alt
-    return int(total)
+    return int(_gain_descent(altitude_data, hysteresis)[1])
 
 
 def max_grade_percent(altitude: List[int], distance: List[float], interval_points: int = 5, min_distance_interval: float = 50.0) -> float:
-    if not altitude or not distance:
+    if altitude is None or distance is None or len(altitude) == 0 or len(distance) == 0:
         return 0.0
-    n = min(len(altitude), len(distance))
-    max_grade = 0.0
-    for i in range(interval_points, n):
-        a0, a1 = altitude[i - interval_points], altitude[i]
-        d0, d1 = distance[i - interval_points], distance[i]
-        if a0 is None or a1 is None or d0 is None or d1 is None:
-            continue
-        delta_alt = a1 - a0
-        delta_dis = d1 - d0
-        if delta_dis > min_distance_interval and delta_dis < 1000:
-            g = (delta_alt / delta_dis) * 100.0
-            if abs(g) <= 50:
-                max_grade = max(max_grade, abs(g))
-    return round(max_grade, 2)
-
-
-def uphill_downhill_distance_km(altitude: List[int], distance: List[float], interval_points: int = 5, min_distance_interval: float = 50.0) -> (float, float): # type: ignore
-    if not altitude or not distance:
-        return 0.0, 0.0
-    n = min(len(altitude), len(distance))
-    uphill = 0.0
-    downhill = 0.0
-    for i in range(interval_points, n):
-        a0, a1 = altitude[i - interval_points], altitude[i]
-        d0, d1 = distance[i - interval_points], distance[i]
-        if a0 is None or a1 is None or d0 is None or d1 is None:
-            continue
-        delta_alt = a1 - a0
-        delta_dis = d1 - d0
-        if delta_alt > 1 and delta_dis > min_distance_interval:
-            uphill += delta_dis
-        if delta_alt < -1 and delta_dis > min_distance_interval:
-            downhill += delta_dis
-    return round(uphill / 1000.0, 2), round(downhill / 1000.0, 2)
+    return _max_grade(*_span_deltas(altitude, distance, interval_points), min_distance_interval)
 
+
+def uphill_downhill_distance_km(altitude: List[int], distance: List[float], interval_points: int = 5, min_distance_interval: float = 50.0) -> Tuple[float, float]:
+    if altitude is None or distance is None or len(altitude) == 0 or len(distance) == 0:
+        return 0.0, 0.0
+    return _updown_km(*_span_deltas(altitude, distance, interval_points), min_distance_interval)
@@ -0,0 +1,87 @@
+"""
+踏频 / 踏板动态 / 速度相关指标内核（NumPy 掩码归约）
+
+输入为 AnalysisContext 中的通道数组（float64，缺失样本为 NaN），NaN 参与的比较均为 False，
+因此“非 None 且 ≥ 0”之类的筛选统一写成一次掩码：
+- valid_mean        ：≥ 0 样本的平均值（踏板动态各通道）；
+- pedal_dynamics    ：左右平衡、扭矩效率、踏板平顺度；
+- total_strokes     ：总踏频转数 Σ cad[i]·max(0, t[i] − t[i−1]) / 60；
+- avg_stride_length ：逐点步幅 v·60 / 步频 的平均值；
+- coasting_seconds  ：速度低于阈值或功率低于阈值的样本数。
+"""
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .context import AnalysisContext
+
+# 滑行判定：功率低于该值（W）视为未踩踏；速度低于 1 km/h 视为停止
+# （本地 speed 流单位为 km/h，Strava velocity_smooth 为 m/s）
+COASTING_MAX_POWER = 10
+COASTING_MIN_SPEED_KMH = 1.0
+COASTING_MIN_SPEED_MS = 0.27778
+
+PEDAL_CHANNELS = (
+    'left_torque_effectiveness',
+    'right_torque_effectiveness',
+    'left_pedal_smoothness',
+    'right_pedal_smoothness',
+)
+
+
+def valid_mean(values: np.ndarray) -> Optional[float]:
+    """≥ 0 样本的平均值；无有效样本时为 None。"""
+    valid = values[values >= 0]
+    return float(valid.mean()) if valid.size else None
+
+
+def pedal_dynamics(context: AnalysisContext) -> Dict[str, Any]:
+    """左右平衡（按左脚百分比取整）与左右扭矩效率、踏板平顺度（保留 2 位小数）。"""
+    res: Dict[str, Any] = {}
+    lrb = valid_mean(context.array('left_right_balance'))
+    if lrb is not None:
+        left_pct = int(round(lrb))
+        res['left_right_balance'] = {'left': left_pct, 'right': 100 - left_pct}
+    else:
+        res['left_right_balance'] = None
+    for key in PEDAL_CHANNELS:
+        avg = valid_mean(context.array(key))
+        res[key] = round(avg, 2) if avg is not None else None
+    return res
+
+
+def total_strokes(cadence: np.ndarray, time: np.ndarray) -> int:
+    """按时间差累计的总转数；时间差为负时按 0 计。整数踏频/秒级时间下先求和再除以 60，结果精确。"""
+    dt = np.maximum(np.diff(time), 0)
+    return int(round(float((cadence[1:] * dt).sum()) / 60.0))
+
+
+def avg_stride_length(speed: np.ndarray, step_cadence: np.ndarray) -> Optional[float]:
+    """步幅（m/步）= 速度（m/s）× 60 / 步频（步/分），只取两者均 > 0 的样本；无有效样本时为 None。"""
+    n = min(speed.size, step_cadence.size)
+    v, c = speed[:n], step_cadence[:n]
+    valid = (v > 0) & (c > 0)
+    if not valid.any():
+        return None
+    return round(float((v[valid] * 60.0 / c[valid]).mean()), 2)
+
+
+def coasting_seconds(
+    speed: np.ndarray,
+    power: Optional[np.ndarray],
+    min_speed: float,
+    max_power: float = COASTING_MAX_POWER,
+) -> int:
+    """
+    滑行秒数（1 Hz 样本数）：速度 < min_speed，或有功率流时功率 < max_power。
+
+    功率流中缺失或超出功率流长度的样本按 0 W 计。
+    """
+    coasting = ~(speed >= min_speed)
+    if power is not None and power.size:
+        watts = np.zeros(speed.size)
+        n = min(speed.size, power.size)
+        watts[:n] = np.nan_to_num(power[:n])
+        coasting |= watts < max_power
+    return int(np.count_nonzero(coasting))
@@ -0,0 +1,101 @@
+"""
+单次分析请求的数组上下文（AnalysisContext）
+
+/all 等聚合接口的各个分区（power / heartrate / training_effect ...）读取同一份流数据；
+本对象在请求开始时创建一次，把常用通道转成 NumPy 数组并惰性缓存派生量
+（功率数组、正功率 NP、按真实时间轴计算的 xPower、清洗后的心率等），各分区共享，不再各自从列表重建或重复计算。
+其余通道（踏频、速度、时间、踏板动态等）经 array(key) 按需转换并缓存。
+
+- from_stream_data：本地 FIT 流字典（键为 power / heart_rate，值为列表）；
+- from_strava     ：Strava 流字典（键为 watts / heartrate，值为 {'data': [...]}）。
+"""
+
+from functools import cached_property
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .hr import clean_hr
+from .power import normalized_power, x_power
+from .rolling import as_array
+
+
+def _strava_data(stream_data: Dict[str, Any], key: str) -> Any:
+    item = stream_data.get(key)
+    if isinstance(item, dict):
+        return item.get('data') or []
+    return item or []
+
+
+class AnalysisContext:
+    """请求级数组缓存；属性首次访问时计算。"""
+
+    def __init__(self, power: Any = None, heart_rate: Any = None, streams: Optional[Dict[str, Any]] = None):
+        self._power_raw = power if power is not None else []
+        self._hr_raw = heart_rate if heart_rate is not None else []
+        self._streams = streams or {}
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_stream_data(cls, stream_data: Optional[Dict[str, Any]]) -> "AnalysisContext":
+        stream_data = stream_data or {}
+        return cls(stream_data.get('power'), stream_data.get('heart_rate'), stream_data)
+
+    @classmethod
+    def from_strava(cls, stream_data: Optional[Dict[str, Any]]) -> "AnalysisContext":
+        stream_data = stream_data or {}
+        return cls(_strava_data(stream_data, 'watts'), _strava_data(stream_data, 'heartrate'), stream_data)
+
+    def array(self, key: str) -> np.ndarray:
+        """任意通道（按原始流字典的键）的 float64 数组，缺失样本为 NaN；通道不存在时为空数组。"""
+        arr = self._arrays.get(key)
+        if arr is None:
+            arr = as_array(_strava_data(self._streams, key), missing=None)
+            self._arrays[key] = arr
+        return arr
+
+    @cached_property
+    def power(self) -> np.ndarray:
+        """功率（float64，缺失按 0）。"""
+        return as_array(self._power_raw)
+
+    @cached_property
+    def positive_power(self) -> np.ndarray:
+        """大于 0 的功率样本（与各分区 valid_powers 口径一致）。"""
+        return self.power[self.power > 0]
+
+    @cached_property
+    def normalized_power(self) -> Optional[int]:
+        """正功率样本的 NP；无功率时为 None。"""
+        if self.positive_power.size == 0:
+            return None
+        return int(normalized_power(self.positive_power))
+
+    @cached_property
+    def timestamps(self) -> Optional[np.ndarray]:
+        """与功率逐点对应的采样时间（秒）：本地流为 timestamp，Strava 为 time；
+        缺失、长度不一致、含无效值或非升序时为 None（按等间隔 1 Hz 处理）。"""
+        for key in ('timestamp', 'time'):
+            t = self.array(key)
+            if t.size:
+                break
+        if t.size != self.power.size or t.size == 0 or not np.isfinite(t).all() or (np.diff(t) < 0).any():
+            return None
+        return t
+
+    @cached_property
+    def x_power(self) -> Optional[int]:
+        """全部功率样本（含 0 W）的 xPower，EWMA 按真实时间轴跨越记录缺口衰减；无正功率时为 None。"""
+        if self.positive_power.size == 0:
+            return None
+        return int(x_power(self.power, timestamps=self.timestamps))
+
+    @cached_property
+    def hr(self) -> np.ndarray:
+        """清洗后的心率（无效样本为 NaN，下标与原始流一致）。"""
+        return clean_hr(self._hr_raw)
+
+    @cached_property
+    def valid_hr(self) -> np.ndarray:
+        """有效心率样本（按原始顺序）。"""
+        return self.hr[np.isfinite(self.hr)]
@@ -0,0 +1,115 @@
+"""
+衍生流计算内核（NumPy 向量化，FIT 解析与 Strava 流补齐共用）
+
+输入为等间隔或带缺口的 1 Hz 序列（list 或 ndarray，None/NaN 视为 0），输出与输入等长的列表：
+- elapsed_time  ：累计运动时间（相邻时间戳差截断到 [0, 1] 后累加）；
+- power_hr_ratio：功率/心率，保留 2 位小数；
+- spi           ：功率/踏频，保留 2 位小数；
+- torque        ：扭矩 N·m = P / (cad·2π/60)，取整；
+- vam           ：爬升速率（m/h ×1.4），以 50 s 时间窗计算，窗口覆盖不足一半时为 0，截断到 ±5000；
+- w_balance     ：见 wbal.w_balance_stream；
+- gap           ：逐点坡度调整配速（秒/公里），见 pace.grade_adjusted_pace。
+
+成对通道按两者中较短的长度计算；任一输入为空时返回空列表。
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .pace import grade_adjusted_pace
+from .rolling import as_array
+from .wbal import w_balance_stream
+
+DERIVED_CHANNELS = ('power_hr_ratio', 'spi', 'torque', 'vam', 'w_balance', 'gap')
+
+VAM_WINDOW_SECONDS = 50
+VAM_LIMIT = 5000
+
+
+def _paired(a: Any, b: Any):
+    x, y = as_array(a), as_array(b)
+    n = min(x.size, y.size)
+    return x[:n], y[:n]
+
+
+def elapsed_time(timestamps: Any) -> List[int]:
+    t = as_array(timestamps)
+    if t.size == 0:
+        return []
+    diffs = np.clip(np.diff(t, prepend=t[0]), 0, 1)
+    return np.cumsum(diffs).astype(int).tolist()
+
+
+def power_hr_ratio(power: Any, heart_rate: Any) -> List[float]:
+    p, hr = _paired(power, heart_rate)
+    out = np.zeros_like(p)
+    np.divide(p, hr, out=out, where=(p > 0) & (hr > 0))
+    return np.round(out, 2).tolist()
+
+
+def spi(power: Any, cadence: Any) -> List[float]:
+    p, cad = _paired(power, cadence)
+    out = np.zeros_like(p)
+    np.divide(p, cad, out=out, where=(p > 0) & (cad > 0))
+    return np.round(out, 2).tolist()
+
+
+def torque(power: Any, cadence: Any) -> List[int]:
+    p, cad = _paired(power, cadence)
+    out = np.zeros_like(p)
+    np.divide(p, cad * 2 * np.pi / 60, out=out, where=(p > 0) & (cad > 0))
+    return np.round(out).astype(int).tolist()
+
+
+def vam(timestamps: Any, altitudes: Any, window_seconds: int = VAM_WINDOW_SECONDS) -> List[int]:
+    t, alt = _paired(timestamps, altitudes)
+    if t.size == 0:
+        return []
+    idx = np.searchsorted(t, t - window_seconds, side='left')
+    idx = np.minimum(idx, np.arange(t.size))
+    delta_time = t - t[idx]
+    delta_alt = alt - alt[idx]
+    out = np.zeros_like(delta_alt)
+    valid = delta_time >= window_seconds * 0.5
+    out[valid] = delta_alt[valid] / (delta_time[valid] / 3600.0) * 1.4
+    return np.round(np.clip(out, -VAM_LIMIT, VAM_LIMIT)).astype(int).tolist()
+
+
+def derive_streams(
+    timestamp: Any,
+    altitude: Any,
+    power: Any,
+    heart_rate: Any,
+    cadence: Any,
+    athlete_info: Optional[Dict[str, Any]] = None,
+    channels: Iterable[str] = DERIVED_CHANNELS,
+    speed: Any = None,
+    distance: Any = None,
+    enhanced_altitude: Any = None,
+) -> Dict[str, List]:
+    """
+    一次性计算所需的衍生通道，返回 {通道名: 列表}。
+
+    athlete_info 取 ftp / wj / tau_model（与解析器的 athlete_info 一致），缺失时 w_balance 全为 0；
+    gap 使用 speed（m/s）、distance（m）与 enhanced_altitude（缺省时用 altitude）。
+    """
+    athlete_info = athlete_info or {}
+    wanted = set(channels)
+    power_np = as_array(power)
+    out: Dict[str, List] = {}
+    if 'power_hr_ratio' in wanted:
+        out['power_hr_ratio'] = power_hr_ratio(power_np, heart_rate)
+    if 'spi' in wanted:
+        out['spi'] = spi(power_np, cadence)
+    if 'torque' in wanted:
+        out['torque'] = torque(power_np, cadence)
+    if 'vam' in wanted:
+        out['vam'] = vam(timestamp, altitude)
+    if 'w_balance' in wanted:
+        out['w_balance'] = w_balance_stream(
+            power_np, athlete_info.get('ftp'), athlete_info.get('wj'), athlete_info.get('tau_model')
+        )
+    if 'gap' in wanted:
+        out['gap'] = grade_adjusted_pace(speed, altitude if enhanced_altitude is None else enhanced_altitude, distance)
+    return out
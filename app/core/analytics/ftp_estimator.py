@@ -3,7 +3,7 @@
 
 设计说明（来自产品规格）：
 ----------------------------------------
-- 每位运动员对应的功率曲线存储在 ``data/best_power/<athlete_id>.json``。
+- 每位运动员对应的功率曲线存储在 ``data/best_power/<athlete_id>.npy``（见 best_power_file_repo）。
   其中 ``best_curve[t-1]`` 代表时长 ``t`` 秒的最大平均功率（MMP）。
 - 综合三种互补估计器：
     * FTP_A：P20 快速估算法（20 分钟功率的 95%）。
@@ -11,19 +11,26 @@
     * FTP_C：长时段锚点，优先使用 ≥40/60 分钟覆盖，若缺失则退回 CP 预测。
 - 根据覆盖度启发式分配权重：覆盖时长越长，FTP_C 权重越高；不足 20 分钟时加大 CP 权重。
 - 通过可信度标签提示下游使用方当前数据的可靠程度。
+- 估算结果按 (运动员, 窗口, 曲线文件版本) 缓存在进程内（见 get_ftp_estimate），
+  曲线文件未变化时不再重复读曲线与拟合 CP。
 """
 
 from __future__ import annotations
 
-import json
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
+from ...config import FTP_ESTIMATE_WINDOW_MIN_ACTIVITIES, FTP_ESTIMATE_WINDOW_MIN_SECONDS
+
 BEST_POWER_DIR = Path("data/best_power")
 _DURATION_GRID = [120, 180, 300, 480, 720, 900, 1200, 1800, 2400, 3600]
+_ESTIMATE_CACHE_SIZE = 1024
 
 
 @dataclass
@@ -37,19 +44,39 @@ class FTPEstimate:
 
 
 def _load_best_curve(athlete_id: int, base_dir: Path = BEST_POWER_DIR) -> Optional[List[float]]:
-    path = base_dir / f"{athlete_id}.json"
-    if not path.exists():
-        return None
+    # 统一走最佳功率曲线仓库（二进制存储 + mtime 失效的进程内读缓存，兼容旧 JSON）
+    from ...repositories.best_power_file_repo import load_best_curve_array
+
     try:
-        with path.open("r", encoding="utf-8") as fh:
-            payload = json.load(fh)
-        curve = payload.get("best_curve") or []
-        if not isinstance(curve, list) or not curve:
-            return None
-        return [float(p) if p is not None else 0.0 for p in curve]
-    except (json.JSONDecodeError, OSError, ValueError):
+        curve = load_best_curve_array(athlete_id, base_dir=str(base_dir))
+    except (OSError, ValueError):
         return None
+    if curve is None or curve.size == 0:
+        return None
+    return curve.astype(np.float64).tolist()
+
 
+def _load_recent_curve(
+    athlete_id: int,
+    window_days: int,
+    min_seconds: int = FTP_ESTIMATE_WINDOW_MIN_SECONDS,
+    min_activities: int = FTP_ESTIMATE_WINDOW_MIN_ACTIVITIES,
+) -> Optional[List[float]]:
+    """读取最近 window_days 天内活动合并的最佳功率曲线（逐活动列式存储的区间最大查询）。
+
+    逐活动曲线只包含上线后分析过的活动，窗口内曲线短于 min_seconds 秒或活动数少于
+    min_activities 时视为覆盖不足，返回 None 由调用方回退到历史全局曲线。
+    """
+    from ...repositories.activity_curve_repo import query_best_curve
+
+    end = datetime.now()
+    try:
+        curve, count = query_best_curve(athlete_id, end - timedelta(days=window_days), end)
+    except (OSError, ValueError):
+        return None
+    if curve is None or curve.size < max(min_seconds, 1) or count < min_activities:
+        return None
+    return curve.astype(np.float64).tolist()
 
 
 def _mmp_at(curve: List[float], duration: int) -> Optional[float]:
@@ -134,13 +161,25 @@ def _confidence_label(curve: List[float]) -> str:
 def estimate_ftp_from_best_curve(
     athlete_id: int,
     base_dir: Path = BEST_POWER_DIR,
+    window_days: Optional[int] = None,
 ) -> FTPEstimate:
     """
     读取历史最佳功率曲线并估算 FTP。
 
+    window_days 不为空时优先使用最近 N 天活动合并的曲线（反映近期状态），
+    该窗口内曲线覆盖不足（时长或活动数低于 FTP_ESTIMATE_WINDOW_MIN_*）时回退到历史全局曲线。
+
     返回值为 FTPEstimate 数据类，包含综合 FTP、各子估计结果、覆盖标记、权重以及可信度。
     """
-    curve = _load_best_curve(athlete_id, base_dir=base_dir)
+    curve = _load_recent_curve(athlete_id, window_days) if window_days else None
+    if curve:
+        curve_source = f"last {window_days}d curve"
+    elif window_days:
+        curve_source = f"all-time curve (last {window_days}d coverage insufficient)"
+    else:
+        curve_source = "all-time curve"
+    if not curve:
+        curve = _load_best_curve(athlete_id, base_dir=base_dir)
     if not curve:
         return FTPEstimate(
             ftp=None,
@@ -190,7 +229,7 @@ def estimate_ftp_from_best_curve(
         blended_ftp = float(sum(components[k] * norm_weights[k] for k in valid_keys))
 
     confidence = _confidence_label(curve)
-    notes_parts = []
+    notes_parts = [curve_source]
     if cov60:
         notes_parts.append(">=60min coverage")
     elif cov40:
@@ -213,4 +252,40 @@ def estimate_ftp_from_best_curve(
     )
 
 
-__all__ = ["estimate_ftp_from_best_curve", "FTPEstimate"]
+_estimate_cache: "OrderedDict[Tuple[Any, ...], FTPEstimate]" = OrderedDict()
+_estimate_cache_lock = threading.Lock()
+
+
+def _estimate_cache_key(athlete_id: int, window_days: Optional[int]) -> Tuple[Any, ...]:
+    """缓存键：运动员 + 窗口 + 全局曲线版本 + 逐活动曲线版本（+ 窗口滑动所依赖的当天日期）。"""
+    from ...repositories.best_power_file_repo import curve_version
+    from ...repositories.activity_curve_repo import activity_curve_version
+
+    if not window_days:
+        return (int(athlete_id), None, curve_version(athlete_id), None, None)
+    return (
+        int(athlete_id),
+        int(window_days),
+        curve_version(athlete_id),
+        activity_curve_version(athlete_id),
+        date.today().isoformat(),
+    )
+
+
+def get_ftp_estimate(athlete_id: int, window_days: Optional[int] = None) -> FTPEstimate:
+    """带缓存的 FTP 估算（默认曲线目录）；曲线文件版本变化后自动重新估算。"""
+    key = _estimate_cache_key(athlete_id, window_days)
+    with _estimate_cache_lock:
+        hit = _estimate_cache.get(key)
+        if hit is not None:
+            _estimate_cache.move_to_end(key)
+            return hit
+    estimate = estimate_ftp_from_best_curve(athlete_id, window_days=window_days)
+    with _estimate_cache_lock:
+        _estimate_cache[key] = estimate
+        while len(_estimate_cache) > _ESTIMATE_CACHE_SIZE:
+            _estimate_cache.popitem(last=False)
+    return estimate
+
+
+__all__ = ["estimate_ftp_from_best_curve", "get_ftp_estimate", "FTPEstimate"]
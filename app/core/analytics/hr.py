@@ -1,97 +1,231 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import numpy as np
 from .power import normalized_power
+from .rolling import as_array, first_within, prefix_sum
+
+# 心率有效范围上限与相邻有效样本允许的最大跳变（bpm）
+HR_MAX_VALID = 220
+HR_MAX_JUMP = 50
+
+# 心率滞后：整场搜索范围（秒）、滑动窗口的窗口/步长/搜索范围（秒）、最低相关系数
+HR_LAG_MAX_SECONDS = 300
+HR_LAG_WINDOW_SECONDS = 1200
+HR_LAG_STEP_SECONDS = 300
+HR_LAG_PROFILE_MAX_SECONDS = 120
+HR_LAG_MIN_CORRELATION = 0.3
+
+
+def hr_valid_mask(heartrate_data: Any) -> np.ndarray:
+    """
+    心率有效样本掩码（与 filter_hr_smooth 的保留规则逐点一致，但不删除样本、保持下标对齐）。
+
+    规则：None/非有限值、<30、>220 无效；与上一个有效样本（取整后）相差超过 50 的样本无效。
+    跳变规则依赖上一个保留值：连续样本之间不超过 50 的链段整段向量化判定，
+    只在链段断点处向后查找第一个重新接上的样本。
+    """
+    arr = as_array(heartrate_data, missing=None)
+    mask = np.zeros(arr.size, dtype=bool)
+    idx = np.flatnonzero(np.isfinite(arr) & (arr >= 30) & (arr <= HR_MAX_VALID))
+    if idx.size == 0:
+        return mask
+    values = arr[idx]
+    keep = np.ones(values.size, dtype=bool)
+    breaks = np.flatnonzero(np.abs(values[1:] - np.trunc(values[:-1])) > HR_MAX_JUMP) + 1
+    pos = 0
+    while True:
+        k = int(np.searchsorted(breaks, pos, side='right'))
+        if k >= breaks.size:
+            break
+        b = int(breaks[k])
+        resume = first_within(values, b, float(np.trunc(values[b - 1])), HR_MAX_JUMP)
+        keep[b:resume] = False
+        if resume >= values.size:
+            break
+        pos = resume
+    mask[idx[keep]] = True
+    return mask
+
+
+def clean_hr(heartrate_data: Any) -> np.ndarray:
+    """按 hr_valid_mask 清洗后的心率数组（float64，有效值取整、无效样本为 NaN，长度与输入一致）。"""
+    arr = as_array(heartrate_data, missing=None)
+    return np.where(hr_valid_mask(arr), np.trunc(arr), np.nan)
 
 
 def filter_hr_smooth(heartrate_data: List[Optional[int]]) -> List[int]:
-    filtered = []
-    for hr in heartrate_data:
-        if hr is None:
-            continue
-        if hr <= 0 or hr < 30:
-            continue
-        if hr > 220:
-            continue
-        if filtered and abs(hr - filtered[-1]) > 50:
-            continue
-        filtered.append(int(hr))
-    return filtered
+    arr = as_array(heartrate_data, missing=None)
+    return arr[hr_valid_mask(arr)].astype(np.int64).tolist()
+
+
+def masked_efficiency_index(np_value: Optional[float], hr: np.ndarray) -> Optional[float]:
+    """效率指数 = NP / 平均心率；hr 为 clean_hr 结果，NP 由调用方传入（不重复计算）。"""
+    valid = hr[np.isfinite(hr)]
+    if not np_value or valid.size == 0:
+        return None
+    avg_hr = float(valid.mean())
+    return round(np_value / avg_hr, 2) if avg_hr > 0 else None
+
+
+def masked_recovery_rate(hr: np.ndarray, window: int = 60) -> int:
+    """最大 window 秒心率下降（按原始下标，两端样本均有效时才计入）；hr 为 clean_hr 结果。"""
+    if hr.size < window + 1:
+        return 0
+    drops = hr[:-window] - hr[window:]
+    drops = drops[np.isfinite(drops)]
+    if drops.size == 0:
+        return 0
+    max_drop = int(drops.max())
+    return max_drop if max_drop > 0 else 0
+
+
+def masked_decoupling_rate(power: np.ndarray, hr: np.ndarray) -> Optional[str]:
+    """
+    前后半程功率/心率比的变化（%）；只统计心率有效的样本，功率与心率按下标对齐。
+
+    power 缺失值按 0 处理，hr 为 clean_hr 结果；|变化| > 30% 视为不可靠返回 None。
+    """
+    m = min(power.size, hr.size)
+    if m < 10:
+        return None
+    p, h = power[:m], hr[:m]
+    valid = np.isfinite(h)
+    sum_p = prefix_sum(np.where(valid, p, 0.0))
+    sum_h = prefix_sum(np.where(valid, h, 0.0))
+    count = prefix_sum(valid)
+    mid = m // 2
+
+    def ratio(lo: int, hi: int) -> float:
+        n = count[hi] - count[lo]
+        if n <= 0:
+            return 0.0
+        avg_h = (sum_h[hi] - sum_h[lo]) / n
+        return float((sum_p[hi] - sum_p[lo]) / n / avg_h) if avg_h > 0 else 0.0
+
+    r1 = ratio(0, mid)
+    r2 = ratio(mid, m)
+    if r1 > 0 and r2 > 0:
+        dec = (r1 - r2) / r1 * 100.0
+        if abs(dec) > 30:
+            return None
+        return f"{round(dec, 1)}%"
+    return None
 
 
 def efficiency_index(power_data: List[int], hr_data: List[int]) -> Optional[float]:
     try:
-        valid_power = [p for p in power_data if p is not None and p > 0]
-        if not valid_power:
-            return None
-        NP = normalized_power(valid_power)
-        valid_hr = filter_hr_smooth(hr_data)
-        if not valid_hr:
+        power = as_array(power_data)
+        valid_power = power[power > 0]
+        if valid_power.size == 0:
             return None
-        avg_hr = sum(valid_hr) / len(valid_hr)
-        return round(NP / avg_hr, 2) if avg_hr > 0 else None
+        return masked_efficiency_index(normalized_power(valid_power), clean_hr(hr_data))
     except Exception:
         return None
 
 
 def recovery_rate(hr_data: List[int], window: int = 60) -> int:
     try:
-        valid = filter_hr_smooth(hr_data)
-        if len(valid) < window + 1:
-            return 0
-        max_drop = 0
-        n = len(valid)
-        for i in range(n - window):
-            drop = valid[i] - valid[i + window]
-            if drop > max_drop:
-                max_drop = drop
-        return int(max_drop) if max_drop > 0 else 0
+        return masked_recovery_rate(clean_hr(hr_data), window)
     except Exception:
         return 0
 
 
 def decoupling_rate(power_data: List[int], hr_data: List[int]) -> Optional[str]:
     try:
-        m = min(len(power_data), len(hr_data))
-        if m < 10:
-            return None
-        p = power_data[:m]
-        h = hr_data[:m]
-        mid = m // 2
-        fh_p, sh_p = p[:mid], p[mid:]
-        fh_h, sh_h = h[:mid], h[mid:]
-        def ratio(pp, hh):
-            if not hh:
-                return 0.0
-            avg_p = sum(pp) / len(pp) if pp else 0
-            avg_h = sum(hh) / len(hh) if hh else 0
-            return (avg_p / avg_h) if avg_h > 0 else 0.0
-        r1 = ratio(fh_p, fh_h)
-        r2 = ratio(sh_p, sh_h)
-        if r1 > 0 and r2 > 0:
-            dec = (r1 - r2) / r1 * 100.0
-            if abs(dec) > 30:
-                return None
-            return f"{round(dec, 1)}%"
-        return None
+        return masked_decoupling_rate(as_array(power_data), clean_hr(hr_data))
     except Exception:
         return None
 
 
-def hr_lag_seconds(power_data: List[int], hr_data: List[int]) -> Optional[int]:
+def _lag_arrays(power_data: List[int], hr_data: List[int]):
+    m = min(len(power_data), len(hr_data))
+    pa = as_array(power_data[:m])
+    ha = as_array(hr_data[:m])
+    return pa, ha
+
+
+def lag_correlation(pa: np.ndarray, ha: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    有界滞后归一化互相关（FFT）。
+
+    pa/ha 为二维数组（每行一段等长序列），返回 (行数, 2·K+1) 的相关系数矩阵，
+    列 j 对应滞后 L = j − K（K = min(max_lag, 长度−1)），r[L] = Σ pa[n+L]·ha[n] / (N·σp·σh)，
+    与 np.correlate(pa, ha, 'full') 在相同滞后处只差归一化系数；常数序列的行为 NaN。
+    """
+    rows, n = pa.shape
+    k = max(0, min(int(max_lag), n - 1))
+    pa = pa - pa.mean(axis=1, keepdims=True)
+    ha = ha - ha.mean(axis=1, keepdims=True)
+    # 循环相关长度 ≥ n + K，滞后 |L| ≤ K 时不发生回绕
+    size = 1 << (n + k - 1).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(pa, size, axis=1) * np.conj(np.fft.rfft(ha, size, axis=1)), size, axis=1)
+    corr = np.concatenate((corr[:, size - k:], corr[:, :k + 1]), axis=1)
+    scale = n * pa.std(axis=1) * ha.std(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(scale[:, None] > 0, corr / scale[:, None], np.nan)
+
+
+def hr_lag_seconds(
+    power_data: List[int],
+    hr_data: List[int],
+    max_lag: int = HR_LAG_MAX_SECONDS,
+    min_correlation: float = HR_LAG_MIN_CORRELATION,
+) -> Optional[int]:
+    """
+    功率与心率的滞后秒数（1 Hz）：在 ±max_lag 内取归一化互相关最大的滞后，
+    相关系数低于 min_correlation 时返回 None。
+    """
     try:
-        if not power_data or not hr_data:
+        if power_data is None or hr_data is None or len(power_data) == 0 or len(hr_data) == 0:
+            return None
+        pa, ha = _lag_arrays(power_data, hr_data)
+        if pa.size < 2:
+            return None
+        r = lag_correlation(pa[None, :], ha[None, :], max_lag)[0]
+        if np.isnan(r).all():
             return None
-        m = min(len(power_data), len(hr_data))
-        pa = np.array([p or 0 for p in power_data[:m]], dtype=float)
-        ha = np.array([h or 0 for h in hr_data[:m]], dtype=float)
-        pa -= pa.mean()
-        ha -= ha.mean()
-        corr = np.correlate(pa, ha, mode='full')
-        lag_max = int(np.argmax(corr) - (len(pa) - 1))
-        max_corr = float(np.max(corr))
-        if max_corr < 0.3 * len(pa):
+        best = int(np.nanargmax(r))
+        if r[best] < min_correlation:
             return None
-        return abs(lag_max)
+        return abs(best - (r.size - 1) // 2)
     except Exception:
         return None
 
+
+def hr_lag_profile(
+    power_data: List[int],
+    hr_data: List[int],
+    window: int = HR_LAG_WINDOW_SECONDS,
+    step: int = HR_LAG_STEP_SECONDS,
+    max_lag: int = HR_LAG_PROFILE_MAX_SECONDS,
+    min_correlation: float = HR_LAG_MIN_CORRELATION,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    滑动窗口心率滞后：每 step 秒取一个 window 秒的窗口，返回
+    [{'start': 起点秒, 'lag': 滞后秒或 None, 'correlation': 相关系数（2 位小数）或 None}, ...]。
+    所有窗口一次批量 FFT；数据不足一个窗口时返回 None。
+    """
+    try:
+        if power_data is None or hr_data is None or len(power_data) == 0 or len(hr_data) == 0:
+            return None
+        pa, ha = _lag_arrays(power_data, hr_data)
+        if pa.size < window or window < 2:
+            return None
+        starts = np.arange(0, pa.size - window + 1, max(1, int(step)))
+        views = (np.lib.stride_tricks.sliding_window_view(arr, window)[starts] for arr in (pa, ha))
+        r = lag_correlation(*views, max_lag)
+        k = (r.shape[1] - 1) // 2
+        profile: List[Dict[str, Any]] = []
+        for start, row in zip(starts.tolist(), r):
+            if np.isnan(row).all():
+                profile.append({'start': start, 'lag': None, 'correlation': None})
+                continue
+            best = int(np.nanargmax(row))
+            corr = float(row[best])
+            profile.append({
+                'start': start,
+                'lag': abs(best - k) if corr >= min_correlation else None,
+                'correlation': round(corr, 2),
+            })
+        return profile
+    except Exception:
+        return None
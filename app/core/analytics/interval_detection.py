@@ -13,6 +13,8 @@ from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 
+from . import rolling
+
 
 @dataclass
 class IntervalDetectionConfig:
@@ -283,27 +285,11 @@ def _compute_channels(series: np.ndarray, cfg: IntervalDetectionConfig) -> Tuple
 
 
 def _moving_average(series: np.ndarray, window: int) -> np.ndarray:
-    if window <= 1 or series.size < window:
-        return series.astype(float)
-    pad_left = window // 2
-    pad_right = window - 1 - pad_left
-    padded = np.pad(series, (pad_left, pad_right), mode="edge")
-    kernel = np.ones(window, dtype=float) / window
-    return np.convolve(padded, kernel, mode="valid")
+    return rolling.centered_mean(series, window, missing=None)
 
 
 def _rolling_median(series: np.ndarray, window: int) -> np.ndarray:
-    if series.size == 0:
-        return np.array([])
-    if window <= 1:
-        return series.astype(float)
-    half = window // 2
-    padded = np.pad(series, (half, half), mode="edge")
-    medians = np.empty(series.size, dtype=float)
-    for idx in range(series.size):
-        segment = padded[idx : idx + window]
-        medians[idx] = float(np.median(segment))
-    return medians
+    return rolling.centered_median(series, window, missing=None)
 
 
 def _compute_theta(fast: np.ndarray, baseline: np.ndarray, ftp: float) -> float:
@@ -4,12 +4,19 @@
 - NGP（标准化坡度配速）：考虑坡度影响的标准化配速
 - 用于跑步活动的训练负荷计算（rTSS）
 - 基于专业版（可复现/可校准）方法实现
+- GAP（坡度调整配速）：逐点等效平路配速，用于跑步图表
+- 坡度窗口在距离轴上以向量化二分定位，全部计算向量化
 """
 
 from typing import List, Optional
 import numpy as np
 import re
 
+from .rolling import as_array
+
+# 低于该速度（m/s，约 33 min/km）的样本视为停止，GAP 记为 0
+GAP_MIN_SPEED = 0.5
+
 
 def parse_pace_string(pace_str: str) -> Optional[int]:
     """
@@ -51,6 +58,76 @@ def parse_pace_string(pace_str: str) -> Optional[int]:
     return None
 
 
+def _grade_array(altitudes: np.ndarray, distances: np.ndarray, window_meters: float) -> np.ndarray:
+    """
+    距离窗口坡度（%），未平滑。
+
+    窗口左端为满足 d[i] − d[j] ≥ window/2 的最大 j ≤ i（不存在时取首个样本），
+    右端为满足 d[j] − d[i] ≥ window/2 的最小 j ≥ i（不存在时取末个样本），与逐点向外扩展的原实现一致。
+    两端下标在累计最大距离上对上述判定式本身做向量化二分（距离回退不破坏单调性）：
+    直接比较 d[i] ± window/2 会因浮点舍入在边界上差一个样本，停止时的重复距离更会差出整段平台。
+    """
+    n = distances.size
+    half = window_meters / 2
+    axis = np.maximum.accumulate(distances)
+    idx = np.arange(n)
+
+    # 左端：[0, i] 内判定式为真的前缀长度（首个为假的下标）
+    lo, hi = np.zeros(n, dtype=np.int64), idx + 1
+    while True:
+        active = lo < hi
+        if not active.any():
+            break
+        mid = (lo + hi) // 2
+        ok = axis - axis[np.minimum(mid, n - 1)] >= half
+        lo = np.where(active & ok, mid + 1, lo)
+        hi = np.where(active & ~ok, mid, hi)
+    start = np.maximum(lo - 1, 0)
+
+    # 右端：[i, n) 内判定式首次为真的下标
+    lo, hi = idx.copy(), np.full(n, n, dtype=np.int64)
+    while True:
+        active = lo < hi
+        if not active.any():
+            break
+        mid = (lo + hi) // 2
+        ok = axis[np.minimum(mid, n - 1)] - axis >= half
+        hi = np.where(active & ok, mid, hi)
+        lo = np.where(active & ~ok, mid + 1, lo)
+    end = np.minimum(lo, n - 1)
+
+    delta_alt = altitudes[end] - altitudes[start]
+    delta_dist = distances[end] - distances[start]
+    grades = np.zeros(n, dtype=np.float64)
+    np.divide(delta_alt, delta_dist, out=grades, where=(end > start) & (delta_dist > 0))
+    return grades * 100.0
+
+
+def _smooth3(values: np.ndarray) -> np.ndarray:
+    """3 点居中移动平均，两端只取已有样本（逐点相加，不用前缀和，长序列无累积舍入误差）。"""
+    out = np.empty(values.size, dtype=np.float64)
+    out[1:-1] = (values[:-2] + values[1:-1] + values[2:]) / 3
+    out[0] = (values[0] + values[1]) / 2
+    out[-1] = (values[-2] + values[-1]) / 2
+    return out
+
+
+def grade_series(
+    altitudes: List[float],
+    distances: List[float],
+    window_meters: float = 30.0,
+) -> np.ndarray:
+    """calculate_grade_from_track 的数组版本；输入不合法时返回空数组。"""
+    if altitudes is None or distances is None or len(altitudes) == 0 or len(altitudes) != len(distances):
+        return np.empty(0)
+    alt = as_array(altitudes)
+    dist = as_array(distances)
+    if alt.size < 2:
+        return np.zeros(alt.size)
+    grades = _grade_array(alt, dist, window_meters)
+    return _smooth3(grades) if grades.size > 3 else grades
+
+
 def calculate_grade_from_track(
     altitudes: List[float],
     distances: List[float],
@@ -60,7 +137,7 @@ def calculate_grade_from_track(
     从轨迹计算坡度
     
     使用距离窗口（默认30米）计算局部斜率，定义为高程变化/距离变化。
-    计算后进行平滑处理以去除噪声。
+    计算后进行平滑处理以去除噪声（3 点移动平均）。
     
     参数：
         altitudes: 海拔序列（米），假定1Hz采样
@@ -70,50 +147,13 @@ def calculate_grade_from_track(
     返回：
         坡度百分比序列（%），正值表示上坡，负值表示下坡
     """
-    if not altitudes or not distances or len(altitudes) != len(distances):
-        return []
-    
-    n = len(altitudes)
-    if n < 2:
-        return [0.0] * n
-    
-    grades: List[float] = []
-    
-    for i in range(n):
-        # 找到窗口范围内的点
-        target_dist = distances[i]
-        start_idx = i
-        end_idx = i
-        
-        # 向前查找
-        while start_idx > 0 and (target_dist - distances[start_idx]) < window_meters / 2:
-            start_idx -= 1
-        
-        # 向后查找
-        while end_idx < n - 1 and (distances[end_idx] - target_dist) < window_meters / 2:
-            end_idx += 1
-        
-        if end_idx > start_idx:
-            delta_alt = altitudes[end_idx] - altitudes[start_idx]
-            delta_dist = distances[end_idx] - distances[start_idx]
-            if delta_dist > 0:
-                grade_pct = (delta_alt / delta_dist) * 100.0
-                grades.append(grade_pct)
-            else:
-                grades.append(0.0)
-        else:
-            grades.append(0.0)
-    
-    # 平滑处理（简单的移动平均）
-    if len(grades) > 3:
-        smoothed = []
-        for i in range(len(grades)):
-            start = max(0, i - 1)
-            end = min(len(grades), i + 2)
-            smoothed.append(np.mean(grades[start:end]))
-        return smoothed
-    
-    return grades
+    return grade_series(altitudes, distances, window_meters).tolist()
+
+
+def adjustment_factors(grades_pct: np.ndarray) -> np.ndarray:
+    """calculate_adjustment_factor 的向量化版本。"""
+    g = np.clip(np.asarray(grades_pct, dtype=np.float64), -15.0, 15.0) / 100.0
+    return np.where(g >= 0, 1.0 + 4.5 * g + 2.0 * g ** 2, 1.0 + 1.5 * g + 3.0 * g ** 2)
 
 
 def calculate_adjustment_factor(grade_pct: float) -> float:
@@ -134,17 +174,7 @@ def calculate_adjustment_factor(grade_pct: float) -> float:
     返回：
         调整因子，adj > 1 表示比平地更耗能，adj < 1 表示比平地更省力
     """
-    # 限制坡度范围
-    g = np.clip(grade_pct, -15.0, 15.0) / 100.0  # 转换为小数坡度
-    
-    if g >= 0:
-        # 上坡
-        adj = 1.0 + 4.5 * g + 2.0 * (g ** 2)
-    else:
-        # 下坡
-        adj = 1.0 + 1.5 * g + 3.0 * (g ** 2)
-    
-    return float(adj)
+    return float(adjustment_factors(grade_pct))
 
 
 def calculate_normalized_graded_pace(
@@ -171,36 +201,21 @@ def calculate_normalized_graded_pace(
     返回：
         NGP配速（秒/公里），如果输入不合法返回None
     """
-    if not speeds or not altitudes or not distances:
+    if speeds is None or altitudes is None or distances is None:
         return None
     
     n = min(len(speeds), len(altitudes), len(distances))
     if n < 2:
         return None
     
-    # 确保所有序列长度一致
-    speeds_arr = np.array(speeds[:n])
-    altitudes_arr = np.array(altitudes[:n])
-    distances_arr = np.array(distances[:n])
-    
-    # 1. 计算坡度
-    grades = calculate_grade_from_track(
-        altitudes_arr.tolist(),
-        distances_arr.tolist(),
-        window_meters
-    )
-    
-    if not grades:
+    # 1. 计算坡度（序列截取到相同长度）
+    distances_arr = as_array(distances[:n])
+    grades = grade_series(altitudes[:n], distances_arr, window_meters)
+    if grades.size == 0:
         return None
     
-    # 2. 计算每一点的调整因子
-    adj_factors = [calculate_adjustment_factor(g) for g in grades]
-    
-    # 3. 计算等效平路时间
-    # 假设每秒采样一次，dt = 1秒
-    # time_eq = Σ(dt * adj) = Σ(1 * adj)
-    time_eq = sum(adj_factors)
-    
+    # 2~3. 等效平路时间：假设每秒采样一次，time_eq = Σ(dt * adj) = Σ(1 * adj)
+    time_eq = float(adjustment_factors(grades).sum())
     if time_eq <= 0:
         return None
     
@@ -221,6 +236,32 @@ def calculate_normalized_graded_pace(
     return None
 
 
+def grade_adjusted_pace(
+    speeds: List[float],  # 速度（米/秒）
+    altitudes: List[float],  # 海拔（米）
+    distances: List[float],  # 累计距离（米）
+    window_meters: float = 30.0,
+    min_speed: float = GAP_MIN_SPEED,
+) -> List[float]:
+    """
+    逐点坡度调整配速（GAP，秒/公里，保留 1 位小数）
+
+    等效平路速度 = 速度 × adj_factor(坡度)，配速 = 1000 / 等效平路速度；
+    速度低于 min_speed（停止/步行）的样本为 0。坡度不可用时按平路处理。
+    """
+    if speeds is None or len(speeds) == 0:
+        return []
+    v = as_array(speeds)
+    n = min(v.size, len(altitudes) if altitudes is not None else 0, len(distances) if distances is not None else 0)
+    adj = np.ones(v.size)
+    if n >= 2:
+        adj[:n] = adjustment_factors(grade_series(altitudes[:n], distances[:n], window_meters))
+    flat_speed = v * adj
+    pace = np.zeros(v.size)
+    np.divide(1000.0, flat_speed, out=pace, where=(v >= min_speed) & (flat_speed > 0))
+    return np.round(pace, 1).tolist()
+
+
 def calculate_running_intensity_factor(
     ngp: float,
     ft_pace: int
@@ -1,31 +1,48 @@
-from collections import deque
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
+import numpy as np
 
-def normalized_power(powers: List[int], window: int = 30) -> int: # ! 用numpy实现
-    """Compute normalized power using an O(n) rolling average and 4th-power mean.
+from .rolling import ewma, fill_gaps, rolling_mean, time_rolling_mean
+
+
+def normalized_power(powers: List[int], window: int = 30, timestamps: Optional[Sequence[float]] = None) -> int:
+    """Compute normalized power from a trailing rolling average and 4th-power mean.
 
     Args:
         powers: sequence of power values (assumed 1Hz sampling)
         window: rolling average window length in seconds (default 30)
+        timestamps: optional sample times in seconds (ascending); when given the rolling
+            average covers (t - window, t] on the real time axis, so pauses do not join
+            efforts on either side of them
     """
-    if not powers:
+    if powers is None or len(powers) == 0:
         return 0
-    q = deque()
-    s = 0.0
-    rolling = []
-    for p in powers:
-        v = float(p or 0)
-        q.append(v)
-        s += v
-        if len(q) > window:
-            s -= q.popleft()
-        rolling.append(s / len(q))
-    if not rolling:
+    if timestamps is not None:
+        rolling = time_rolling_mean(timestamps, powers, window)
+    else:
+        rolling = rolling_mean(powers, window)
+    return int(round(float(np.mean(rolling ** 4)) ** 0.25))
+
+
+def x_power(powers: List[int], span: float = 25.0, timestamps: Optional[Sequence[float]] = None) -> int:
+    """Compute xPower (Skiba): 25 s exponentially weighted average, then 4th-power mean.
+
+    Args:
+        powers: sequence of power values (assumed 1Hz sampling)
+        span: EWMA time constant in seconds (default 25)
+        timestamps: optional sample times in seconds (ascending); when given the average
+            decays through recording gaps on a 1 Hz grid and the mean is taken over the
+            recorded samples only
+    """
+    if powers is None or len(powers) == 0:
         return 0
-    fourth_powers = [x ** 4 for x in rolling]
-    mean_fourth = sum(fourth_powers) / len(fourth_powers)
-    return int(round(mean_fourth ** 0.25))
+    if timestamps is not None:
+        grid, filled = fill_gaps(timestamps, powers)
+        recorded = np.rint(np.asarray(timestamps, dtype=np.float64)).astype(np.int64) - grid[0]
+        smoothed = ewma(filled, span)[recorded]
+    else:
+        smoothed = ewma(powers, span)
+    return int(round(float(np.mean(smoothed ** 4)) ** 0.25))
 
 
 def work_above_ftp(powers: List[int], ftp: float) -> int:
@@ -40,11 +57,13 @@ def work_above_ftp(powers: List[int], ftp: float) -> int:
 
 
 def w_balance_decline(w_balance: List[Optional[float]]) -> Optional[float]:
-    if not w_balance:
+    """W′bal 最大降幅：首个有效值 − 最小值（接受列表或 W′bal 引擎输出的数组）。"""
+    if w_balance is None or len(w_balance) == 0:
         return None
-    vals = [w for w in w_balance if w is not None]
-    if not vals:
+    vals = np.asarray(w_balance, dtype=np.float64)
+    vals = vals[np.isfinite(vals)]
+    if not vals.size:
         return None
-    decline = vals[0] - min(vals)
+    decline = vals[0] - vals.min()
     return round(float(decline), 1)
 
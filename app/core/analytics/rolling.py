@@ -0,0 +1,245 @@
+"""
+滑动窗口计算内核（NumPy，前缀和 / 分块累积）
+
+所有函数接收序列或 ndarray（None/NaN 按 missing 参数处理，默认视为 0），返回 float64 数组：
+- rolling_sum / rolling_mean：尾随窗口（以当前样本结尾）；partial=True 时前 window-1 个样本按已有样本计算
+  （与逐点队列实现一致），partial=False 时只返回完整窗口（长度 n-window+1）；
+- centered_mean：居中窗口、两端按边缘值填充（长度不变）；missing=None 时含 NaN 的窗口输出 NaN；
+- centered_nanmean：居中窗口、两端只取已有样本、跳过 NaN（与 pandas rolling(center=True, min_periods=1).mean() 一致）；
+- rolling_max / rolling_min：完整窗口的极值（van Herk / Gil-Werman 分块前后缀极值，O(n)）；
+- centered_median：居中窗口中位数（边缘填充，分块向量化）；
+- peak_mean：长度为 window 的最大平均值；best_mean_curve：1..max_window 各时长的最大平均值；
+- ewma：指数加权滑动平均（分块闭式累积，用于 xPower）；
+- first_within：自某下标起第一个与参考值相差不超过阈值的样本（分块查找，用于"与上一个保留值比较"的链式过滤）；
+- 时间感知版本（非等间隔 / 有缺口的 1 Hz 数据）：time_rolling_sum / time_rolling_mean 以时间戳划定
+  (t-window, t] 窗口；fill_gaps 将数据展开到连续 1 Hz 网格。
+
+整数输入的前缀和在 float64 下精确，窗口和与逐点累加的结果逐位一致。
+"""
+
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+# ewma 分块长度上限：保证块内 decay^-k 不溢出且精度足够
+_EWMA_MAX_BLOCK = 1024
+# centered_median 每块处理的样本数（控制滑窗视图的内存占用）
+_MEDIAN_CHUNK = 4096
+
+
+def as_array(values: Any, missing: Optional[float] = 0.0) -> np.ndarray:
+    """转为 float64 一维数组；missing 不为 None 时将 None/NaN/Inf 替换为该值。"""
+    arr = np.asarray(values if values is not None else [], dtype=np.float64).ravel()
+    if missing is not None:
+        arr = np.where(np.isfinite(arr), arr, missing)
+    return arr
+
+
+def first_within(values: np.ndarray, start: int, reference: float, limit: float) -> int:
+    """values[start:] 中第一个与 reference 相差不超过 limit 的下标（分块向量化查找）；不存在时返回 values.size。"""
+    chunk = 256
+    while start < values.size:
+        hits = np.flatnonzero(np.abs(values[start:start + chunk] - reference) <= limit)
+        if hits.size:
+            return start + int(hits[0])
+        start += chunk
+        chunk *= 2
+    return values.size
+
+
+def prefix_sum(values: Any) -> np.ndarray:
+    """长度 n+1 的前缀和（首元素为 0）。"""
+    arr = as_array(values)
+    out = np.empty(arr.size + 1, dtype=np.float64)
+    out[0] = 0.0
+    np.cumsum(arr, out=out[1:])
+    return out
+
+
+def rolling_sum(values: Any, window: int, partial: bool = True) -> np.ndarray:
+    prefix = prefix_sum(values)
+    n = prefix.size - 1
+    window = max(1, int(window))
+    if not partial:
+        if n < window:
+            return np.empty(0, dtype=np.float64)
+        return prefix[window:] - prefix[:-window]
+    lo = np.maximum(np.arange(1, n + 1) - window, 0)
+    return prefix[1:] - prefix[lo]
+
+
+def rolling_mean(values: Any, window: int, partial: bool = True) -> np.ndarray:
+    window = max(1, int(window))
+    sums = rolling_sum(values, window, partial)
+    if not partial:
+        return sums / window
+    counts = np.minimum(np.arange(1, sums.size + 1), window)
+    return sums / counts
+
+
+def centered_mean(values: Any, window: int, missing: Optional[float] = 0.0) -> np.ndarray:
+    """
+    居中滑动平均：左侧 window//2、右侧 window-1-window//2 个样本，两端按边缘值填充。
+
+    missing=None 时缺失值不替换：含 NaN 的窗口结果为 NaN（与卷积实现一致）。
+    """
+    arr = as_array(values, missing)
+    window = int(window)
+    if window <= 1 or arr.size < window:
+        return arr.copy()
+    pad_left = window // 2
+    padded = np.pad(arr, (pad_left, window - 1 - pad_left), mode="edge")
+    invalid = ~np.isfinite(padded)
+    out = rolling_sum(padded, window, partial=False) / window
+    if invalid.any():
+        out[rolling_sum(invalid, window, partial=False) > 0] = np.nan
+    return out
+
+
+def centered_nanmean(values: Any, window: int) -> np.ndarray:
+    """
+    居中滑动平均：下标 i 的窗口为 [i − window//2, i + (window−1)//2]（偶数窗口与 pandas 相同，多取左侧一个样本），
+    两端截断到已有样本，NaN 不计入分子分母；窗口内全为 NaN 时输出 NaN。
+    """
+    arr = as_array(values, missing=None)
+    n = arr.size
+    window = max(1, int(window))
+    valid = np.isfinite(arr)
+    sums = prefix_sum(np.where(valid, arr, 0.0))
+    counts = prefix_sum(valid)
+    idx = np.arange(n)
+    lo = np.maximum(idx - window // 2, 0)
+    hi = np.minimum(idx + (window - 1) // 2 + 1, n)
+    count = counts[hi] - counts[lo]
+    out = np.full(n, np.nan)
+    np.divide(sums[hi] - sums[lo], count, out=out, where=count > 0)
+    return out
+
+
+def _block_extreme(arr: np.ndarray, window: int, func: Any, fill: float) -> np.ndarray:
+    n = arr.size
+    if window <= 1:
+        return arr.copy()
+    if n < window:
+        return np.empty(0, dtype=np.float64)
+    blocks = -(-n // window)
+    padded = np.full(blocks * window, fill, dtype=np.float64)
+    padded[:n] = arr
+    grid = padded.reshape(blocks, window)
+    prefix = func.accumulate(grid, axis=1).ravel()
+    suffix = func.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+    count = n - window + 1
+    return func(suffix[:count], prefix[window - 1:window - 1 + count])
+
+
+def rolling_max(values: Any, window: int) -> np.ndarray:
+    """完整窗口的滑动最大值（长度 n-window+1）。"""
+    return _block_extreme(as_array(values), max(1, int(window)), np.maximum, -np.inf)
+
+
+def rolling_min(values: Any, window: int) -> np.ndarray:
+    """完整窗口的滑动最小值（长度 n-window+1）。"""
+    return _block_extreme(as_array(values), max(1, int(window)), np.minimum, np.inf)
+
+
+def centered_median(values: Any, window: int, missing: Optional[float] = 0.0) -> np.ndarray:
+    """居中滑动中位数：两侧各 window//2 个样本，边缘值填充（长度不变）；missing=None 时含 NaN 的窗口为 NaN。"""
+    arr = as_array(values, missing)
+    if arr.size == 0:
+        return np.array([])
+    window = int(window)
+    if window <= 1:
+        return arr.copy()
+    half = window // 2
+    padded = np.pad(arr, (half, half), mode="edge")
+    view = np.lib.stride_tricks.sliding_window_view(padded, window)
+    out = np.empty(arr.size, dtype=np.float64)
+    for start in range(0, arr.size, _MEDIAN_CHUNK):
+        out[start:start + _MEDIAN_CHUNK] = np.median(view[start:start + _MEDIAN_CHUNK], axis=1)
+    return out
+
+
+def peak_mean(values: Any, window: int) -> Optional[float]:
+    """长度为 window 的最大平均值；样本不足一个窗口时返回 None。"""
+    window = max(1, int(window))
+    sums = rolling_sum(values, window, partial=False)
+    if sums.size == 0:
+        return None
+    return float(sums.max() / window)
+
+
+def best_mean_curve(values: Any, max_window: Optional[int] = None) -> np.ndarray:
+    """1..max_window 秒各时长的最大平均值（float64，未取整）；max_window 缺省为样本数。"""
+    prefix = prefix_sum(values)
+    n = prefix.size - 1
+    limit = n if max_window is None else min(n, int(max_window))
+    best = np.empty(limit, dtype=np.float64)
+    for window in range(1, limit + 1):
+        best[window - 1] = (prefix[window:] - prefix[:-window]).max() / window
+    return best
+
+
+def ewma(values: Any, span: float) -> np.ndarray:
+    """
+    指数加权滑动平均 y_t = y_{t-1} + (x_t − y_{t-1})/span，y_{-1} = 0。
+
+    分块闭式计算：块内 y_t = d^{t+1}·y_prev + α·d^t·Σ_{k≤t} x_k·d^{−k}（d = 1−α），
+    块长保证 d^{−k} 不溢出，块间只传递上一块末值。
+    """
+    arr = as_array(values)
+    n = arr.size
+    if n == 0:
+        return arr
+    alpha = 1.0 / max(float(span), 1.0)
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return arr.copy()
+    block = int(min(_EWMA_MAX_BLOCK, max(1, np.floor(30.0 / -np.log(decay)))))
+    powers = decay ** np.arange(block)
+    inverse = 1.0 / powers
+    out = np.empty(n, dtype=np.float64)
+    prev = 0.0
+    for start in range(0, n, block):
+        chunk = arr[start:start + block]
+        m = chunk.size
+        acc = np.cumsum(chunk * inverse[:m])
+        out[start:start + m] = powers[:m] * (decay * prev + alpha * acc)
+        prev = out[start + m - 1]
+    return out
+
+
+def _time_bounds(timestamps: Any, window: float) -> Tuple[np.ndarray, np.ndarray]:
+    t = np.asarray(timestamps, dtype=np.float64).ravel()
+    lo = np.searchsorted(t, t - window, side="right")
+    return t, lo
+
+
+def time_rolling_sum(timestamps: Any, values: Any, window: float) -> np.ndarray:
+    """按时间窗口 (t−window, t] 求和（时间戳升序，允许缺口与非整秒采样）。"""
+    _, lo = _time_bounds(timestamps, window)
+    prefix = prefix_sum(values)
+    return prefix[1:] - prefix[lo]
+
+
+def time_rolling_mean(timestamps: Any, values: Any, window: float) -> np.ndarray:
+    """按时间窗口 (t−window, t] 内的样本求平均（缺口不计入分母）。"""
+    _, lo = _time_bounds(timestamps, window)
+    prefix = prefix_sum(values)
+    counts = np.arange(1, lo.size + 1) - lo
+    return (prefix[1:] - prefix[lo]) / np.maximum(counts, 1)
+
+
+def fill_gaps(timestamps: Any, values: Any, fill: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    展开到连续 1 Hz 网格：返回（整秒时间戳，数值），缺口处填 fill。
+
+    同一秒内的多个样本保留最后一个。
+    """
+    t = np.rint(np.asarray(timestamps, dtype=np.float64).ravel()).astype(np.int64)
+    arr = as_array(values)
+    if t.size == 0:
+        return t, arr
+    grid = np.arange(t[0], t[-1] + 1, dtype=np.int64)
+    out = np.full(grid.size, fill, dtype=np.float64)
+    out[t - t[0]] = arr
+    return grid, out
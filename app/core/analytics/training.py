@@ -7,7 +7,11 @@
 """
 
 from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+
 from .power import normalized_power
+from .rolling import as_array, peak_mean
 from .zones import analyze_power_zones
 from .time_utils import parse_time_str
 
@@ -73,19 +77,11 @@ def anaerobic_effect(power_data: List[int], ftp: int) -> float:
     try:
         if not power_data or not ftp:
             return 0.0
-        n = len(power_data)
-        if n < 30:
-            return 0.0
         # 30s peak power
-        window = 30
-        window_sum = sum(power_data[:window])
-        max_avg = window_sum / window
-        for i in range(1, n - window + 1):
-            window_sum = window_sum - power_data[i - 1] + power_data[i + window - 1]
-            avg = window_sum / window
-            if avg > max_avg:
-                max_avg = avg
-        anaerobic_capacity = sum(max(0, p - ftp) for p in power_data if p is not None) / 1000.0
+        max_avg = peak_mean(power_data, 30)
+        if max_avg is None:
+            return 0.0
+        anaerobic_capacity = float(np.maximum(as_array(power_data) - ftp, 0.0).sum()) / 1000.0
         anaerobic = min(4.0, 0.1 * (max_avg / ftp) + 0.05 * anaerobic_capacity)
         return round(anaerobic, 1)
     except Exception:
@@ -12,7 +12,8 @@
 
 from typing import List, Dict, Any, Tuple, Optional
 import numpy as np
-import pandas as pd
+
+from .rolling import centered_nanmean
 
 
 def preprocess_hr(
@@ -37,14 +38,8 @@ def preprocess_hr(
     # 去伪点：裁剪到 [40, 240] bpm
     hr_array = np.clip(hr_array, 40, 240)
     
-    # 平滑：滚动平均
-    series = pd.Series(hr_array).rolling(
-        window=smooth_win, 
-        min_periods=1, 
-        center=True
-    ).mean()
-    
-    return series.values
+    # 平滑：居中滚动平均（两端按已有样本、缺失值不计入）
+    return centered_nanmean(hr_array, smooth_win)
 
 
 def relative_intensity(
@@ -198,25 +193,56 @@ def detect_intervals(
     else:
         s_thr = s_threshold  # 使用默认值 0.90
     
-    # 检测高强度区域
-    mask = (s >= s_thr).astype(int)
-    
-    # 找到所有上升沿和下降沿
-    diff = np.diff(np.r_[0, mask, 0])
-    idx = np.where(diff != 0)[0]
-    
-    # 配对形成窗口 [(start, end), ...]
-    segments = [(idx[i], idx[i + 1]) for i in range(0, len(idx), 2)]
+    # 检测高强度区域：上升沿/下降沿成对形成窗口 [start, end)
+    edges = np.flatnonzero(np.diff(np.r_[0, (s >= s_thr).astype(np.int8), 0]))
+    bounds = edges.reshape(-1, 2)
     
     # 过滤持续时长在 [min_len, max_len] 范围内的窗口
-    segments = [
-        (a, b) for a, b in segments 
-        if min_len <= (b - a) * dt <= max_len
-    ]
+    duration = (bounds[:, 1] - bounds[:, 0]) * dt
+    bounds = bounds[(duration >= min_len) & (duration <= max_len)]
+    segments = [(int(a), int(b)) for a, b in bounds.tolist()]
     
     return segments, s
 
 
+def _segment_order(values: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+    """把各窗口 [start, end) 的样本拼接后按（窗口, 值）排序，返回（排序后的值, 各窗口在其中的起点, 长度）。"""
+    lengths = ends - starts
+    seg_id = np.repeat(np.arange(lengths.size), lengths)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    picked = values[np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())]
+    ordered = picked[np.lexsort((picked, seg_id))]
+    return ordered, offsets, lengths
+
+
+def _segment_median(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """各窗口中位数（与 np.median 一致：偶数长度取中间两值的平均）。"""
+    ordered, offsets, lengths = _segment_order(values, starts, ends)
+    lo = ordered[offsets + (lengths - 1) // 2]
+    hi = ordered[offsets + lengths // 2]
+    return (lo + hi) / 2.0
+
+
+def _segment_percentile(values: np.ndarray, starts: np.ndarray, ends: np.ndarray, q: float) -> np.ndarray:
+    """各窗口 q 分位数（与 np.percentile 的 linear 插值一致）；空窗口为 0。"""
+    out = np.zeros(starts.size)
+    nonempty = ends > starts
+    if not nonempty.any():
+        return out
+    starts, ends = starts[nonempty], ends[nonempty]
+    ordered, offsets, lengths = _segment_order(values, starts, ends)
+    virtual = q / 100.0 * (lengths - 1)
+    below = np.floor(virtual).astype(np.int64)
+    above = np.minimum(below + 1, lengths - 1)
+    t = virtual - below
+    a = ordered[offsets + below]
+    b = ordered[offsets + above]
+    diff = b - a
+    # 与 NumPy 的 _lerp 相同：t ≥ 0.5 时从上端回插，保证结果逐位一致
+    out[nonempty] = np.where(t >= 0.5, b - diff * (1.0 - t), a + diff * t)
+    return out
+
+
 def anaerobic_effect(
     hr: np.ndarray,
     hr_max: float,
@@ -258,42 +284,32 @@ def anaerobic_effect(
     # 计算阈值相对强度
     s_ftp = fthr / hr_max
     
-    # 累计无氧负荷
-    a_total = 0.0
     p = 2.0  # 强度指数（高强度更累）
     alpha = 0.5  # 心率上升速率系数
+    bounds = np.asarray(segments, dtype=np.int64)
+    starts, ends = bounds[:, 0], bounds[:, 1]
     
-    for start, end in segments:
-        # 窗口长度（秒）
-        L_i = (end - start) * dt
-        
-        # 窗口内中位强度
-        s_i = np.median(s[start:end])
-        
-        # 强度超额（归一化到 [0, 1]）
-        u_i = max(0.0, (s_i - s_ftp) / (1.0 - s_ftp))
-        
-        # 心率上升速率 bonus（窗口内 dHR/dt 的 80% 分位数，归一化到 0-1）
-        if end > start + 1:
-            dhr = np.diff(hr[start:end])
-            r_i = np.percentile(dhr, 80) / 10.0  # 简化：除以 10 归一化
-            r_i = np.clip(r_i, 0.0, 1.0)
-        else:
-            r_i = 0.0
-        
-        # 窗口得分
-        a_i = L_i * (u_i ** p) * (1.0 + alpha * r_i)
-        a_total += a_i
+    # 窗口长度（秒）与窗口内中位强度
+    L = (ends - starts) * dt
+    s_med = _segment_median(s, starts, ends)
+    
+    # 强度超额（归一化到 [0, 1]）
+    u = np.maximum(0.0, (s_med - s_ftp) / (1.0 - s_ftp))
+    
+    # 心率上升速率 bonus（窗口内 dHR/dt 的 80% 分位数，除以 10 归一化到 0-1）；
+    # 窗口 [start, end) 内的差分为全局差分的 [start, end-1)
+    dhr = np.diff(hr)
+    r = np.clip(_segment_percentile(dhr, starts, ends - 1, 80.0) / 10.0, 0.0, 1.0)
+    
+    # 窗口得分，按窗口顺序累加
+    a_total = sum((L * (u ** p) * (1.0 + alpha * r)).tolist(), 0.0)
     
     # 密度修正：短间歇的无氧刺激来自重复与密度
     # R = 平均（恢复时长 / 窗口时长）
     if len(segments) > 1:
-        intervals = []
-        for i in range(len(segments) - 1):
-            work_len = (segments[i][1] - segments[i][0]) * dt
-            rest_len = (segments[i + 1][0] - segments[i][1]) * dt
-            intervals.append(rest_len / work_len if work_len > 0 else 0)
-        R = np.mean(intervals) if intervals else 0
+        work_len = (ends[:-1] - starts[:-1]) * dt
+        rest_len = (starts[1:] - ends[:-1]) * dt
+        R = np.mean(np.where(work_len > 0, rest_len / np.where(work_len > 0, work_len, 1), 0))
     else:
         R = 0
     
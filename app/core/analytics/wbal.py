@@ -0,0 +1,187 @@
+"""
+W′ 平衡（W′bal）计算引擎（NumPy 向量化）
+
+两种模型，均返回 float64 数组（单位 J；保持 float64 直到解析器按 0.1 kJ 取整，避免单精度误差跨过取整边界）：
+- differential：逐秒微分模型。功率高于 CP·(1+band) 时按 P−CP 消耗，低于 CP·(1−band) 时按指数恢复，
+  中间死区保持不变。按连续的消耗/恢复/保持段求闭式解：消耗段为段内累计和（在 0 处截断），
+  恢复段为 W′ − (W′ − b0)·∏q；段间只做标量递推（每段 O(1)），段内全部向量化。
+- integral：Skiba 积分模型 W′bal(t) = W′ − Σ_{u≤t} max(0, P(u)−CP)·e^{−(t−u)/τ}，以 FFT 卷积计算。
+
+恢复时间常数模型（tau_model，可按运动员配置，见 tau_model_for）：
+- fixed       ：τ 固定 546 s（历史口径；differential 下与原逐点循环结果一致）；
+- skiba       ：τ = 546·e^{−0.01·D_CP} + 316（Skiba 2012），D_CP 为低于 CP 时的平均功率差；
+- differential：每秒恢复比例 e^{−(CP−P)/W′}，随当前功率变化（Skiba 2015）；integral 模型下按 skiba 处理。
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ...config import WBAL_MODEL, WBAL_TAU_MODEL, WBAL_TAU_MODEL_OVERRIDES
+
+MODEL_DIFFERENTIAL = "differential"
+MODEL_INTEGRAL = "integral"
+MODELS = (MODEL_DIFFERENTIAL, MODEL_INTEGRAL)
+
+TAU_FIXED = "fixed"
+TAU_SKIBA = "skiba"
+TAU_DIFFERENTIAL = "differential"
+TAU_MODELS = (TAU_FIXED, TAU_SKIBA, TAU_DIFFERENTIAL)
+
+FIXED_TAU = 546.0
+# differential 模型的死区：CP·(1±DEADBAND) 之间既不消耗也不恢复
+DEADBAND = 0.05
+
+
+def _parse_overrides(raw: str) -> Dict[int, str]:
+    """解析 "athlete_id:tau_model,..."；格式不正确或模型未知的条目忽略。"""
+    overrides: Dict[int, str] = {}
+    for item in (raw or "").split(","):
+        athlete_id, _, model = item.strip().partition(":")
+        model = model.strip().lower()
+        if athlete_id.strip().isdigit() and model in TAU_MODELS:
+            overrides[int(athlete_id)] = model
+    return overrides
+
+
+_TAU_OVERRIDES = _parse_overrides(WBAL_TAU_MODEL_OVERRIDES)
+
+
+def tau_model_for(athlete_id: Optional[int]) -> str:
+    """运动员使用的 τ 模型：WBAL_TAU_MODEL_OVERRIDES 中的设置优先，否则取 WBAL_TAU_MODEL。"""
+    if athlete_id is not None and int(athlete_id) in _TAU_OVERRIDES:
+        return _TAU_OVERRIDES[int(athlete_id)]
+    return WBAL_TAU_MODEL if WBAL_TAU_MODEL in TAU_MODELS else TAU_FIXED
+
+
+def _as_power(power: Any) -> np.ndarray:
+    """转为 float64 数组，缺失值（None/NaN）按 0 W 处理。"""
+    arr = np.asarray(power if power is not None else [], dtype=np.float64).ravel()
+    return np.where(np.isfinite(arr), arr, 0.0)
+
+
+def skiba_tau(power: np.ndarray, cp: float) -> float:
+    """Skiba 2012：τ = 546·e^{−0.01·D_CP} + 316，D_CP = CP − 低于 CP 样本的平均功率。"""
+    below = power[power < cp]
+    d_cp = float(cp - below.mean()) if below.size else 0.0
+    return 546.0 * math.exp(-0.01 * d_cp) + 316.0
+
+
+def w_balance_differential(
+    power: Any,
+    cp: float,
+    w_prime: float,
+    tau_model: str = TAU_FIXED,
+    band: float = DEADBAND,
+) -> np.ndarray:
+    """微分模型 W′bal（J，float64）。"""
+    p = _as_power(power)
+    n = p.size
+    if n == 0 or cp <= 0 or w_prime <= 0:
+        return np.zeros(n)
+
+    state = np.zeros(n, dtype=np.int8)
+    state[p > cp * (1 + band)] = 1
+    state[p < cp * (1 - band)] = -1
+    expend = np.where(state == 1, p - cp, 0.0)
+    # 恢复段每秒的 ln(剩余缺口比例)
+    if tau_model == TAU_DIFFERENTIAL:
+        log_q = -(cp - p) / w_prime
+    else:
+        tau = FIXED_TAU if tau_model == TAU_FIXED else skiba_tau(p, cp)
+        log_q = np.full(n, math.log1p(-1.0 / tau))
+    log_q = np.where(state == -1, log_q, 0.0)
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(state)) + 1))
+    run_state = state[starts]
+    run_expend = np.add.reduceat(expend, starts)
+    run_log_q = np.add.reduceat(log_q, starts)
+
+    # 段间标量递推：各段起点的平衡值
+    start_balance = np.empty(starts.size)
+    balance = float(w_prime)
+    for i, (st, spent, lq) in enumerate(zip(run_state.tolist(), run_expend.tolist(), run_log_q.tolist())):
+        start_balance[i] = balance
+        if st == 1:
+            balance = max(0.0, balance - spent)
+        elif st == -1:
+            balance = w_prime - (w_prime - balance) * math.exp(lq)
+
+    # 段内闭式解：段内累计量 = 全局累计 − 段起点之前的累计
+    run_id = np.repeat(np.arange(starts.size), np.diff(np.append(starts, n)))
+    cum_expend = np.cumsum(expend)
+    cum_log_q = np.cumsum(log_q)
+    within_expend = cum_expend - (cum_expend - expend)[starts][run_id]
+    within_log_q = cum_log_q - (cum_log_q - log_q)[starts][run_id]
+    b0 = start_balance[run_id]
+    out = np.where(
+        state == 1,
+        np.maximum(0.0, b0 - within_expend),
+        np.where(state == -1, w_prime - (w_prime - b0) * np.exp(within_log_q), b0),
+    )
+    return out
+
+
+def w_balance_integral(
+    power: Any,
+    cp: float,
+    w_prime: float,
+    tau_model: str = TAU_SKIBA,
+    tau: Optional[float] = None,
+) -> np.ndarray:
+    """Skiba 积分模型 W′bal（J，float64），FFT 卷积 O(N log N)；结果截断在 [0, W′]。"""
+    p = _as_power(power)
+    n = p.size
+    if n == 0 or cp <= 0 or w_prime <= 0:
+        return np.zeros(n)
+    if tau is None:
+        tau = FIXED_TAU if tau_model == TAU_FIXED else skiba_tau(p, cp)
+    expend = np.maximum(p - cp, 0.0)
+    if not expend.any():
+        return np.full(n, float(w_prime))
+    kernel = np.exp(-np.arange(n) / tau)
+    size = 1 << (2 * n - 1).bit_length()
+    spent = np.fft.irfft(np.fft.rfft(expend, size) * np.fft.rfft(kernel, size), size)[:n]
+    return np.clip(w_prime - spent, 0.0, w_prime)
+
+
+def w_balance(
+    power: Any,
+    cp: float,
+    w_prime: float,
+    model: Optional[str] = None,
+    tau_model: Optional[str] = None,
+) -> np.ndarray:
+    """按模型计算 W′bal（J，float64）；model/tau_model 缺省取配置，未知的 τ 模型与 tau_model_for 一样回退到 fixed。"""
+    model = model or WBAL_MODEL
+    tau_model = tau_model if tau_model in TAU_MODELS else tau_model_for(None)
+    if model == MODEL_INTEGRAL:
+        return w_balance_integral(power, cp, w_prime, tau_model)
+    return w_balance_differential(power, cp, w_prime, tau_model)
+
+
+def w_balance_stream(
+    power: Any,
+    ftp: Any,
+    w_prime: Any,
+    tau_model: Optional[str] = None,
+    model: Optional[str] = None,
+) -> List[float]:
+    """
+    解析器输出的 w_balance 流：kJ，保留 1 位小数。
+
+    FTP（作为 CP）或 W′ 缺失/非法时返回与功率等长的全 0 列表。
+    """
+    n = len(power) if power is not None else 0
+    try:
+        cp = float(ftp or 0)
+        wp = float(w_prime or 0)
+    except (TypeError, ValueError):
+        cp = wp = 0.0
+    if n == 0 or cp <= 0 or wp <= 0:
+        return [0.0] * n
+    balance = w_balance(power, cp, wp, model, tau_model)
+    return np.round(balance / 1000.0, 1).tolist()
@@ -1,6 +1,6 @@
 """应用数据库 ORM 模型定义：活动/运动员/功率纪录/缓存等。"""
 
-from sqlalchemy import BIGINT, VARCHAR, Column, Integer, String, Float, Text, DateTime, Date
+from sqlalchemy import BIGINT, VARCHAR, Column, Integer, String, Float, Text, DateTime, Date, UniqueConstraint
 from ..db_base import Base
 
 
@@ -147,19 +147,39 @@ class TbAthletePowerRecords(Base):
     updated_at                    = Column(DateTime)
 
 
+
+class TbActivityBestPower(Base):
+    """单次活动的最佳功率/距离/爬升（窄表：每个活动每个指标一行）。
+
+    metric 取值：'5s'..'60m'（单位 W）、'longest_ride'（单位 km）、'max_elevation'（单位 m），
+    与 tb_athlete_power_records 中的字段及单位一一对应，用于整体重建 Top3。
+    """
+    __tablename__ = "tb_activity_best_power"
+    __table_args__ = (
+        UniqueConstraint("activity_id", "metric", name="uk_activity_metric"),
+    )
+
+    id          = Column(BIGINT, primary_key=True, autoincrement=True)
+    activity_id = Column(BIGINT, nullable=False, index=True, comment="活动ID")
+    athlete_id  = Column(BIGINT, nullable=False, index=True, comment="运动员ID")
+    metric      = Column(String(32), nullable=False, comment="指标键，如 5s/1m/longest_ride/max_elevation")
+    value       = Column(Integer, nullable=False, comment="指标值（W/km/m）")
+    updated_at  = Column(DateTime, comment="更新时间")
+
 class TbActivityCache(Base):
     __tablename__ = "tb_activity_cache"
 
-    id             = Column(BIGINT, primary_key=True, autoincrement=True, index=True)
-    activity_id    = Column(BIGINT, unique=True, index=True, nullable=False, comment="活动ID")
-    cache_key      = Column(String(255), nullable=False, comment="缓存键（用于标识不同的缓存版本）")
-    file_path      = Column(String(500), nullable=False, comment="JSON文件在服务器上的存储路径")
-    file_size      = Column(BIGINT, comment="文件大小（字节）")
-    created_at     = Column(DateTime, nullable=False, comment="缓存创建时间")
-    updated_at     = Column(DateTime, nullable=False, comment="缓存更新时间")
-    expires_at     = Column(DateTime, comment="缓存过期时间")
-    is_active      = Column(Integer, default=1, comment="是否激活（1=激活，0=禁用）")
-    cache_metadata = Column(Text, comment="缓存元数据（JSON格式）")
+    id               = Column(BIGINT, primary_key=True, autoincrement=True, index=True)
+    activity_id      = Column(BIGINT, unique=True, index=True, nullable=False, comment="活动ID")
+    cache_key        = Column(String(255), nullable=False, comment="缓存键（用于标识不同的缓存版本）")
+    file_path        = Column(String(500), nullable=False, comment="JSON文件在服务器上的存储路径")
+    file_size        = Column(BIGINT, comment="文件大小（字节）")
+    created_at       = Column(DateTime, nullable=False, comment="缓存创建时间")
+    updated_at       = Column(DateTime, nullable=False, comment="缓存更新时间")
+    expires_at       = Column(DateTime, comment="缓存过期时间")
+    is_active        = Column(Integer, default=1, comment="是否激活（1=激活，0=禁用）")
+    cache_metadata   = Column(Text, comment="缓存元数据（JSON格式）")
+    last_accessed_at = Column(DateTime, comment="最近访问时间（缓存 GC 按 LRU 淘汰）")
 
 
 class TbAthleteDailyState(Base):
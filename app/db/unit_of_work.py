@@ -0,0 +1,169 @@
+"""工作单元（Unit of Work）：把一次分析产生的所有写库操作合并为单个事务。
+
+背景：
+    一次本地 /all 会依次写入效率因子、TSS、运动员状态、功率纪录、最长骑行、最大爬升与缓存索引，
+    原实现每一步各自 db.commit()，每次提交都是一次网络往返 + MySQL fsync。
+
+用法：
+    with unit_of_work(db, "activities.all", activity_id=123):
+        ...  # 期间仓库层/服务层调用 commit_or_flush(db) 只 flush，不提交
+
+    - 正常退出：统一 db.commit() 一次；
+    - 抛出异常或期间有核心写操作失败：统一 db.rollback() 一次，整个分析的写入全部撤销；
+    - 附属写入（缓存索引、单次活动最佳功率窄表等）包在 ancillary_write 中，在 SAVEPOINT 内执行，
+      失败只回滚该保存点，不影响 EF/TSS/运动员状态等核心写入；
+    - 退出时以 DEBUG 级别输出本次请求的 SQL 语句数与提交次数。
+
+不在工作单元内调用时，commit_or_flush / rollback_or_abort 的行为与原先的 commit / rollback 完全一致，
+ancillary_write 失败时直接 db.rollback()。
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_SESSION_INFO_KEY = "unit_of_work"
+
+# 当前请求所在的工作单元（用于引擎事件中统计语句数/提交数）
+_current_uow: ContextVar[Optional["UnitOfWork"]] = ContextVar("current_unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """单次请求的工作单元状态。"""
+
+    def __init__(self, db: Session, name: str, **context: Any):
+        self.db = db
+        self.name = name
+        self.context = context
+        self.statements = 0
+        self.commits = 0
+        self.flushes = 0
+        self.ancillary_failures = 0
+        self.failed = False
+        self.started_at = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        """返回本工作单元的统计信息。"""
+        return {
+            "name": self.name,
+            "statements": self.statements,
+            "commits": self.commits,
+            "flushes": self.flushes,
+            "ancillary_failures": self.ancillary_failures,
+            "failed": self.failed,
+            "elapsed_ms": round((time.perf_counter() - self.started_at) * 1000, 2),
+        }
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    uow = _current_uow.get()
+    if uow is not None:
+        uow.statements += 1
+
+
+@event.listens_for(Engine, "commit")
+def _count_commit(conn):
+    uow = _current_uow.get()
+    if uow is not None:
+        uow.commits += 1
+
+
+def current_unit_of_work(db: Session) -> Optional[UnitOfWork]:
+    """返回会话当前所属的工作单元（不在工作单元内时为 None）。"""
+    return db.info.get(_SESSION_INFO_KEY)
+
+
+def commit_or_flush(db: Session) -> None:
+    """工作单元内仅 flush（发送语句、不提交）；否则按原逻辑直接提交。
+
+    flush 保证后续查询（如按 TSS 汇总 ATL/CTL）能看到本次写入。
+    """
+    uow = current_unit_of_work(db)
+    if uow is None:
+        db.commit()
+        return
+    if uow.failed:
+        # 已决定整体回滚，不再向数据库发送新的写入
+        return
+    db.flush()
+    uow.flushes += 1
+
+
+def rollback_or_abort(db: Session) -> None:
+    """工作单元内将其标记为失败并立即回滚（退出时不再提交）；否则直接回滚。"""
+    uow = current_unit_of_work(db)
+    if uow is not None and not uow.failed:
+        uow.failed = True
+        logger.warning("[uow][abort] name=%s context=%s 写入失败，整体回滚", uow.name, uow.context)
+    db.rollback()
+
+
+@contextmanager
+def ancillary_write(db: Session, name: str, **context: Any) -> Iterator[None]:
+    """附属写入：工作单元内在 SAVEPOINT 中执行，失败只回滚该保存点；不在工作单元内时失败直接回滚。
+
+    异常在回滚后继续向外抛出，由调用方记录日志并决定返回值（不要再调用 rollback_or_abort）。
+    """
+    uow = current_unit_of_work(db)
+    if uow is None or uow.failed:
+        # 无工作单元：按原逻辑回滚；工作单元已决定整体回滚：commit_or_flush 不再发送写入
+        try:
+            yield
+        except Exception:
+            if uow is None:
+                db.rollback()
+            raise
+        return
+
+    savepoint = db.begin_nested()
+    try:
+        yield
+        if savepoint.is_active:
+            savepoint.commit()
+    except Exception:
+        # flush 失败后保存点处于待回滚状态（is_active 为 False），同样需要显式回滚
+        savepoint.rollback()
+        uow.ancillary_failures += 1
+        logger.warning("[uow][ancillary-rollback] name=%s write=%s context=%s 附属写入失败，仅回滚该保存点",
+                       uow.name, name, context)
+        raise
+
+
+@contextmanager
+def unit_of_work(db: Session, name: str, **context: Any) -> Iterator[UnitOfWork]:
+    """开启工作单元；支持嵌套（内层直接复用外层，由最外层统一提交）。"""
+    outer = current_unit_of_work(db)
+    if outer is not None:
+        yield outer
+        return
+
+    uow = UnitOfWork(db, name, **context)
+    db.info[_SESSION_INFO_KEY] = uow
+    token = _current_uow.set(uow)
+    try:
+        yield uow
+        if uow.failed:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        uow.failed = True
+        db.rollback()
+        raise
+    finally:
+        db.info.pop(_SESSION_INFO_KEY, None)
+        _current_uow.reset(token)
+        logger.debug(
+            "[uow][summary] name=%s context=%s statements=%s commits=%s flushes=%s ancillary_failures=%s failed=%s elapsed_ms=%s",
+            uow.name, uow.context, uow.statements, uow.commits, uow.flushes, uow.ancillary_failures, uow.failed,
+            uow.summary()["elapsed_ms"],
+        )
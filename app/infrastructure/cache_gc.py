@@ -0,0 +1,273 @@
+"""
+活动缓存目录垃圾回收（GC）
+
+data/activity_cache 每个参数组合都会写出一个 {activity_id}_{cache_key}.json，
+而 tb_activity_cache 每个活动只保留一行，旧文件因此成为孤儿文件；目录只增不减。
+
+每轮 GC 依次执行（均为增量，单类最多处理 CACHE_GC_BATCH_SIZE 个）：
+1. 写回内存中累积的访问时间（last_accessed_at）；
+2. 删除已过期（expires_at）或已禁用（is_active=0）的缓存记录及其文件（含 .json.gz/.json.bin 派生副本）；
+3. 缓存条目的磁盘占用（主文件 + .json.gz/.json.bin 派生副本）超出 CACHE_MAX_BYTES 时，
+   按最近访问时间（LRU）淘汰；派生副本在请求时按需生成、不经过索引表，因此按目录实际大小统计；
+4. 删除目录中未被 tb_activity_cache 引用的孤儿文件、派生副本与残留临时文件
+   （跳过刚写入、可能尚未提交的文件）。
+
+后台线程按 CACHE_GC_INTERVAL_SECONDS 周期执行；也可通过接口手动触发并查看统计。
+"""
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from ..config import CACHE_MAX_BYTES, CACHE_MAX_AGE_DAYS, CACHE_GC_BATCH_SIZE, CACHE_GC_INTERVAL_SECONDS
+from ..db.models import TbActivityCache
+from .cache_manager import VARIANT_SUFFIXES, ActivityCacheManager, activity_cache_manager
+
+logger = logging.getLogger(__name__)
+
+# 孤儿文件宽限期：刚写入文件、数据库事务尚未提交时不应被当作孤儿删除
+ORPHAN_GRACE_SECONDS = 600
+
+
+class ActivityCacheGC:
+    def __init__(
+        self,
+        manager: ActivityCacheManager,
+        max_bytes: int = CACHE_MAX_BYTES,
+        max_age_days: int = CACHE_MAX_AGE_DAYS,
+        batch_size: int = CACHE_GC_BATCH_SIZE,
+    ):
+        self.manager = manager
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self._run_lock = threading.Lock()
+        self._last_run: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def cache_dir(self) -> str:
+        return self.manager.storage_base_path
+
+    def _remove_file(self, path: Optional[str]) -> int:
+        """删除缓存文件，返回释放的字节数。"""
+        if not path:
+            return 0
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.warning(f"[cache-gc][remove-failed] file={path}, error: {e}")
+            return 0
+
+    @staticmethod
+    def _main_name(name: str) -> str:
+        """派生副本（{file}.json.gz/.json.bin）对应的缓存主文件名；其余文件名原样返回。"""
+        for suffix in VARIANT_SUFFIXES:
+            if name.endswith(".json" + suffix):
+                return name[:-len(suffix)]
+        return name
+
+    @classmethod
+    def _is_orphan(cls, name: str, referenced: set) -> bool:
+        """未被索引表引用的缓存文件、派生副本，以及写入中断残留的临时文件。"""
+        if name.startswith(".tmp_"):
+            return True
+        name = cls._main_name(name)
+        return name.endswith(".json") and name not in referenced
+
+    @staticmethod
+    def _referenced(db: Session) -> set:
+        return {
+            os.path.basename(path)
+            for (path,) in db.query(TbActivityCache.file_path).all()
+            if path
+        }
+
+    def _entry_sizes(self, referenced: set) -> Dict[str, int]:
+        """按缓存主文件名汇总磁盘字节数（主文件 + 派生副本），只统计索引表引用的条目。"""
+        sizes: Dict[str, int] = {}
+        try:
+            entries = os.scandir(self.cache_dir)
+        except FileNotFoundError:
+            return sizes
+        with entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                name = self._main_name(entry.name)
+                if name not in referenced:
+                    continue
+                try:
+                    sizes[name] = sizes.get(name, 0) + entry.stat().st_size
+                except FileNotFoundError:
+                    continue
+        return sizes
+
+    def _delete_records(self, db: Session, records: Iterable[TbActivityCache]) -> Dict[str, int]:
+        records = list(records)
+        if not records:
+            return {"entries": 0, "bytes": 0}
+        freed = sum(self.manager.remove_cache_files(r.file_path) for r in records)
+        ids = [r.id for r in records]
+        db.query(TbActivityCache).filter(TbActivityCache.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        return {"entries": len(ids), "bytes": freed}
+
+    def _collect_expired(self, db: Session, limit: int) -> Dict[str, int]:
+        now = datetime.now()
+        records = db.query(TbActivityCache).filter(
+            or_(
+                TbActivityCache.is_active == 0,
+                TbActivityCache.expires_at < now,
+            )
+        ).limit(limit).all()
+        return self._delete_records(db, records)
+
+    def _collect_over_budget(self, db: Session, limit: int) -> Dict[str, int]:
+        if self.max_bytes <= 0:
+            return {"entries": 0, "bytes": 0}
+        # file_size 只记录写入时的主文件大小，派生副本需按磁盘实际大小计入预算
+        sizes = self._entry_sizes(self._referenced(db))
+        excess = sum(sizes.values()) - self.max_bytes
+        if excess <= 0:
+            return {"entries": 0, "bytes": 0}
+        lru_order = func.coalesce(TbActivityCache.last_accessed_at, TbActivityCache.updated_at)
+        candidates = db.query(TbActivityCache).order_by(lru_order.asc()).limit(limit).all()
+        victims: List[TbActivityCache] = []
+        for record in candidates:
+            if excess <= 0:
+                break
+            victims.append(record)
+            excess -= sizes.get(os.path.basename(record.file_path or ""), 0)
+        return self._delete_records(db, victims)
+
+    def _collect_orphans(self, db: Session, limit: int) -> Dict[str, int]:
+        referenced = self._referenced(db)
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        removed, freed = 0, 0
+        try:
+            entries = os.scandir(self.cache_dir)
+        except FileNotFoundError:
+            return {"files": 0, "bytes": 0}
+        with entries:
+            for entry in entries:
+                if removed >= limit:
+                    break
+                if not entry.is_file() or not self._is_orphan(entry.name, referenced):
+                    continue
+                try:
+                    if entry.stat().st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                freed += self._remove_file(entry.path)
+                removed += 1
+        return {"files": removed, "bytes": freed}
+
+    def run_once(self, db: Session, full: bool = False) -> Dict[str, Any]:
+        """执行一轮 GC；full=True 时循环执行直到各类均无可回收项。"""
+        if not self._run_lock.acquire(blocking=False):
+            return {"status": "running", "message": "已有 GC 任务在执行"}
+        started = time.time()
+        try:
+            result = {
+                "access_flushed": self.manager.flush_access_times(db),
+                "expired": {"entries": 0, "bytes": 0},
+                "evicted": {"entries": 0, "bytes": 0},
+                "orphans": {"files": 0, "bytes": 0},
+            }
+            while True:
+                expired = self._collect_expired(db, self.batch_size)
+                evicted = self._collect_over_budget(db, self.batch_size)
+                orphans = self._collect_orphans(db, self.batch_size)
+                for name, part in (("expired", expired), ("evicted", evicted), ("orphans", orphans)):
+                    for k, v in part.items():
+                        result[name][k] += v
+                progressed = expired["entries"] or evicted["entries"] or orphans["files"]
+                if not full or not progressed:
+                    break
+            result["status"] = "success"
+            result["elapsed_ms"] = round((time.time() - started) * 1000, 1)
+            result["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            self._last_run = result
+            logger.info(
+                f"[cache-gc][done] expired={result['expired']} evicted={result['evicted']} "
+                f"orphans={result['orphans']} elapsed_ms={result['elapsed_ms']}"
+            )
+            return result
+        except Exception as e:
+            db.rollback()
+            logger.exception(f"[cache-gc][error] {e}")
+            return {"status": "failed", "message": str(e)}
+        finally:
+            self._run_lock.release()
+
+    def summary(self, db: Session) -> Dict[str, Any]:
+        """缓存目录与索引表的统计信息。"""
+        total_rows, active_rows = db.query(
+            func.count(TbActivityCache.id),
+            func.coalesce(func.sum(TbActivityCache.is_active), 0),
+        ).one()
+        referenced = self._referenced(db)
+        disk_files, disk_bytes, orphan_files, orphan_bytes = 0, 0, 0, 0
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    try:
+                        size = entry.stat().st_size
+                    except FileNotFoundError:
+                        continue
+                    disk_files += 1
+                    disk_bytes += size
+                    if self._is_orphan(entry.name, referenced):
+                        orphan_files += 1
+                        orphan_bytes += size
+        except FileNotFoundError:
+            pass
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": int(total_rows or 0),
+            "active_entries": int(active_rows or 0),
+            # 与预算口径一致：被引用条目的主文件与派生副本
+            "entry_bytes": disk_bytes - orphan_bytes,
+            "disk_files": disk_files,
+            "disk_bytes": disk_bytes,
+            "orphan_files": orphan_files,
+            "orphan_bytes": orphan_bytes,
+            "max_bytes": self.max_bytes,
+            "max_age_days": self.max_age_days,
+            "last_run": self._last_run,
+        }
+
+    def start_background(self, interval_seconds: int = CACHE_GC_INTERVAL_SECONDS) -> None:
+        """启动后台 GC 线程（守护线程，进程内只启动一次）。"""
+        if interval_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+
+        def gc_task():
+            from ..utils import SessionLocal
+            while True:
+                time.sleep(interval_seconds)
+                db = SessionLocal()
+                try:
+                    self.run_once(db)
+                finally:
+                    db.close()
+
+        self._thread = threading.Thread(target=gc_task, name="activity-cache-gc", daemon=True)
+        self._thread.start()
+
+
+activity_cache_gc = ActivityCacheGC(activity_cache_manager)
@@ -4,27 +4,92 @@
 负责管理活动数据的缓存，包括：
 1. 缓存数据的存储和检索
 2. 缓存过期管理
-3. 文件存储管理
+3. 文件存储管理（原子写入；命中时可按原始字节返回，并按需生成派生副本：
+   gzip 预压缩 {file}.json.gz、二进制流容器 {file}.json.bin）
+4. 依赖版本校验：每条缓存在 cache_metadata.dependencies 中记录计算时的
+   运动员阈值版本（FTP/LTHR/最大心率/W′ 等字段的指纹）与算法版本；
+   读取时与当前版本比对，不一致即视为失效（按需重算），只影响阈值发生变化的运动员。
+5. 内容版本（content_version）：由 cache_key、FIT 内容哈希与依赖版本决定，用作 HTTP ETag，
+   命中校验时无需读取缓存文件。
 """
 
 import os
+import gzip
 import json
 import hashlib
-from datetime import datetime
-from typing import Optional, Dict, Any
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Dict, Any, List, Tuple, Union
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
-from ..db.models import TbActivityCache
+from ..db.models import TbActivity, TbActivityCache
+from ..db.unit_of_work import ancillary_write, commit_or_flush
+from . import fast_json
 import logging
-from ..config import CACHE_DIR
+from ..config import CACHE_DIR, CACHE_MAX_AGE_DAYS, ANALYSIS_ALGORITHM_VERSION, ELEVATION_HYSTERESIS_M
+from ..core.analytics.wbal import TAU_FIXED, tau_model_for
 
 logger = logging.getLogger(__name__)
 
+# 参与分析结果计算的运动员阈值字段；任一变化都会使该运动员的 /all 缓存失效
+ATHLETE_THRESHOLD_FIELDS = (
+    'ftp', 'threshold_heartrate', 'max_heartrate', 'is_threshold_active',
+    'w_balance', 'lactate_threshold_pace', 'weight', 'sex',
+)
+
+# 由缓存 JSON 派生的副本：gzip 预压缩、二进制流容器；随原文件一起重写、删除与回收
+COMPRESSED_SUFFIX = '.gz'
+BINARY_SUFFIX = '.bin'
+VARIANT_SUFFIXES = (COMPRESSED_SUFFIX, BINARY_SUFFIX)
+COMPRESS_LEVEL = 6
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """写入同目录临时文件后 os.replace，读者不会读到半写文件。"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".part", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 
 class ActivityCacheManager:
     def __init__(self, storage_base_path: str = CACHE_DIR):
         self.storage_base_path = storage_base_path
         os.makedirs(storage_base_path, exist_ok=True)
+        # 命中时只在内存中记录访问时间，由缓存 GC 批量写回 last_accessed_at，避免读路径写库
+        self._pending_access: Dict[int, datetime] = {}
+        self._access_lock = threading.Lock()
+
+    def _note_access(self, cache_record: TbActivityCache) -> None:
+        with self._access_lock:
+            self._pending_access[cache_record.id] = datetime.now()
+
+    def flush_access_times(self, db: Session) -> int:
+        """将内存中累积的访问时间批量写回 last_accessed_at，返回写回条数。"""
+        with self._access_lock:
+            pending, self._pending_access = self._pending_access, {}
+        if not pending:
+            return 0
+        try:
+            db.bulk_update_mappings(TbActivityCache, [
+                {"id": record_id, "last_accessed_at": accessed_at}
+                for record_id, accessed_at in pending.items()
+            ])
+            db.commit()
+            return len(pending)
+        except Exception as e:
+            logger.error(f"[cache-access][flush-failed] count={len(pending)}, error: {e}")
+            db.rollback()
+            return 0
 
     def generate_cache_key(self, activity_id: int, **kwargs) -> str:
         filtered_kwargs = {k: v for k, v in kwargs.items() if k in ['resolution', 'keys'] and v is not None}
@@ -32,65 +97,224 @@ class ActivityCacheManager:
         cache_input = f"activity_{activity_id}_{param_str}"
         return hashlib.md5(cache_input.encode()).hexdigest()
 
+    @staticmethod
+    def athlete_threshold_version(athlete: Any) -> str:
+        """运动员阈值版本：阈值字段的指纹，设置变化即版本变化（非默认的 W′ τ 模型也计入）。"""
+        raw = "|".join(f"{name}={getattr(athlete, name, None)}" for name in ATHLETE_THRESHOLD_FIELDS)
+        tau_model = tau_model_for(getattr(athlete, 'id', None))
+        if tau_model != TAU_FIXED:
+            raw += f"|wbal_tau_model={tau_model}"
+        return hashlib.md5(raw.encode()).hexdigest()[:16]
+
+    def dependency_versions(self, athlete: Any) -> Dict[str, str]:
+        """缓存结果所依赖的版本信息（写入 cache_metadata.dependencies；非 0 的海拔滞回阈值计入算法版本）。"""
+        algorithm_version = str(ANALYSIS_ALGORITHM_VERSION)
+        if ELEVATION_HYSTERESIS_M:
+            algorithm_version += f"|elevation_hysteresis={ELEVATION_HYSTERESIS_M:g}"
+        return {
+            "athlete_version": self.athlete_threshold_version(athlete),
+            "algorithm_version": algorithm_version,
+        }
+
+    def _current_dependencies(self, db: Session, activity_id: int) -> Optional[Dict[str, str]]:
+        from ..repositories.activity_repo import get_activity_athlete
+        pair = get_activity_athlete(db, activity_id)
+        if not pair:
+            return None
+        return self.dependency_versions(pair[1])
+
+    @staticmethod
+    def _recorded_metadata(cache_record: TbActivityCache) -> Dict[str, Any]:
+        try:
+            metadata = json.loads(cache_record.cache_metadata) if cache_record.cache_metadata else {}
+        except (TypeError, ValueError):
+            return {}
+        return metadata if isinstance(metadata, dict) else {}
+
+    @classmethod
+    def _recorded_dependencies(cls, cache_record: TbActivityCache) -> Optional[Dict[str, Any]]:
+        deps = cls._recorded_metadata(cache_record).get("dependencies")
+        return deps if isinstance(deps, dict) else None
+
+    @staticmethod
+    def content_version(cache_key: str, fit_hash: Optional[str], dependencies: Optional[Dict[str, Any]]) -> str:
+        """缓存内容版本（用于 ETag）：cache_key、FIT 内容哈希、运动员阈值版本与算法版本共同决定。"""
+        raw = json.dumps([cache_key, fit_hash, dependencies or {}], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _is_fresh(self, db: Session, cache_record: TbActivityCache, current: Optional[Dict[str, str]] = None) -> bool:
+        """缓存记录未过期且依赖版本与当前一致；未记录依赖的旧缓存视为失效。"""
+        if cache_record.expires_at is not None and cache_record.expires_at < datetime.now():
+            logger.info(f"[cache-expired] activity_id={cache_record.activity_id}, expires_at={cache_record.expires_at}")
+            return False
+        recorded = self._recorded_dependencies(cache_record)
+        if current is None:
+            current = self._current_dependencies(db, cache_record.activity_id)
+        if not recorded or current is None or recorded != current:
+            logger.info(
+                f"[cache-stale] activity_id={cache_record.activity_id}, recorded={recorded}, current={current}"
+            )
+            return False
+        return True
+
+    def current_content_version(self, db: Session, activity_id: int, cache_key: str, fit_hash: Optional[str]) -> str:
+        """按当前依赖版本计算内容版本（不经过缓存记录，供流数据等未落盘的结果生成 ETag）。"""
+        return self.content_version(cache_key, fit_hash, self._current_dependencies(db, activity_id))
+
+    def _fresh_record(self, db: Session, activity_id: int, cache_key: str) -> Optional[TbActivityCache]:
+        """查询有效、未过期、依赖版本一致且文件存在的缓存记录。"""
+        cache_record = db.query(TbActivityCache).filter(
+            and_(
+                TbActivityCache.activity_id == activity_id,
+                TbActivityCache.cache_key == cache_key,
+                TbActivityCache.is_active == 1
+            )
+        ).first()
+        if not cache_record:
+            return None
+        if not self._is_fresh(db, cache_record):
+            return None
+        if not os.path.exists(cache_record.file_path):
+            logger.warning(f"缓存文件不存在: {cache_record.file_path}")
+            return None
+        return cache_record
+
     def get_cache(self, db: Session, activity_id: int, cache_key: str) -> Optional[Dict[str, Any]]:
         try:
-            cache_record = db.query(TbActivityCache).filter(
-                and_(
-                    TbActivityCache.activity_id == activity_id,
-                    TbActivityCache.cache_key == cache_key,
-                    TbActivityCache.is_active == 1
-                )
-            ).first()
+            cache_record = self._fresh_record(db, activity_id, cache_key)
             if not cache_record:
                 return None
-            if not os.path.exists(cache_record.file_path):
-                logger.warning(f"缓存文件不存在: {cache_record.file_path}")
-                return None
             with open(cache_record.file_path, 'r', encoding='utf-8') as f:
                 cached_data = json.load(f)
+            self._note_access(cache_record)
             logger.info(f"缓存命中: activity_id={activity_id}, cache_key={cache_key}")
             return cached_data
         except Exception as e:
             logger.error(f"获取缓存失败: activity_id={activity_id}, error: {e}")
             return None
 
-    def set_cache(self, db: Session, activity_id: int, cache_key: str, data: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> bool:
+    def get_cache_file(self, db: Session, activity_id: int, cache_key: str) -> Optional[str]:
+        """
+        返回有效缓存的文件路径（不解析内容）
+
+        缓存文件内容即 /all 的响应体，命中时可直接按原始字节返回，跳过 json.load 与模型校验。
+        新鲜度校验（过期时间、依赖版本）与 get_cache 一致。
+        """
+        entry = self.get_cache_entry(db, activity_id, cache_key)
+        return entry[0] if entry else None
+
+    def get_cache_entry(self, db: Session, activity_id: int, cache_key: str) -> Optional[Tuple[str, str]]:
+        """返回有效缓存的（文件路径，内容版本）；内容版本取自缓存记录，不读取文件。"""
+        try:
+            cache_record = self._fresh_record(db, activity_id, cache_key)
+            if not cache_record:
+                return None
+            self._note_access(cache_record)
+            logger.info(f"缓存命中: activity_id={activity_id}, cache_key={cache_key}")
+            metadata = self._recorded_metadata(cache_record)
+            version = self.content_version(cache_key, metadata.get("fit_hash"), metadata.get("dependencies"))
+            return cache_record.file_path, version
+        except Exception as e:
+            logger.error(f"获取缓存失败: activity_id={activity_id}, error: {e}")
+            return None
+
+    @staticmethod
+    def variant_path(file_path: str, suffix: str) -> str:
+        return file_path + suffix
+
+    def get_variant_file(self, file_path: str, suffix: str, build: Callable[[bytes], bytes]) -> Optional[str]:
+        """
+        返回由缓存文件派生的副本（{file}.json{suffix}），如 gzip 预压缩、二进制流容器
+
+        首次请求时由 build(原文件字节) 生成并原子写入，之后直接复用；副本早于原文件（缓存被重写）时重新生成。
+        生成失败返回 None，调用方回退到原文件。
+        """
+        variant = self.variant_path(file_path, suffix)
+        try:
+            src_mtime = os.stat(file_path).st_mtime_ns
+            try:
+                if os.stat(variant).st_mtime_ns >= src_mtime:
+                    return variant
+            except FileNotFoundError:
+                pass
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            _atomic_write(variant, build(raw))
+            return variant
+        except Exception as e:
+            logger.warning(f"[cache-variant][failed] file={file_path}, suffix={suffix}, error: {e}")
+            return None
+
+    def get_compressed_file(self, file_path: str) -> Optional[str]:
+        """返回缓存文件的 gzip 预压缩副本（{file}.json.gz）。"""
+        return self.get_variant_file(
+            file_path, COMPRESSED_SUFFIX, lambda raw: gzip.compress(raw, compresslevel=COMPRESS_LEVEL, mtime=0)
+        )
+
+    def remove_cache_files(self, file_path: Optional[str]) -> int:
+        """删除缓存文件及其派生副本，返回释放的字节数。"""
+        if not file_path:
+            return 0
+        freed = 0
+        for path in (file_path, *(self.variant_path(file_path, s) for s in VARIANT_SUFFIXES)):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"[cache-remove][failed] file={path}, error: {e}")
+        return freed
+
+    def set_cache(self, db: Session, activity_id: int, cache_key: str, data: Union[Dict[str, Any], bytes], metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """写入缓存；data 可为已序列化的 JSON 字节（与响应体共用，避免重复序列化）。"""
         try:
             file_name = f"{activity_id}_{cache_key}.json"
             file_path = os.path.join(self.storage_base_path, file_name)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 原子替换：命中快路径可能正按原始字节读取旧文件
+            body = data if isinstance(data, (bytes, bytearray)) else fast_json.dumps(data)
+            _atomic_write(file_path, body)
+            for suffix in VARIANT_SUFFIXES:
+                try:
+                    os.remove(self.variant_path(file_path, suffix))
+                except FileNotFoundError:
+                    pass
             file_size = os.path.getsize(file_path)
-            expires_at = None
-            cache_record = db.query(TbActivityCache).filter(
-                TbActivityCache.activity_id == activity_id
-            ).first()
-            if cache_record:
-                cache_record.cache_key = cache_key
-                cache_record.file_path = file_path
-                cache_record.file_size = file_size
-                cache_record.updated_at = datetime.now()
-                cache_record.expires_at = expires_at
-                cache_record.is_active = 1
-                cache_record.cache_metadata = json.dumps(metadata) if metadata else None
-            else:
-                cache_record = TbActivityCache(
-                    activity_id=activity_id,
-                    cache_key=cache_key,
-                    file_path=file_path,
-                    file_size=file_size,
-                    created_at=datetime.now(),
-                    updated_at=datetime.now(),
-                    expires_at=expires_at,
-                    cache_metadata=json.dumps(metadata) if metadata else None
-                )
-                db.add(cache_record)
-            db.commit()
+            now = datetime.now()
+            expires_at = now + timedelta(days=CACHE_MAX_AGE_DAYS) if CACHE_MAX_AGE_DAYS > 0 else None
+            # 缓存索引属于附属写入：工作单元内失败只回滚自身保存点，不影响本次分析的核心写入
+            with ancillary_write(db, "cache.set", activity_id=activity_id):
+                cache_record = db.query(TbActivityCache).filter(
+                    TbActivityCache.activity_id == activity_id
+                ).first()
+                if cache_record:
+                    cache_record.cache_key = cache_key
+                    cache_record.file_path = file_path
+                    cache_record.file_size = file_size
+                    cache_record.updated_at = now
+                    cache_record.expires_at = expires_at
+                    cache_record.last_accessed_at = now
+                    cache_record.is_active = 1
+                    cache_record.cache_metadata = json.dumps(metadata) if metadata else None
+                else:
+                    cache_record = TbActivityCache(
+                        activity_id=activity_id,
+                        cache_key=cache_key,
+                        file_path=file_path,
+                        file_size=file_size,
+                        created_at=now,
+                        updated_at=now,
+                        expires_at=expires_at,
+                        last_accessed_at=now,
+                        cache_metadata=json.dumps(metadata) if metadata else None
+                    )
+                    db.add(cache_record)
+                commit_or_flush(db)
             logger.info(f"缓存设置成功: activity_id={activity_id}, cache_key={cache_key}, file_path={file_path}")
             return True
         except Exception as e:
             logger.error(f"设置缓存失败: activity_id={activity_id}, error: {e}")
-            db.rollback()
             return False
 
     def invalidate_cache(self, db: Session, activity_id: int) -> bool:
@@ -99,11 +323,7 @@ class ActivityCacheManager:
                 TbActivityCache.activity_id == activity_id
             ).all()
             for record in cache_records:
-                if os.path.exists(record.file_path):
-                    try:
-                        os.remove(record.file_path)
-                    except OSError:
-                        pass
+                self.remove_cache_files(record.file_path)
                 record.is_active = 0
                 record.updated_at = datetime.now()
             db.commit()
@@ -136,6 +356,9 @@ class ActivityCacheManager:
             
             if not cache_record:
                 return None
+
+            if not self._is_fresh(db, cache_record):
+                return None
             
             if not os.path.exists(cache_record.file_path):
                 logger.warning(f"[metric-cache][file-missing] activity_id={activity_id}, file={cache_record.file_path}")
@@ -147,6 +370,7 @@ class ActivityCacheManager:
             metric_data = all_cache_data.get(metric_name)
             if metric_data is None:
                 return None
+            self._note_access(cache_record)
             
             logger.debug(f"[metric-cache][hit] activity_id={activity_id}, metric={metric_name}")
             return metric_data
@@ -171,10 +395,25 @@ class ActivityCacheManager:
             ).first()
             if not cache_record:
                 return False
-            return os.path.exists(cache_record.file_path)
+            return os.path.exists(cache_record.file_path) and self._is_fresh(db, cache_record)
         except Exception:
             return False
 
+    def list_stale_entries(self, db: Session, athlete_id: int) -> List[TbActivityCache]:
+        """列出某运动员依赖版本已过期的有效缓存记录（供后台按运动员刷新）。"""
+        from ..repositories.activity_repo import get_athlete_by_id
+        athlete = get_athlete_by_id(db, athlete_id)
+        if not athlete:
+            return []
+        current = self.dependency_versions(athlete)
+        records = db.query(TbActivityCache).join(
+            TbActivity, TbActivity.id == TbActivityCache.activity_id
+        ).filter(
+            TbActivity.athlete_id == athlete_id,
+            TbActivityCache.is_active == 1,
+        ).all()
+        return [r for r in records if not self._is_fresh(db, r, current)]
+
 
 activity_cache_manager = ActivityCacheManager()
 
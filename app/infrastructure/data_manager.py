@@ -2,23 +2,47 @@
 活动数据管理器模块
 
 用于全局管理数据流获取，避免重复下载和解析FIT文件。
+
+流数据按 (活动, 通道, 分辨率) 缓存一份，不同 key 组合的请求按引用拼装；
+通道缓存按估算字节数计量，超出 STREAM_CACHE_MAX_BYTES 时按 LRU 淘汰。
 """
 
+import sys
 import time
 import threading
-from typing import List, Optional, Dict, Any
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 import logging
-from ..streams.models import Resolution
+from ..streams.models import Resolution, round_window
 from ..streams.crud import stream_crud
+from ..config import STREAM_CACHE_MAX_BYTES
 
 
 logger = logging.getLogger(__name__)
 
 
+def _estimate_item_bytes(item: Optional[Dict[str, Any]]) -> int:
+    """估算流条目占用的字节数：列表本身 + 元素对象（按首个非空元素的大小估算）。"""
+    if not item:
+        return 0
+    data = item.get("data")
+    if data is None:
+        return sys.getsizeof(item)
+    if hasattr(data, "nbytes"):
+        return sys.getsizeof(item) + int(data.nbytes)
+    sample = next((v for v in data if v is not None), None)
+    per_item = sys.getsizeof(sample) if sample is not None else 0
+    return sys.getsizeof(item) + sys.getsizeof(data) + per_item * len(data)
+
+
 class ActivityDataManager:
-    def __init__(self, cache_ttl: int = 3600, max_cache_size: int = 100):
+    def __init__(self, cache_ttl: int = 3600, max_cache_size: int = 100, max_stream_bytes: int = STREAM_CACHE_MAX_BYTES):
         self._stream_cache = {}
+        # 通道缓存：(activity_id, channel, resolution, target_points, algorithm, window) -> (条目, 写入时间, 估算字节数)
+        self._channel_cache: "OrderedDict[tuple, Tuple[Optional[Dict[str, Any]], float, int]]" = OrderedDict()
+        self._channel_bytes = 0
+        self._max_stream_bytes = max_stream_bytes
         self._session_cache = {}
         self._athlete_cache = {}
         self._cache_timestamps = {}
@@ -38,6 +62,7 @@ class ActivityDataManager:
     def _cleanup_expired_cache(self):
         current_time = time.time()
         with self._lock:
+            self._drop_channels(lambda _, entry: current_time - entry[1] > self._cache_ttl)
             expired_keys = [key for key, timestamp in self._cache_timestamps.items() if current_time - timestamp > self._cache_ttl]
             for key in expired_keys:
                 self._stream_cache.pop(key, None)
@@ -52,15 +77,68 @@ class ActivityDataManager:
                     self._session_cache.pop(key, None)
                     self._cache_timestamps.pop(key, None)
 
-    def get_activity_streams(self, db: Session, activity_id: int, keys: List[str], resolution: Resolution) -> List[Dict[str, Any]]:
-        cache_key = f"{activity_id}_{resolution.value}_{','.join(sorted(keys))}"
+    def get_activity_streams(
+        self,
+        db: Session,
+        activity_id: int,
+        keys: List[str],
+        resolution: Resolution,
+        target_points: Optional[int] = None,
+        algorithm: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        axis: str = "time",
+    ) -> List[Dict[str, Any]]:
+        """
+        按通道缓存流数据：每个 (活动, 通道, 分辨率, 点数, 算法, 窗口) 只存一份，
+        任意 key 组合的请求都由缓存项按引用拼装（调用方不得原地修改返回的条目）。
+        窗口以取整后的边界（round_window）入键，相近的缩放请求命中同一条目。
+        """
+        window_key = (axis, *round_window(start, end, axis)) if (start is not None or end is not None) else None
+        current_time = time.time()
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing: List[str] = []
         with self._lock:
-            current_time = time.time()
-            if cache_key in self._stream_cache and cache_key in self._cache_timestamps and current_time - self._cache_timestamps[cache_key] <= self._cache_ttl:
-                return self._stream_cache[cache_key]
-            self._stream_cache[cache_key] = stream_crud.get_activity_streams(db, activity_id, keys, resolution)
-            self._cache_timestamps[cache_key] = current_time
-        return self._stream_cache[cache_key]
+            for key in dict.fromkeys(keys):
+                channel_key = (activity_id, key, resolution.value, target_points, algorithm, window_key)
+                entry = self._channel_cache.get(channel_key)
+                if entry is not None and current_time - entry[1] <= self._cache_ttl:
+                    self._channel_cache.move_to_end(channel_key)
+                    found[key] = entry[0]
+                else:
+                    missing.append(key)
+        if missing:
+            fetched = stream_crud.get_activity_streams(
+                db, activity_id, missing, resolution, target_points, algorithm, start, end, axis
+            )
+            by_type = {item["type"]: item for item in fetched}
+            with self._lock:
+                for key in missing:
+                    # 无数据的通道也缓存（None），避免重复解析
+                    item = by_type.get(key)
+                    self._store_channel((activity_id, key, resolution.value, target_points, algorithm, window_key), item, current_time)
+                    found[key] = item
+                self._evict_channels()
+        return [found[key] for key in keys if found.get(key) is not None]
+
+    def _store_channel(self, channel_key: tuple, item: Optional[Dict[str, Any]], stored_at: float) -> None:
+        size = _estimate_item_bytes(item)
+        previous = self._channel_cache.pop(channel_key, None)
+        if previous is not None:
+            self._channel_bytes -= previous[2]
+        self._channel_cache[channel_key] = (item, stored_at, size)
+        self._channel_bytes += size
+
+    def _evict_channels(self) -> None:
+        """超出字节预算时按 LRU 淘汰通道缓存（需持有 self._lock）。"""
+        while self._channel_cache and self._channel_bytes > self._max_stream_bytes:
+            _, (_, _, size) = self._channel_cache.popitem(last=False)
+            self._channel_bytes -= size
+
+    def _drop_channels(self, predicate) -> None:
+        for channel_key in [k for k, v in self._channel_cache.items() if predicate(k, v)]:
+            _, _, size = self._channel_cache.pop(channel_key)
+            self._channel_bytes -= size
 
     def get_activity_stream_data(self, db: Session, activity_id: int) -> Dict[str, Any]:
         cache_key = f"{activity_id}_raw"
@@ -126,12 +204,15 @@ class ActivityDataManager:
     def clear_cache(self, activity_id: Optional[int] = None):
         with self._lock:
             if activity_id is None:
+                self._channel_cache.clear()
+                self._channel_bytes = 0
                 self._stream_cache.clear()
                 self._session_cache.clear()
                 self._athlete_cache.clear()
                 self._cache_timestamps.clear()
                 stream_crud._parsed_cache.clear()
             else:
+                self._drop_channels(lambda channel_key, _: channel_key[0] == activity_id)
                 keys_to_remove = [key for key in list(self._stream_cache.keys()) if key.startswith(f"{activity_id}_")]
                 for key in keys_to_remove:
                     self._stream_cache.pop(key, None)
@@ -147,6 +228,9 @@ class ActivityDataManager:
         with self._lock:
             return {
                 "stream_cache_size": len(self._stream_cache),
+                "channel_cache_entries": len(self._channel_cache),
+                "channel_cache_bytes": self._channel_bytes,
+                "channel_cache_max_bytes": self._max_stream_bytes,
                 "session_cache_size": len(self._session_cache),
                 "athlete_cache_size": len(self._athlete_cache),
                 "total_cache_entries": len(self._cache_timestamps),
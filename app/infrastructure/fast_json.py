@@ -0,0 +1,82 @@
+"""
+大体量分析结果的快速 JSON 序列化
+
+/all 未命中时的结果（十余条逐点流、每条上万个数值）只需序列化一次：
+同一份字节既写入缓存文件，也直接作为响应体返回，不再经过
+model_dump → json.dump(indent=2) → FastAPI 默认编码器三次遍历。
+
+- 安装了 orjson 时使用 orjson（原生支持 NumPy 数组/标量，NaN/Inf 输出为 null）；
+- 未安装时回退到标准库 json（紧凑分隔符、保留中文），NumPy 数组经 tolist() 一次性转换；
+  出现 NaN/Inf 时同样输出为 null，两种实现结果一致且均为合法 JSON。
+"""
+
+import json
+import math
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict
+
+import numpy as np
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:  # 可选依赖
+    import orjson
+except ImportError:  # pragma: no cover - 视部署环境而定
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, BaseModel):
+        return model_payload(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _sanitize(obj: Any) -> Any:
+    """将 NaN/Inf 替换为 None（仅在标准库序列化遇到非有限浮点数时使用）。"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sanitize(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "f":
+            return np.where(np.isfinite(obj), obj, None).tolist()
+        return obj.tolist()
+    if isinstance(obj, np.floating):
+        return _sanitize(float(obj))
+    if isinstance(obj, BaseModel):
+        return _sanitize(model_payload(obj))
+    return obj
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化为紧凑的 UTF-8 JSON 字节。"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    try:
+        text = json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default)
+    except ValueError:
+        text = json.dumps(_sanitize(obj), ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default)
+    return text.encode("utf-8")
+
+
+def model_payload(model: BaseModel) -> Dict[str, Any]:
+    """浅层展开模型字段（字段顺序与 model_dump 一致），嵌套模型与数组交由 dumps 直接编码。"""
+    return {name: getattr(model, name, None) for name in type(model).model_fields}
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 dumps 编码的 JSONResponse；直接返回该响应可跳过 FastAPI 的 jsonable_encoder 遍历。"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
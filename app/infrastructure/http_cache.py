@@ -0,0 +1,49 @@
+"""
+HTTP 条件请求（ETag / If-None-Match / Cache-Control）
+
+- make_etag：由内容版本各组成部分计算强 ETag（同一表示形式字节级一致）；
+- if_none_match：判断请求头 If-None-Match 是否命中给定 ETag；
+- not_modified：构造 304 响应（只带校验头，无响应体）。
+
+各接口在读取缓存文件或开始计算之前比较 ETag，命中时直接返回 304。
+"""
+
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# 每次使用前需向服务端校验（命中时 304，仅传输响应头）
+NO_CACHE = "private, no-cache"
+# 只由 FIT 内容决定的流数据：有效期内客户端无需校验
+IMMUTABLE = "private, max-age=86400, immutable"
+
+
+def make_etag(*parts: Any) -> str:
+    """由版本组成部分计算强 ETag；None 与空串等价。"""
+    raw = "\x1f".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """If-None-Match 含 * 或与 etag 相同的实体标签时返回 True（按 RFC 9110 弱比较，忽略 W/ 前缀）。"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for token in header.split(","):
+        token = token.strip()
+        if token == "*":
+            return True
+        if token.startswith("W/"):
+            token = token[2:]
+        if token == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str, vary: Optional[str] = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
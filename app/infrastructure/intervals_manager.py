@@ -72,6 +72,15 @@ def load_intervals(activity_id: int) -> Optional[Dict[str, Any]]:
         return None
 
 
+def intervals_version(activity_id: int) -> Optional[str]:
+    """区间文件的版本标识（修改时间 + 大小，仅 stat 不读取内容）；文件不存在返回 None"""
+    try:
+        stat = (INTERVALS_DIR / f"{activity_id}.json").stat()
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
 def delete_intervals(activity_id: int) -> bool:
     """删除指定活动的 intervals 文件
     
@@ -5,11 +5,12 @@ FIT文件分析API主应用文件。
 1. 创建FastAPI应用实例
 2. 注册各个模块的路由
 3. 配置API文档标签
+4. 启动后台任务（活动缓存 GC）
 """
 
 from fastapi import FastAPI
 from .logging_config import setup_logging
-from .config import LOG_LEVEL
+from .config import LOG_LEVEL, CACHE_GC_INTERVAL_SECONDS
 
 from .api.streams import router as streams_router
 from .api.activities import router as activities_router
@@ -26,3 +27,9 @@ app.include_router(activities_router, tags=["活动"])
 app.include_router(activities_legacy_router, tags=["活动-历史"])
 app.include_router(athletes_router, tags=["运动员"])
 app.include_router(test_router, tags=["测试"])
+
+
+@app.on_event("startup")
+def start_background_tasks() -> None:
+    from .infrastructure.cache_gc import activity_cache_gc
+    activity_cache_gc.start_background(CACHE_GC_INTERVAL_SECONDS)
@@ -2,10 +2,20 @@
 from typing import Dict, Any, Optional, Tuple
 import logging
 
+import numpy as np
+
+from ...core.analytics.cadence import pedal_dynamics, total_strokes
+from ...core.analytics.context import AnalysisContext
+
 logger = logging.getLogger(__name__)
 
 
-def compute_cadence_info(stream_data: Dict[str, Any], session_data: Optional[Dict[str, Any]] = None, activity_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+def compute_cadence_info(
+    stream_data: Dict[str, Any],
+    session_data: Optional[Dict[str, Any]] = None,
+    activity_type: Optional[str] = None,
+    context: Optional[AnalysisContext] = None,
+) -> Optional[Dict[str, Any]]:
     """计算踏频相关信息：平均/最大踏频。
 
     对于跑步活动，踏频数据需要乘以2（因为设备记录的是单侧步频，需要转换为总步频）。
@@ -13,17 +23,19 @@ def compute_cadence_info(stream_data: Dict[str, Any], session_data: Optional[Dic
     参数：
         stream_data: 流数据
         session_data: 会话数据（可选）
-        is_running: 是否为跑步活动（默认False）
+        activity_type: 活动类型
+        context: 请求级数组上下文（可选，缺省时由 stream_data 构建）
     """
-    cadence_raw = stream_data.get('cadence', [])
-    cadence = [c for c in cadence_raw if c is not None]
-    if not cadence:
+    context = context or AnalysisContext.from_stream_data(stream_data)
+    cadence_all = context.array('cadence')
+    cadence = cadence_all[np.isfinite(cadence_all)]
+    if cadence.size == 0:
         logger.debug("[cadence] no cadence stream; return None")
         return None
 
     # 如果是跑步活动，踏频需要乘以2（单侧步频 -> 总步频）
     if activity_type in ["run", "trail_run", "virtual_run"]:
-        cadence = [c * 2 for c in cadence]
+        cadence = cadence * 2
 
     res: Dict[str, Any] = {}
 
@@ -35,7 +47,7 @@ def compute_cadence_info(stream_data: Dict[str, Any], session_data: Optional[Dic
             avg_cad = int(avg_cad * 2)
         res['avg_cadence'] = avg_cad
     else:
-        res['avg_cadence'] = int(sum(cadence) / len(cadence)) if cadence else None
+        res['avg_cadence'] = int(cadence.mean())
 
     if session_data and 'max_cadence' in session_data and session_data['max_cadence'] is not None:
         max_cad = int(session_data['max_cadence'])
@@ -44,68 +56,19 @@ def compute_cadence_info(stream_data: Dict[str, Any], session_data: Optional[Dic
             max_cad = int(max_cad * 2)
         res['max_cadence'] = max_cad
     else:
-        res['max_cadence'] = int(max(cadence)) if cadence else None
+        res['max_cadence'] = int(cadence.max())
 
     # 对于骑行活动，计算左右平衡、扭矩效率、踏板平顺度等指标
     if activity_type in ["ride", "virtualride", "ebikeride"]:
-        # 左右平衡
-        lrb = stream_data.get('left_right_balance', [])
-        if lrb:
-            valid_lrb = [v for v in lrb if v is not None and v >= 0]
-            if valid_lrb:
-                avg_lrb = sum(valid_lrb) / len(valid_lrb)
-                # left_right_balance 通常是百分比（0-100），需要转换为左右值
-                # 假设值是左脚的百分比
-                left_pct = int(round(avg_lrb))
-                right_pct = 100 - left_pct
-                res['left_right_balance'] = {'left': left_pct, 'right': right_pct}
-            else:
-                res['left_right_balance'] = None
-        else:
-            res['left_right_balance'] = None
-        
-        # 扭矩效率
-        lte = stream_data.get('left_torque_effectiveness', [])
-        rte = stream_data.get('right_torque_effectiveness', [])
-        if lte:
-            valid_lte = [v for v in lte if v is not None and v >= 0]
-            res['left_torque_effectiveness'] = round(sum(valid_lte) / len(valid_lte), 2) if valid_lte else None
-        else:
-            res['left_torque_effectiveness'] = None
-        if rte:
-            valid_rte = [v for v in rte if v is not None and v >= 0]
-            res['right_torque_effectiveness'] = round(sum(valid_rte) / len(valid_rte), 2) if valid_rte else None
-        else:
-            res['right_torque_effectiveness'] = None
-        
-        # 踏板平顺度
-        lps = stream_data.get('left_pedal_smoothness', [])
-        rps = stream_data.get('right_pedal_smoothness', [])
-        if lps:
-            valid_lps = [v for v in lps if v is not None and v >= 0]
-            res['left_pedal_smoothness'] = round(sum(valid_lps) / len(valid_lps), 2) if valid_lps else None
-        else:
-            res['left_pedal_smoothness'] = None
-        if rps:
-            valid_rps = [v for v in rps if v is not None and v >= 0]
-            res['right_pedal_smoothness'] = round(sum(valid_rps) / len(valid_rps), 2) if valid_rps else None
-        else:
-            res['right_pedal_smoothness'] = None
-        
-        # 总踏频（转数）
+        res.update(pedal_dynamics(context))
+
+        # 总踏频（转数）：有逐点时间时按时间差累计，否则按 1 Hz 估算
         try:
-            elapsed_time = stream_data.get('elapsed_time', [])
-            if elapsed_time and len(elapsed_time) == len(cadence):
-                acc = 0.0
-                prev = elapsed_time[0] if elapsed_time else 0
-                for i in range(1, len(cadence)):
-                    dt = max(0, (elapsed_time[i] if i < len(elapsed_time) else elapsed_time[-1]) - prev)
-                    acc += (cadence[i] or 0) * (dt / 60.0)
-                    prev = elapsed_time[i] if i < len(elapsed_time) else elapsed_time[-1]
-                res['total_strokes'] = int(round(acc))
+            elapsed_time = context.array('elapsed_time')
+            if elapsed_time.size and elapsed_time.size == cadence_all.size:
+                res['total_strokes'] = total_strokes(np.nan_to_num(cadence_all), elapsed_time)
             else:
-                # 如果没有时间数据，使用简单的估算
-                res['total_strokes'] = int(round(sum(cadence) / 60.0))
+                res['total_strokes'] = int(round(float(cadence.sum()) / 60.0))
         except Exception:
             res['total_strokes'] = None
         
@@ -118,13 +81,14 @@ def compute_cadence_info(stream_data: Dict[str, Any], session_data: Optional[Dic
         res['right_pedal_smoothness'] = None
         res['total_strokes'] = None
 
-
     if activity_type in ["run", "trail_run", "virtual_run"]:
-        speed_data = stream_data.get('speed', []) 
-        avg_speed = sum([s for s in speed_data if s is not None and s > 0]) / len([s for s in speed_data if s is not None and s > 0])
-        res['avg_stride_length'] = round(avg_speed * 60.0 / res['avg_cadence'], 2)
+        speed = context.array('speed')
+        moving = speed[speed > 0]
+        if moving.size and res['avg_cadence']:
+            res['avg_stride_length'] = round(float(moving.mean()) * 60.0 / res['avg_cadence'], 2)
+        else:
+            res['avg_stride_length'] = None
     else:
         res['avg_stride_length'] = None
 
-    print(res['avg_stride_length'])
     return res
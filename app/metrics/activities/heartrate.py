@@ -1,38 +1,47 @@
 """本地流心率指标装配（平均/最大/恢复）。"""
 from typing import Dict, Any, Optional
+from ...core.analytics.context import AnalysisContext
 from ...core.analytics.hr import (
-    filter_hr_smooth,
-    recovery_rate,
-    efficiency_index,
+    masked_recovery_rate,
+    masked_efficiency_index,
+    masked_decoupling_rate,
     hr_lag_seconds,
-    decoupling_rate,
+    hr_lag_profile,
 )
 
 
-def compute_heartrate_info(stream_data: Dict[str, Any], power_data_present: bool, session_data: Optional[Dict[str, Any]] = None, activity_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+def compute_heartrate_info(
+    stream_data: Dict[str, Any],
+    power_data_present: bool,
+    session_data: Optional[Dict[str, Any]] = None,
+    activity_type: Optional[str] = None,
+    context: Optional[AnalysisContext] = None,
+) -> Optional[Dict[str, Any]]:
+    context = context or AnalysisContext.from_stream_data(stream_data)
     hr_data = stream_data.get('heart_rate', [])
-    valid_hr = filter_hr_smooth(hr_data)
-    if not valid_hr:
+    valid_hr = context.valid_hr
+    if valid_hr.size == 0:
         return None
 
     result: Dict[str, Any] = {}
     
-    result['avg_heartrate'] = int(session_data['avg_heart_rate']) if session_data and 'avg_heart_rate' in session_data else int(sum(valid_hr) / len(valid_hr))
-    result['max_heartrate'] = int(session_data['max_heart_rate']) if session_data and 'max_heart_rate' in session_data else int(max(valid_hr))
+    result['avg_heartrate'] = int(session_data['avg_heart_rate']) if session_data and 'avg_heart_rate' in session_data else int(valid_hr.mean())
+    result['max_heartrate'] = int(session_data['max_heart_rate']) if session_data and 'max_heart_rate' in session_data else int(valid_hr.max())
 
     if power_data_present:
-        result['heartrate_recovery_rate'] = recovery_rate(hr_data)
+        result['heartrate_recovery_rate'] = masked_recovery_rate(context.hr)
         
         # 对于骑行活动（有功率数据），计算 efficiency_index, heartrate_lag, decoupling_rate
         power_data = stream_data.get('power', [])
-        if activity_type in ["ride", "virtualride", "ebikeride"] and power_data and valid_hr:
-            eff_index = efficiency_index(power_data, hr_data)
-            result['efficiency_index'] = eff_index
-            result['heartrate_lag'] = hr_lag_seconds(power_data, hr_data)
-            result['decoupling_rate'] = decoupling_rate(power_data, hr_data)
+        if activity_type in ["ride", "virtualride", "ebikeride"] and power_data:
+            result['efficiency_index'] = masked_efficiency_index(context.normalized_power, context.hr)
+            result['heartrate_lag'] = hr_lag_seconds(context.power, hr_data)
+            result['heartrate_lag_profile'] = hr_lag_profile(context.power, hr_data)
+            result['decoupling_rate'] = masked_decoupling_rate(context.power, context.hr)
         else:
             result['efficiency_index'] = None
             result['heartrate_lag'] = None
+            result['heartrate_lag_profile'] = None
             result['decoupling_rate'] = None
 
     return result
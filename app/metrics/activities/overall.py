@@ -1,5 +1,6 @@
 """本地流 Overall 指标装配（距离/时间/速度/爬升/功率/卡路里等）。"""
 from typing import Dict, Any, Optional
+from ...config import ELEVATION_HYSTERESIS_M
 from ...core.analytics.time_utils import format_time
 from ...core.analytics.altitude import elevation_gain
 from ...core.analytics.training import (
@@ -43,7 +44,7 @@ def compute_overall_info(
     # 爬升
     elevation = (
         int(session_data['total_ascent']) if session_data and session_data.get('total_ascent')
-        else int(elevation_gain(stream_data.get('altitude', []))) if stream_data.get('altitude') else None
+        else int(elevation_gain(stream_data.get('altitude', []), ELEVATION_HYSTERESIS_M)) if stream_data.get('altitude') else None
     )
     res['elevation_gain'] = elevation
 
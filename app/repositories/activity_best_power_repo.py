@@ -0,0 +1,218 @@
+"""单次活动最佳功率窄表仓库（tb_activity_best_power）与运动员 Top3 整体重建。
+
+- save_activity_best_powers：分析活动时写入该活动各时间窗最佳功率、距离与爬升（重复分析覆盖旧值）；
+- rebuild_power_records：按窄表（合并尚未回填活动的现有纪录）对单个或全部运动员一次性重算
+  tb_athlete_power_records 的 Top3，用于活动删除/重新上传后修复增量更新留下的陈旧纪录；
+  历史活动的窄表数据由 services.power_records_service.backfill_activity_best_powers 从 FIT 文件回填。
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..db.models import TbActivity, TbActivityBestPower, TbAthletePowerRecords
+from ..db.unit_of_work import ancillary_write, commit_or_flush, rollback_or_abort
+from .power_records_repo import INTERVAL_FIELD_MAP
+
+logger = logging.getLogger(__name__)
+
+# 窄表 metric -> tb_athlete_power_records 字段前缀
+RECORD_METRICS: Dict[str, str] = {
+    **{key: f"power_{suf}" for key, suf in INTERVAL_FIELD_MAP.items()},
+    'longest_ride': 'longest_ride',
+    'max_elevation': 'max_elevation',
+}
+_METRIC_KEYS: List[str] = list(RECORD_METRICS.keys())
+_RANK_SUFFIXES: Tuple[str, str, str] = ('1st', '2nd', '3rd')
+
+
+def save_activity_best_powers(
+    db: Session,
+    athlete_id: int,
+    activity_id: int,
+    best_powers: Optional[Dict[str, int]],
+    distance_m: Optional[int] = None,
+    elevation_gain_m: Optional[int] = None,
+) -> None:
+    """覆盖写入某活动的最佳功率/距离/爬升（单位与功率纪录表一致：W/km/m）；失败只记录日志。"""
+    values: Dict[str, int] = {}
+    for key, value in (best_powers or {}).items():
+        if key in INTERVAL_FIELD_MAP and value is not None and int(value) > 0:
+            values[key] = int(value)
+    km = int(round((distance_m or 0) / 1000.0))
+    if km > 0:
+        values['longest_ride'] = km
+    if elevation_gain_m is not None and int(elevation_gain_m) > 0:
+        values['max_elevation'] = int(elevation_gain_m)
+
+    # 窄表属于附属写入：工作单元内失败（如表尚未创建）只回滚自身保存点，不影响 EF/TSS/状态/纪录等核心写入
+    try:
+        with ancillary_write(db, "activity_best_power.save", activity_id=activity_id):
+            now = datetime.now()
+            db.query(TbActivityBestPower).filter(
+                TbActivityBestPower.activity_id == activity_id
+            ).delete(synchronize_session=False)
+            db.bulk_insert_mappings(TbActivityBestPower, [
+                {
+                    'activity_id': activity_id,
+                    'athlete_id': athlete_id,
+                    'metric': metric,
+                    'value': value,
+                    'updated_at': now,
+                }
+                for metric, value in values.items()
+            ])
+            commit_or_flush(db)
+    except Exception as e:
+        logger.error("[db-error][activity-best-power] activity_id=%s err=%s", activity_id, e)
+
+
+def _top3_per_metric(
+    activity_ids: np.ndarray,
+    metric_idx: np.ndarray,
+    values: np.ndarray,
+) -> Dict[str, object]:
+    """单个运动员：透视为 活动×指标 矩阵后按列 argpartition 取 Top3。
+
+    同值时活动 ID 小者（先上传）在前，与增量更新“严格大于才挤占名次”的语义一致。
+    """
+    uniq_acts, act_pos = np.unique(activity_ids, return_inverse=True)
+    matrix = np.full((uniq_acts.size, len(_METRIC_KEYS)), -1, dtype=np.int64)
+    # 同一活动同一指标出现多次（窄表与旧纪录重叠等）时取最大值
+    np.maximum.at(matrix, (act_pos, metric_idx), values)
+
+    fields: Dict[str, object] = {}
+    k = min(3, uniq_acts.size)
+    # 每列第 k 大值作为阈值，只对不低于阈值的候选做精确排序
+    kth = np.partition(matrix, uniq_acts.size - k, axis=0)[uniq_acts.size - k]
+    for col, metric in enumerate(_METRIC_KEYS):
+        prefix = RECORD_METRICS[metric]
+        column = matrix[:, col]
+        cand = np.flatnonzero((column >= kth[col]) & (column > 0))
+        order = cand[np.lexsort((uniq_acts[cand], -column[cand]))][:3]
+        for rank, suffix in enumerate(_RANK_SUFFIXES):
+            if rank < order.size:
+                fields[f"{prefix}_{suffix}"] = int(column[order[rank]])
+                fields[f"{prefix}_{suffix}_activity_id"] = int(uniq_acts[order[rank]])
+            else:
+                fields[f"{prefix}_{suffix}"] = None
+                fields[f"{prefix}_{suffix}_activity_id"] = None
+    return fields
+
+
+def _record_candidates(
+    db: Session,
+    records: List[TbAthletePowerRecords],
+    covered: Set[int],
+) -> List[Tuple[int, int, int, int]]:
+    """把现有 Top3 中未被窄表覆盖、且活动仍存在的条目转为候选 (athlete, activity, metric, value)。
+
+    窄表只包含上线后重新分析过的活动，历史纪录须保留到这些活动被回填为止；
+    未记录活动 ID 的条目无法校验是否已删除，一并出局。
+    """
+    entries: List[Tuple[int, int, int, int]] = []
+    for rec in records:
+        for pos, metric in enumerate(_METRIC_KEYS):
+            prefix = RECORD_METRICS[metric]
+            for suffix in _RANK_SUFFIXES:
+                value = getattr(rec, f"{prefix}_{suffix}")
+                act_id = getattr(rec, f"{prefix}_{suffix}_activity_id")
+                if value and act_id is not None and int(act_id) not in covered:
+                    entries.append((int(rec.athlete_id), int(act_id), pos, int(value)))
+    if not entries:
+        return entries
+    alive = {
+        aid for (aid,) in db.query(TbActivity.id).filter(
+            TbActivity.id.in_({e[1] for e in entries})
+        ).all()
+    }
+    return [e for e in entries if e[1] in alive]
+
+
+def rebuild_power_records(db: Session, athlete_id: Optional[int] = None) -> int:
+    """整体重建 Top3（athlete_id 为空时重建全部运动员），返回重建的运动员数。
+
+    - 候选值：窄表中仍存在活动的数值 + 现有 Top3 里尚未进入窄表（未回填）且仍存在的活动条目，
+      窄表未完全覆盖前不会丢失历史纪录；
+    - 已删除活动（tb_activity 中不存在）自动出局，没有任何剩余候选的运动员纪录清空；
+    - 一次查询读取、一次批量更新/插入写回。
+    """
+    try:
+        query = db.query(
+            TbActivity.athlete_id,
+            TbActivityBestPower.activity_id,
+            TbActivityBestPower.metric,
+            TbActivityBestPower.value,
+        ).join(TbActivity, TbActivity.id == TbActivityBestPower.activity_id)
+        if athlete_id is not None:
+            query = query.filter(TbActivity.athlete_id == athlete_id)
+        metric_pos = {metric: i for i, metric in enumerate(_METRIC_KEYS)}
+        rows = [
+            (int(r[0]), int(r[1]), metric_pos[r[2]], int(r[3] or 0))
+            for r in query.filter(TbActivityBestPower.metric.in_(_METRIC_KEYS)).all()
+        ]
+
+        rec_query = db.query(TbAthletePowerRecords)
+        if athlete_id is not None:
+            rec_query = rec_query.filter(TbAthletePowerRecords.athlete_id == athlete_id)
+        records = rec_query.all()
+        covered = {r[1] for r in rows}
+        legacy = _record_candidates(db, records, covered)
+        existing = {int(rec.athlete_id) for rec in records}
+        rebuild_ids = sorted(existing | {r[0] for r in rows})
+        if not rebuild_ids:
+            return 0
+
+        candidates = rows + legacy
+        count = len(candidates)
+        athletes = np.fromiter((c[0] for c in candidates), dtype=np.int64, count=count)
+        activities = np.fromiter((c[1] for c in candidates), dtype=np.int64, count=count)
+        metrics = np.fromiter((c[2] for c in candidates), dtype=np.int64, count=count)
+        values = np.fromiter((c[3] for c in candidates), dtype=np.int64, count=count)
+
+        order = np.argsort(athletes, kind='stable')
+        athletes, activities, metrics, values = athletes[order], activities[order], metrics[order], values[order]
+        uniq_athletes, starts = np.unique(athletes, return_index=True)
+        ends = np.append(starts[1:], athletes.size)
+        bounds = {aid: (lo, hi) for aid, lo, hi in zip(uniq_athletes.tolist(), starts.tolist(), ends.tolist())}
+
+        now = datetime.now()
+        updates: List[Dict[str, object]] = []
+        inserts: List[Dict[str, object]] = []
+        cleared = 0
+        for aid in rebuild_ids:
+            if aid in bounds:
+                lo, hi = bounds[aid]
+                fields = _top3_per_metric(activities[lo:hi], metrics[lo:hi], values[lo:hi])
+            else:
+                # 没有任何剩余候选（活动均已删除）：清空全部名次
+                fields = {
+                    f"{RECORD_METRICS[metric]}_{suffix}{tail}": None
+                    for metric in _METRIC_KEYS for suffix in _RANK_SUFFIXES for tail in ('', '_activity_id')
+                }
+                cleared += 1
+            fields['athlete_id'] = aid
+            fields['updated_at'] = now
+            if aid in existing:
+                updates.append(fields)
+            else:
+                fields['created_at'] = now
+                inserts.append(fields)
+
+        if updates:
+            db.bulk_update_mappings(TbAthletePowerRecords, updates)
+        if inserts:
+            db.bulk_insert_mappings(TbAthletePowerRecords, inserts)
+        commit_or_flush(db)
+        logger.info(
+            "[power-records][rebuild] athletes=%s rows=%s kept=%s updated=%s inserted=%s cleared=%s",
+            len(rebuild_ids), len(rows), len(legacy), len(updates), len(inserts), cleared,
+        )
+        return len(rebuild_ids)
+    except Exception as e:
+        logger.exception("[db-error][power-records-rebuild] athlete_id=%s err=%s", athlete_id, e)
+        rollback_or_abort(db)
+        raise
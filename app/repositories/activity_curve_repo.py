@@ -0,0 +1,253 @@
+"""按运动员存储的单次活动最佳功率曲线（MMP）列式仓库，支持任意时间窗的区间最大查询。
+
+数据位置：data/best_power/activities/{athlete_id}.npz
+列（按活动开始时间升序）：
+    activity_ids  int64   活动ID
+    start_ts      int64   活动开始时间（Unix 秒）
+    offsets       int64   长度 n+1，第 i 个活动曲线位于 values[offsets[i]:offsets[i+1]]
+    values        uint16  拼接后的逐秒曲线，curve[t-1] 为 t 秒最佳平均功率
+
+查询：
+    以活动为叶子构建线段树（节点曲线 = 子节点逐秒取最大），按时间窗 searchsorted 得到活动区间后
+    只需合并 O(log n) 个节点；线段树按文件版本缓存在进程内，文件更新后自动重建。
+
+写入沿用 best_power_file_repo 的文件锁 + 原子替换，同一活动重复分析时覆盖旧曲线。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .best_power_file_repo import (
+    BASE_DIR as BEST_POWER_BASE_DIR,
+    CURVE_DTYPE,
+    atomic_replace,
+    athlete_lock,
+    stat_version,
+    to_curve_array,
+)
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.join(BEST_POWER_BASE_DIR, "activities")
+
+# 进程内缓存的线段树数量上限（按运动员 LRU）
+_TREE_CACHE_SIZE = 16
+
+
+class _ActivityCurves:
+    """单个运动员的列式曲线数据。"""
+
+    __slots__ = ("activity_ids", "start_ts", "offsets", "values")
+
+    def __init__(self, activity_ids: np.ndarray, start_ts: np.ndarray, offsets: np.ndarray, values: np.ndarray):
+        self.activity_ids = activity_ids
+        self.start_ts = start_ts
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def empty(cls) -> "_ActivityCurves":
+        return cls(
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+            np.zeros(0, dtype=CURVE_DTYPE),
+        )
+
+    def __len__(self) -> int:
+        return int(self.activity_ids.size)
+
+    def curve(self, i: int) -> np.ndarray:
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+
+class _CurveSegmentTree:
+    """活动曲线上的线段树：节点保存区间内所有活动曲线的逐秒最大值。"""
+
+    def __init__(self, curves: _ActivityCurves):
+        n = len(curves)
+        size = 1
+        while size < max(n, 1):
+            size *= 2
+        self.size = size
+        empty = np.zeros(0, dtype=CURVE_DTYPE)
+        nodes: List[np.ndarray] = [empty] * (2 * size)
+        for i in range(n):
+            nodes[size + i] = curves.curve(i)
+        for node in range(size - 1, 0, -1):
+            nodes[node] = _merge(nodes[2 * node], nodes[2 * node + 1])
+        self.nodes = nodes
+
+    def query(self, lo: int, hi: int) -> np.ndarray:
+        """返回叶子区间 [lo, hi) 的逐秒最大曲线。"""
+        parts: List[np.ndarray] = []
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                parts.append(self.nodes[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                parts.append(self.nodes[hi])
+            lo //= 2
+            hi //= 2
+        result = np.zeros(max((p.size for p in parts), default=0), dtype=CURVE_DTYPE)
+        for part in parts:
+            np.maximum(result[:part.size], part, out=result[:part.size])
+        return result
+
+
+def _merge(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if a.size < b.size:
+        a, b = b, a
+    if b.size == 0:
+        return a
+    out = a.copy()
+    np.maximum(out[:b.size], b, out=out[:b.size])
+    return out
+
+
+_tree_cache: "OrderedDict[str, Tuple[Tuple[int, int, int], _ActivityCurves, _CurveSegmentTree]]" = OrderedDict()
+_tree_cache_lock = threading.Lock()
+
+
+def _file_path(athlete_id: int, base_dir: str = BASE_DIR) -> str:
+    return os.path.join(base_dir, f"{athlete_id}.npz")
+
+
+def _read_curves(fp: str) -> Optional[_ActivityCurves]:
+    try:
+        with np.load(fp, allow_pickle=False) as data:
+            return _ActivityCurves(
+                data["activity_ids"].astype(np.int64),
+                data["start_ts"].astype(np.int64),
+                data["offsets"].astype(np.int64),
+                data["values"].astype(CURVE_DTYPE),
+            )
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning("[activity-curve][read-failed] path=%s", fp)
+        return None
+
+
+def _write_curves(fp: str, curves: _ActivityCurves) -> None:
+    atomic_replace(fp, lambda f: np.savez(
+        f,
+        activity_ids=curves.activity_ids,
+        start_ts=curves.start_ts,
+        offsets=curves.offsets,
+        values=curves.values,
+    ))
+
+
+def _load_indexed(athlete_id: int, base_dir: str = BASE_DIR) -> Optional[Tuple[_ActivityCurves, _CurveSegmentTree]]:
+    """读取曲线并返回（按文件版本缓存的）线段树。"""
+    fp = _file_path(athlete_id, base_dir)
+    try:
+        version = stat_version(os.stat(fp))
+    except FileNotFoundError:
+        return None
+    with _tree_cache_lock:
+        hit = _tree_cache.get(fp)
+        if hit is not None and hit[0] == version:
+            _tree_cache.move_to_end(fp)
+            return hit[1], hit[2]
+    curves = _read_curves(fp)
+    if curves is None or len(curves) == 0:
+        return None
+    tree = _CurveSegmentTree(curves)
+    with _tree_cache_lock:
+        _tree_cache[fp] = (version, curves, tree)
+        _tree_cache.move_to_end(fp)
+        while len(_tree_cache) > _TREE_CACHE_SIZE:
+            _tree_cache.popitem(last=False)
+    return curves, tree
+
+
+def _to_ts(value: Optional[datetime]) -> Optional[int]:
+    """
+    统一换算为 UTC 秒级时间戳。
+
+    带时区的时间按其时区换算；naive 时间视为服务器本地时间（本地上传活动的 start_date、
+    datetime.now() 与按日期参数构造的窗口边界均为本地时间）。Strava 的 UTC 时间需由调用方带上 UTC 时区。
+    """
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return int(value.astimezone(timezone.utc).timestamp())
+
+
+def upsert_activity_curve(
+    athlete_id: int,
+    activity_id: int,
+    start_date: Optional[datetime],
+    activity_curve: Union[Sequence[int], np.ndarray],
+    base_dir: str = BASE_DIR,
+) -> None:
+    """写入（或覆盖）某活动的 MMP 曲线；缺少开始时间的活动无法参与时间窗查询，直接跳过。"""
+    ts = _to_ts(start_date)
+    curve = to_curve_array(activity_curve)
+    if ts is None or curve.size == 0:
+        return
+    os.makedirs(base_dir, exist_ok=True)
+    fp = _file_path(athlete_id, base_dir)
+    with athlete_lock(athlete_id, base_dir):
+        curves = _read_curves(fp) or _ActivityCurves.empty()
+        keep = curves.activity_ids != int(activity_id)
+        lengths = np.diff(curves.offsets)
+        kept_lengths = lengths[keep]
+        kept_values = curves.values[np.repeat(keep, lengths)]
+
+        # 按开始时间插入，保持升序（同一时间按写入先后）
+        kept_ids = curves.activity_ids[keep]
+        kept_ts = curves.start_ts[keep]
+        pos = int(np.searchsorted(kept_ts, ts, side="right"))
+        value_pos = int(kept_lengths[:pos].sum())
+
+        new_curves = _ActivityCurves(
+            np.insert(kept_ids, pos, int(activity_id)),
+            np.insert(kept_ts, pos, ts),
+            np.concatenate(([0], np.cumsum(np.insert(kept_lengths, pos, curve.size)))).astype(np.int64),
+            np.concatenate((kept_values[:value_pos], curve, kept_values[value_pos:])).astype(CURVE_DTYPE),
+        )
+        _write_curves(fp, new_curves)
+
+
+def query_best_curve(
+    athlete_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    base_dir: str = BASE_DIR,
+) -> Tuple[Optional[np.ndarray], int]:
+    """返回 [start, end] 时间窗内所有活动的逐秒最佳曲线及参与的活动数；无数据时曲线为 None。"""
+    indexed = _load_indexed(athlete_id, base_dir)
+    if indexed is None:
+        return None, 0
+    curves, tree = indexed
+    lo = 0 if start is None else int(np.searchsorted(curves.start_ts, _to_ts(start), side="left"))
+    hi = len(curves) if end is None else int(np.searchsorted(curves.start_ts, _to_ts(end), side="right"))
+    if hi <= lo:
+        return None, 0
+    curve = tree.query(lo, hi)
+    if curve.size == 0:
+        return None, 0
+    return curve, hi - lo
+
+
+def activity_curve_version(athlete_id: int, base_dir: str = BASE_DIR) -> Optional[Tuple[int, int, int]]:
+    """返回列式曲线文件版本；不存在时返回 None。"""
+    try:
+        return stat_version(os.stat(_file_path(athlete_id, base_dir)))
+    except FileNotFoundError:
+        return None
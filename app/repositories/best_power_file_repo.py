@@ -1,70 +1,204 @@
 """基于文件的运动员最佳功率曲线仓库。
 
-数据位置：data/best_power/{athlete_id}.json
+数据位置：data/best_power/{athlete_id}.npy
 结构：
-{
-  "athlete_id": 123,
-  "updated_at": "2025-09-15T12:34:56Z",
-  "best_curve": [int, ...]  # 1秒起始的每秒最佳平均功率
-}
+    NumPy .npy 一维数组（小端 uint16），curve[t-1] 为 t 秒的最佳平均功率（W）；
+    可通过 np.load(..., mmap_mode='r') 直接内存映射读取。
+
+写入：
+    - 合并使用 np.maximum（逐秒取最大）；
+    - 写临时文件后 os.replace 原子替换，并在 {athlete_id}.lock 上加文件锁，
+      多进程/多 worker 并发合并时不会丢失更新。
+
+读取：
+    - 进程内缓存按 (inode, mtime_ns, size) 失效（原子替换必然更换 inode），同一请求内多次读取只解析一次；
+    - 兼容旧版 data/best_power/{athlete_id}.json：.npy 不存在时回退读取，首次合并写入时生成 .npy，
+      此后以 .npy 为准（旧 JSON 保留不删）。
 """
 
 from __future__ import annotations
-from typing import List, Optional, Dict, Any
+from typing import BinaryIO, Callable, List, Optional, Dict, Tuple, Iterator, Sequence, Union
+from contextlib import contextmanager
 import os
 import json
-from datetime import datetime, timezone
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+try:  # POSIX 文件锁；不可用时退化为进程内锁
+    import fcntl
+except ImportError:  # pragma: no cover - 非 POSIX 平台
+    fcntl = None
 
 
 BASE_DIR = os.path.join("data", "best_power")
 
+CURVE_DTYPE = np.dtype("<u2")
+_MAX_POWER = int(np.iinfo(CURVE_DTYPE).max)
 
-def _ensure_dir() -> None:
-    os.makedirs(BASE_DIR, exist_ok=True)
+logger = logging.getLogger(__name__)
 
+# 进程内读缓存：path -> ((inode, mtime_ns, size), curve)
+_read_cache: Dict[str, Tuple[Tuple[int, int, int], np.ndarray]] = {}
+_read_cache_lock = threading.Lock()
+_write_lock = threading.Lock()
 
-def _file_path(athlete_id: int) -> str:
-    return os.path.join(BASE_DIR, f"{athlete_id}.json")
 
+def _ensure_dir(base_dir: str = BASE_DIR) -> None:
+    os.makedirs(base_dir, exist_ok=True)
 
-def load_best_curve(athlete_id: int) -> Optional[List[int]]:
-    """读取该运动员的最佳功率曲线，若不存在返回 None。"""
+
+def _file_path(athlete_id: int, base_dir: str = BASE_DIR) -> str:
+    return os.path.join(base_dir, f"{athlete_id}.npy")
+
+
+def _legacy_file_path(athlete_id: int, base_dir: str = BASE_DIR) -> str:
+    return os.path.join(base_dir, f"{athlete_id}.json")
+
+
+def to_curve_array(curve: Union[Sequence[int], np.ndarray]) -> np.ndarray:
+    arr = np.asarray(curve if curve is not None else [], dtype=np.float64)
+    arr = np.nan_to_num(arr, nan=0.0, posinf=0.0, neginf=0.0)
+    return np.clip(np.rint(arr), 0, _MAX_POWER).astype(CURVE_DTYPE)
+
+
+def _load_legacy_json(fp: str) -> Optional[np.ndarray]:
     try:
-        _ensure_dir()
-        fp = _file_path(athlete_id)
-        if not os.path.exists(fp):
-            return None
         with open(fp, "r", encoding="utf-8") as f:
             data = json.load(f)
         curve = data.get("best_curve")
         if isinstance(curve, list):
-            return [int(x or 0) for x in curve]
+            return to_curve_array([x or 0 for x in curve])
+    except Exception:
+        logger.warning("[best-power][legacy-read-failed] path=%s", fp)
+    return None
+
+
+def stat_version(st: os.stat_result) -> Tuple[int, int, int]:
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _cached_read(fp: str, loader) -> Optional[np.ndarray]:
+    """按文件版本校验的读缓存；文件被替换后自动重新读取。"""
+    try:
+        st = os.stat(fp)
+    except FileNotFoundError:
+        with _read_cache_lock:
+            _read_cache.pop(fp, None)
+        return None
+    version = stat_version(st)
+    with _read_cache_lock:
+        hit = _read_cache.get(fp)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    curve = loader(fp)
+    if curve is not None:
+        curve.setflags(write=False)
+        with _read_cache_lock:
+            _read_cache[fp] = (version, curve)
+    return curve
+
+
+def _load_npy(fp: str) -> Optional[np.ndarray]:
+    try:
+        # mmap 读取后复制为常驻数组，避免原子替换后仍引用旧 inode
+        return np.array(np.load(fp, mmap_mode="r", allow_pickle=False), dtype=CURVE_DTYPE)
+    except Exception:
+        logger.warning("[best-power][read-failed] path=%s", fp)
         return None
+
+
+def curve_version(athlete_id: int, base_dir: str = BASE_DIR) -> Optional[Tuple[int, int, int]]:
+    """返回曲线文件版本 (inode, mtime_ns, size)；不存在时返回 None。供派生结果（如 FTP 估算）做缓存键。"""
+    for fp in (_file_path(athlete_id, base_dir), _legacy_file_path(athlete_id, base_dir)):
+        try:
+            return stat_version(os.stat(fp))
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def load_best_curve_array(athlete_id: int, base_dir: str = BASE_DIR) -> Optional[np.ndarray]:
+    """读取最佳功率曲线（只读 uint16 数组），若不存在返回 None。"""
+    curve = _cached_read(_file_path(athlete_id, base_dir), _load_npy)
+    if curve is None:
+        curve = _cached_read(_legacy_file_path(athlete_id, base_dir), _load_legacy_json)
+    return curve
+
+
+def load_best_curve(athlete_id: int, base_dir: str = BASE_DIR) -> Optional[List[int]]:
+    """读取该运动员的最佳功率曲线，若不存在返回 None。"""
+    try:
+        curve = load_best_curve_array(athlete_id, base_dir)
+        return curve.tolist() if curve is not None else None
     except Exception:
         return None
 
 
-def save_best_curve(athlete_id: int, curve: List[int]) -> None:
-    """覆盖保存该运动员的最佳功率曲线。"""
-    _ensure_dir()
-    payload: Dict[str, Any] = {
-        "athlete_id": int(athlete_id),
-        "updated_at": datetime.now(timezone.utc).isoformat(),
-        "best_curve": [int(x or 0) for x in curve],
-    }
-    with open(_file_path(athlete_id), "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False)
+@contextmanager
+def athlete_lock(athlete_id: int, base_dir: str = BASE_DIR) -> Iterator[None]:
+    """进程内互斥 + 跨进程文件锁（flock），保护“读-合并-写”过程。"""
+    _ensure_dir(base_dir)
+    with _write_lock:
+        lock_path = os.path.join(base_dir, f"{athlete_id}.lock")
+        with open(lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
 
-def update_with_activity_curve(athlete_id: int, activity_curve: List[int]) -> List[int]:
-    """用某次活动的曲线更新全局最佳曲线（逐秒取最大）。返回更新后的曲线。"""
-    existing = load_best_curve(athlete_id) or []
-    m = max(len(existing), len(activity_curve))
-    merged: List[int] = [0] * m
-    for i in range(m):
-        a = existing[i] if i < len(existing) else 0
-        b = activity_curve[i] if i < len(activity_curve) else 0
-        merged[i] = int(a) if a >= b else int(b)
-    save_best_curve(athlete_id, merged)
-    return merged
+def atomic_replace(fp: str, write: Callable[[BinaryIO], None]) -> None:
+    """写入同目录临时文件并 fsync 后 os.replace 原子替换，读者永远看不到半写文件。"""
+    directory = os.path.dirname(fp) or "."
+    suffix = os.path.splitext(fp)[1]
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, fp)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 
+def _atomic_save(fp: str, curve: np.ndarray) -> None:
+    atomic_replace(fp, lambda f: np.save(f, curve, allow_pickle=False))
+
+
+def save_best_curve(athlete_id: int, curve: Union[Sequence[int], np.ndarray], base_dir: str = BASE_DIR) -> None:
+    """覆盖保存该运动员的最佳功率曲线（原子替换）。"""
+    with athlete_lock(athlete_id, base_dir):
+        _atomic_save(_file_path(athlete_id, base_dir), to_curve_array(curve))
+
+
+def update_with_activity_curve(
+    athlete_id: int,
+    activity_curve: Union[Sequence[int], np.ndarray],
+    base_dir: str = BASE_DIR,
+) -> List[int]:
+    """用某次活动的曲线更新全局最佳曲线（逐秒取最大）。返回更新后的曲线。"""
+    incoming = to_curve_array(activity_curve)
+    fp = _file_path(athlete_id, base_dir)
+    with athlete_lock(athlete_id, base_dir):
+        migrated = os.path.exists(fp)
+        existing = load_best_curve_array(athlete_id, base_dir)
+        if existing is None:
+            existing = np.zeros(0, dtype=CURVE_DTYPE)
+        m = max(existing.size, incoming.size)
+        merged = np.zeros(m, dtype=CURVE_DTYPE)
+        merged[:existing.size] = existing
+        np.maximum(merged[:incoming.size], incoming, out=merged[:incoming.size])
+        if not migrated or existing.size != m or not np.array_equal(existing, merged):
+            _atomic_save(fp, merged)
+    return merged.tolist()
@@ -3,6 +3,7 @@ from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 
 from ..db.models import TbAthletePowerRecords
+from ..db.unit_of_work import commit_or_flush, current_unit_of_work
 
 
 INTERVAL_FIELD_MAP: Dict[str, str] = {
@@ -17,8 +18,9 @@ def get_or_create_records(db: Session, athlete_id: int) -> TbAthletePowerRecords
     if not rec:
         rec = TbAthletePowerRecords(athlete_id=athlete_id)
         db.add(rec)
-        db.commit()
-        db.refresh(rec)
+        commit_or_flush(db)
+        if current_unit_of_work(db) is None:
+            db.refresh(rec)
     return rec
 
 
@@ -106,7 +108,7 @@ def update_best_powers(
                 'improvement': improvement,
             })
 
-    db.commit()
+    commit_or_flush(db)
     return segment_records
 
 
@@ -187,7 +189,7 @@ def update_longest_ride(
     sr = _update_top3_single_metric(
         db, rec, 'longest_ride', km, activity_id_for_record, 'distance', 'km', 'longest_ride'
     )
-    db.commit()
+    commit_or_flush(db)
     return sr
 
 
@@ -203,5 +205,5 @@ def update_max_elevation_gain(
     sr = _update_top3_single_metric(
         db, rec, 'max_elevation', meters, activity_id_for_record, 'elevation', 'm', 'max_elevation_gain'
     )
-    db.commit()
+    commit_or_flush(db)
     return sr
@@ -59,6 +59,7 @@ class PowerResponse(BaseModel):
     avg_power: Optional[int] = Field(None, description="平均功率（瓦特，保留整数）")
     max_power: Optional[int] = Field(None, description="最大功率（瓦特，保留整数）")
     normalized_power: Optional[int] = Field(None, description="标准化功率（瓦特，保留整数）")
+    x_power: Optional[int] = Field(None, description="xPower（Skiba，25 秒指数加权平均后的四次方均值，瓦特，保留整数）")
     intensity_factor: Optional[float] = Field(None, description="强度因子（标准化功率除以FTP，保留两位小数）")
     total_work: Optional[int] = Field(None, description="总做功（千焦，保留整数）")
     variability_index: Optional[float] = Field(None, description="变异性指数（保留两位小数）")
@@ -68,12 +69,20 @@ class PowerResponse(BaseModel):
     w_balance_decline: Optional[float] = Field(None, description="W平衡下降（保留一位小数）")
 
 
+class HeartrateLagWindow(BaseModel):
+    """滑动窗口心率滞后"""
+    start: int = Field(..., description="窗口起点（秒）")
+    lag: Optional[int] = Field(None, description="窗口内心率滞后（秒），相关性不足时为空")
+    correlation: Optional[float] = Field(None, description="功率-心率最大互相关系数（保留两位小数）")
+
+
 class HeartrateResponse(BaseModel):
     """活动心率信息响应"""
     avg_heartrate: Optional[int] = Field(None, description="平均心率（保留整数）")
     max_heartrate: Optional[int] = Field(None, description="最大心率（保留整数）")
     heartrate_recovery_rate: Optional[int] = Field(None, description="心率恢复速率")
     heartrate_lag: Optional[int] = Field(None, description="心率滞后")
+    heartrate_lag_profile: Optional[List[HeartrateLagWindow]] = Field(None, description="心率滞后随时间变化（20 分钟窗口，每 5 分钟一个）")
     efficiency_index: Optional[float] = Field(None, description="效率指数（保留两位小数）")
     decoupling_rate: Optional[str] = Field(None, description="解耦率（百分比，保留一位小数，带%符号）")
 
@@ -137,7 +146,12 @@ class TrainingEffectRequest(BaseModel):
 class MultiStreamRequest(BaseModel):
     """多字段流数据请求"""
     keys: List[str] = Field(..., description="请求的流数据类型列表")
-    resolution: str = Field(..., description="数据分辨率：low, medium, high")
+    resolution: str = Field(..., description="数据分辨率：low, medium, high, overview")
+    target_points: Optional[int] = Field(None, ge=1, description="目标点数（按视口宽度请求），指定时优先于 resolution")
+    algorithm: Optional[str] = Field(None, description="降采样算法：lttb、minmax、stride；默认按通道选择")
+    start: Optional[float] = Field(None, ge=0, description="窗口起点（axis=time 为秒，axis=distance 为米）")
+    end: Optional[float] = Field(None, ge=0, description="窗口终点（axis=time 为秒，axis=distance 为米）")
+    axis: str = Field("time", description="窗口坐标轴：time 或 distance")
 
 
 class StreamDataItem(BaseModel):
@@ -4,7 +4,7 @@ Athletes模块的请求和响应模式
 定义运动员相关API接口的输入输出数据结构。
 """
 
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -23,3 +23,34 @@ class DailyStateUpdateResponse(BaseModel):
     status: str = Field(..., description="状态：success 或 failed")
     data: DailyStateDetail = Field(..., description="更新结果详情")
 
+
+
+class PowerRecordsRebuildResponse(BaseModel):
+    """功率纪录重建响应"""
+    message: str = Field(..., description="响应消息")
+    status: str = Field(..., description="状态：success 或 failed")
+    athlete_id: Optional[int] = Field(None, description="重建的运动员ID（为空表示全部运动员）")
+    rebuilt_athletes: int = Field(..., description="实际重建的运动员数量")
+    backfilled_activities: int = Field(0, description="本次从 FIT 文件回填窄表的活动数量")
+
+
+class AthletePowerCurveResponse(BaseModel):
+    """时间窗最佳功率曲线响应"""
+    athlete_id: int = Field(..., description="运动员ID")
+    from_date: Optional[str] = Field(None, description="时间窗起始日期（YYYY-MM-DD，为空表示不限）")
+    to_date: Optional[str] = Field(None, description="时间窗结束日期（YYYY-MM-DD，含当天，为空表示不限）")
+    activity_count: int = Field(..., description="参与合并的活动数量")
+    length: int = Field(..., description="曲线长度（秒）")
+    best_curve: List[int] = Field(..., description="逐秒最佳平均功率，best_curve[t-1] 为 t 秒最佳平均功率")
+
+
+class FTPEstimateResponse(BaseModel):
+    """基于最佳功率曲线的 FTP 估算响应"""
+    athlete_id: int = Field(..., description="运动员ID")
+    window_days: Optional[int] = Field(None, description="使用的近期窗口（天），为空表示历史全局曲线")
+    ftp: Optional[float] = Field(None, description="综合 FTP（W），无曲线时为空")
+    components: Dict[str, Optional[float]] = Field(..., description="各子估计：FTP_A（P20×0.95）/FTP_B（CP）/FTP_C（长时段锚点）")
+    weights: Dict[str, float] = Field(..., description="各子估计的归一化权重")
+    coverage: Dict[str, bool] = Field(..., description="曲线覆盖标记：cov20/cov40/cov60")
+    confidence: str = Field(..., description="可信度：reliable/medium/low/none")
+    notes: Optional[str] = Field(None, description="估算说明")
@@ -0,0 +1,106 @@
+"""/all 分析结果的计算与缓存编排。
+
+- compute_and_cache_all_data：计算活动全量分析结果并序列化一次，同一份 JSON 字节写入缓存（含依赖版本、
+  FIT 内容哈希）并作为响应体返回，同时返回内容版本（ETag 依据）；
+- refresh_stale_athlete_cache：后台按运动员刷新依赖版本已过期的缓存（阈值变化后只影响该运动员）。
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config import is_cache_enabled
+from ..db.unit_of_work import unit_of_work
+from ..infrastructure import fast_json
+from ..infrastructure.cache_manager import activity_cache_manager
+from ..repositories.activity_repo import get_activity_athlete
+from ..repositories.oauth_repo import get_access_token_by_athlete_id
+from ..streams.crud import stream_crud
+from ..utils import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def compute_and_cache_all_data(
+    db: Session,
+    activity_id: int,
+    keys: Optional[str],
+    resolution: Optional[str],
+    cache_key: str,
+) -> Tuple[bytes, str]:
+    """
+    计算 /all 结果并返回（JSON 字节，内容版本）；缓存开启时写入缓存，缓存依赖版本取分析完成后的运动员阈值。
+
+    内容版本与缓存命中时 get_cache_entry 返回的一致，作为 ETag 的依据。
+    """
+    from .activity_service import activity_service
+
+    pair = get_activity_athlete(db, activity_id)
+    if not pair:
+        raise ValueError(f"活动 {activity_id} 或其运动员不存在")
+    activity_entry, athlete_entry = pair
+    if activity_entry.upload_fit_url:
+        access_token = None
+    else:
+        access_token = get_access_token_by_athlete_id(db, athlete_entry.id)
+
+    # 本次分析产生的所有写库（EF/TSS/状态/功率纪录/缓存索引）合并为一个事务提交
+    with unit_of_work(db, "activities.all", activity_id=activity_id):
+        result = activity_service.get_all_data(db, activity_id, access_token, keys, resolution)
+        body = fast_json.dumps(fast_json.model_payload(result))
+        # 分析过程中可能回填运动员阈值（如估算 FTP），此时取值与提交后的数据库一致
+        dependencies = activity_cache_manager.dependency_versions(athlete_entry)
+        fit_hash = stream_crud.fit_content_hash(activity_id)
+
+        if is_cache_enabled():
+            try:
+                metadata = {
+                    "source": "strava_api" if access_token else "local_database",
+                    "keys": keys,
+                    "resolution": resolution,
+                    "data_upsampled": bool(access_token),
+                    "dependencies": dependencies,
+                    "fit_hash": fit_hash,
+                }
+                activity_cache_manager.set_cache(db, activity_id, cache_key, body, metadata)
+                logger.info(f"[cache-set] activity id={activity_id}")
+            except Exception as ce:
+                logger.warning(f"[cache-failed] id={activity_id}: {ce}")
+    return body, activity_cache_manager.content_version(cache_key, fit_hash, dependencies)
+
+
+def refresh_stale_athlete_cache(athlete_id: int) -> Dict[str, Any]:
+    """后台任务：重算某运动员所有依赖版本已过期的 /all 缓存（按原 keys/resolution）。"""
+    db = SessionLocal()
+    refreshed, failed = 0, 0
+    try:
+        stale = activity_cache_manager.list_stale_entries(db, athlete_id)
+        targets = []
+        for record in stale:
+            try:
+                metadata = json.loads(record.cache_metadata) if record.cache_metadata else {}
+            except (TypeError, ValueError):
+                metadata = {}
+            targets.append((record.activity_id, metadata.get("keys"), metadata.get("resolution") or "high"))
+
+        for activity_id, keys, resolution in targets:
+            cache_key = activity_cache_manager.generate_cache_key(
+                activity_id=activity_id,
+                resolution=resolution,
+                keys=keys,
+            )
+            try:
+                compute_and_cache_all_data(db, activity_id, keys, resolution, cache_key)
+                refreshed += 1
+            except Exception:
+                failed += 1
+                logger.exception("[cache-refresh][error] athlete_id=%s activity_id=%s", athlete_id, activity_id)
+        logger.info(
+            "[cache-refresh][done] athlete_id=%s stale=%s refreshed=%s failed=%s",
+            athlete_id, len(targets), refreshed, failed,
+        )
+        return {"athlete_id": athlete_id, "stale": len(targets), "refreshed": refreshed, "failed": failed}
+    finally:
+        db.close()
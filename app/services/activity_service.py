@@ -13,6 +13,7 @@ import logging
 from pathlib import Path
 from bisect import bisect_left
 from app.db.models import TbActivity, TbAthlete
+from ..db.unit_of_work import commit_or_flush, rollback_or_abort
 
 from ..clients.strava_client import StravaClient
 from ..schemas.activities import (
@@ -29,6 +30,9 @@ from ..streams.models import Resolution
 from ..infrastructure.data_manager import activity_data_manager
 from ..analyzers.strava_analyzer import StravaAnalyzer
 from ..core.analytics import zones as ZoneAnalyzer
+from ..config import ELEVATION_HYSTERESIS_M
+from ..core.analytics.altitude import elevation_gain as elevation_gain_m
+from ..core.analytics.context import AnalysisContext
 from ..core.analytics.zone_histogram import (
     render_zone_segments_chart,
     generate_zone_segments_payload,
@@ -82,8 +86,23 @@ BASIC_STREAMS = {
     'temp', 'temperature',
     'moving',
     'grade_smooth',
+    'gap',  # 跑步坡度调整配速
 }
 
+# 本地流最佳功率时间窗键 -> 功率纪录表（INTERVAL_FIELD_MAP）键
+LOCAL_BEST_POWER_KEY_MAP: Dict[str, str] = {
+    '5s': '5s', '15s': '15s', '30s': '30s',
+    '1min': '1m', '2min': '2m', '3min': '3m', '5min': '5m',
+    '10min': '10m', '15min': '15m', '20min': '20m', '30min': '30m',
+    '45min': '45m', '1h': '60m'
+}
+
+
+def normalize_best_power_keys(best_powers: Dict[str, int]) -> Dict[str, int]:
+    """归一化本地流最佳功率的时间窗键到 repo 支持的格式。"""
+    return {LOCAL_BEST_POWER_KEY_MAP[k]: v for k, v in best_powers.items() if k in LOCAL_BEST_POWER_KEY_MAP}
+
+
 class ActivityService:
     def get_all_data(
         self,
@@ -96,7 +115,7 @@ class ActivityService:
         if access_token:
             client = StravaClient(access_token)
             keys_list_all  = ['best_power', 'elapsed_time', 'time', 'distance', 'position_lat',  'position_long', 'altitude', 'velocity_smooth', 'heartrate', 'cadence', 'watts', 'temp', 'moving', 'grade_smooth', 'power_hr_ratio', 'spi', 'w_balance', 'vam', 'torque']
-            keys_list_else = ['best_power', 'elapsed_time', 'time', 'distance', 'position_lat',  'position_long', 'altitude', 'velocity_smooth', 'heartrate', 'cadence', 'watts', 'temp']
+            keys_list_else = ['best_power', 'elapsed_time', 'time', 'distance', 'position_lat',  'position_long', 'altitude', 'velocity_smooth', 'heartrate', 'cadence', 'watts', 'temp', 'gap']
             try:
                 activity_entry, athlete_entry = get_activity_athlete(db, activity_id)
                 if not activity_entry or not athlete_entry: return None
@@ -140,10 +159,13 @@ class ActivityService:
        
             # 本地fit文件处理，没有输入ftp的时候，进行ftp估算
             if local_pair[1].ftp is None or local_pair[1].ftp <= 0:
-                from app.core.analytics.ftp_estimator import estimate_ftp_from_best_curve, _load_best_curve
+                from app.core.analytics.ftp_estimator import get_ftp_estimate
+                from ..config import FTP_ESTIMATE_WINDOW_DAYS
                 # 如果是第一次活动，没有best curve，则不估算ftp，ftp保持为0，继续流程
-                if _load_best_curve(int(local_pair[1].id)) is not None:
-                    local_pair[1].ftp = round(estimate_ftp_from_best_curve(local_pair[1].id).ftp)
+                # 估算结果按曲线文件版本缓存，曲线未变化时不重复拟合
+                estimate = get_ftp_estimate(int(local_pair[1].id), window_days=FTP_ESTIMATE_WINDOW_DAYS)
+                if estimate.ftp is not None:
+                    local_pair[1].ftp = round(estimate.ftp)
 
 
             raw_stream_data = activity_data_manager.get_activity_stream_data(db, activity_id)
@@ -154,12 +176,14 @@ class ActivityService:
                 logger.error("[data-error][all_data] activity_id=%s，流数据或Session数据缺失", activity_id)
                 raise ValueError("活动流数据或Session数据不存在，无法分析。")
 
+            # 各分区共享的数组视图（功率/NP/清洗后心率/踏频/速度等），本次请求内只构建一次
+            context = AnalysisContext.from_stream_data(raw_stream_data)
             response_data = {}
             response_data["overall"] = self.get_overall(db, activity_id, local_pair, raw_stream_data, session_cache, activity_type, use_cache=False)
-            response_data["power"] = self.get_power(db, activity_id, local_pair, raw_stream_data, session_cache, activity_type, use_cache=False)
-            response_data["heartrate"] = self.get_heartrate(db, activity_id, local_pair, raw_stream_data, session_cache, activity_type, use_cache=False)
-            response_data["cadence"] = self.get_cadence(db, activity_id, local_pair, raw_stream_data, session_cache, activity_type, use_cache=False)
-            response_data["speed"] = self.get_speed(db, activity_id, local_pair, raw_stream_data, session_cache, use_cache=False)
+            response_data["power"] = self.get_power(db, activity_id, local_pair, raw_stream_data, session_cache, activity_type, use_cache=False, context=context)
+            response_data["heartrate"] = self.get_heartrate(db, activity_id, local_pair, raw_stream_data, session_cache, activity_type, use_cache=False, context=context)
+            response_data["cadence"] = self.get_cadence(db, activity_id, local_pair, raw_stream_data, session_cache, activity_type, use_cache=False, context=context)
+            response_data["speed"] = self.get_speed(db, activity_id, local_pair, raw_stream_data, session_cache, use_cache=False, context=context)
             response_data["training_effect"] = self.get_training_effect(db, activity_id, local_pair, raw_stream_data, activity_type, use_cache=False)
             response_data["altitude"] = self.get_altitude(db, activity_id, local_pair, raw_stream_data, session_cache, use_cache=False)
             response_data["temp"] = self.get_temperature(db, activity_id, raw_stream_data, use_cache=False)
@@ -182,19 +206,18 @@ class ActivityService:
                     is_cycling = activity_type in ['ride', 'virtualride', 'ebikeride']
                     allowed_streams = CYCLING_STREAMS if is_cycling else BASIC_STREAMS
                     available_streams = [s for s in available_result["available_streams"] if s in allowed_streams]
-                    res_enum = Resolution.HIGH if resolution == 'high' else Resolution.MEDIUM if resolution == 'medium' else Resolution.LOW
+                    try:
+                        res_enum = Resolution(resolution)
+                    except ValueError:
+                        res_enum = Resolution.LOW
                     streams_data = activity_data_manager.get_activity_streams(db, activity_id, available_streams, res_enum)
 
-                    for stream in streams_data or []:
-                        stream_type = stream.get("type")
-                        if stream_type == "temperature":
-                            stream["type"] = "temp"
-                        elif stream_type == "heart_rate":
-                            stream["type"] = "heartrate"
-                        elif stream_type == "power":
-                            stream["type"] = "watts"
-                        elif stream_type == "timestamp":
-                            stream["type"] = "time"
+                    # 缓存中的流条目按引用共享：改名时生成新字典，不原地修改
+                    renamed_types = {"temperature": "temp", "heart_rate": "heartrate", "power": "watts", "timestamp": "time"}
+                    streams_data = [
+                        {**stream, "type": renamed_types[stream.get("type")]} if stream.get("type") in renamed_types else stream
+                        for stream in streams_data or []
+                    ]
 
                     response_data["streams"] = streams_data
                 else:
@@ -238,17 +261,26 @@ class ActivityService:
             except Exception:
                 logger.exception("[intervals][save-error-local] activity_id=%s", activity_id)
 
-            return AllActivityDataResponse(**response_data)
+            # 汇总字段体量小，仍经模型校验做类型规整；逐点流与逐秒曲线为内部生成的可信数据，
+            # 跳过校验直接挂载（model_construct），避免逐元素遍历
+            streams = response_data.pop("streams", None)
+            best_power_record = response_data.pop("best_power_record", None)
+            if isinstance(best_power_record, dict):
+                best_power_record = BestPowerCurveRecord.model_construct(**best_power_record)
+            summary = AllActivityDataResponse(**response_data)
+            return AllActivityDataResponse.model_construct(
+                **{**dict(summary), "streams": streams, "best_power_record": best_power_record}
+            )
 
     @staticmethod
 
     def _update_activity_efficiency_factor(self, db: Session, activity: Any, value: Optional[float]) -> None:
         try:
             setattr(activity, 'efficiency_factor', value)
-            db.commit()
+            commit_or_flush(db)
         except Exception as e:
             logger.exception("[db-error][efficiency-factor] activity_id=%s err=%s", getattr(activity, 'id', None), e)
-            db.rollback()
+            rollback_or_abort(db)
 
     def _compute_power_zones(self, db: Session, activity_id: int) -> Optional[Dict[str, Any]]:
         from ..repositories.activity_repo import get_activity_athlete
@@ -324,19 +356,15 @@ class ActivityService:
                 get_or_create_records as repo_get_or_create_records,
             )
             from ..repositories.best_power_file_repo import update_with_activity_curve as repo_update_best_power_file
+            from ..repositories.activity_best_power_repo import save_activity_best_powers as repo_save_activity_best_powers
+            from ..repositories.activity_curve_repo import upsert_activity_curve as repo_upsert_activity_curve
             pair = get_activity_athlete(db, activity_id)
             if not pair:
                 return None
             activity, athlete = pair
 
             # 归一化时间窗键到 repo 支持的格式
-            key_map = {
-                '5s': '5s', '15s': '15s', '30s': '30s',
-                '1min': '1m', '2min': '2m', '3min': '3m', '5min': '5m',
-                '10min': '10m', '15min': '15m', '20min': '20m', '30min': '30m',
-                '45min': '45m', '1h': '60m'
-            }
-            normalized = { key_map[k]: v for k, v in best_powers.items() if k in key_map }
+            normalized = normalize_best_power_keys(best_powers)
 
             # 调试：记录更新前 Top3 快照（功率/距离/爬升）
             try:
@@ -382,6 +410,7 @@ class ActivityService:
                         activity_curve = self._compute_best_power_curve([int(p or 0) for p in power])
                 if activity_curve:
                     repo_update_best_power_file(athlete.id, activity_curve)
+                    repo_upsert_activity_curve(athlete.id, activity.id, activity.start_date, activity_curve)
             except Exception:
                 pass
 
@@ -394,22 +423,14 @@ class ActivityService:
             except Exception:
                 distance_m = 0
 
-            elevation_gain = 0
             try:
-                alt = stream_raw.get('altitude') or []
-                if alt and len(alt) > 1:
-                    prev = alt[0]
-                    gain = 0
-                    for h in alt[1:]:
-                        if h is not None and prev is not None:
-                            d = h - prev
-                            if d > 0:
-                                gain += d
-                            prev = h
-                    elevation_gain = int(gain)
+                elevation_gain = int(elevation_gain_m(stream_raw.get('altitude'), ELEVATION_HYSTERESIS_M))
             except Exception:
                 elevation_gain = 0
 
+            # 窄表留存本活动数值，供活动删除/重传后整体重建 Top3
+            repo_save_activity_best_powers(db, athlete.id, activity.id, normalized, distance_m, elevation_gain)
+
             try:
                 if distance_m > 0:
                     sr = repo_update_longest_ride(db, athlete.id, distance_m, activity.id)
@@ -472,9 +493,9 @@ class ActivityService:
                 activity_entry.tss_updated = 1
                 if start_date:
                     activity_entry.start_date = start_date
-                db.commit()
+                commit_or_flush(db)
         except Exception:
-            db.rollback()
+            rollback_or_abort(db)
             logger.exception("[tss][write-error] activity_id=%s training_load=%s", 
                            getattr(activity_entry, 'id', None), training_load)
 
@@ -531,14 +552,14 @@ class ActivityService:
             athlete_entry.atl = atl
             athlete_entry.ctl = ctl
             athlete_entry.tsb = tsb
-            db.commit()
+            commit_or_flush(db)
             logger.info(
                 "[athlete-status][commit] athlete_id=%s atl=%s ctl=%s tsb=%s 已写入数据库",
                 athlete_id, atl, ctl, tsb
             )
             return tsb
         except Exception:
-            db.rollback()
+            rollback_or_abort(db)
             logger.exception("[status-calc] 计算/写入 atl/ctl/tsb 失败 athlete_id=%s", getattr(athlete_entry, 'id', None))
             return None
 
@@ -626,9 +647,9 @@ class ActivityService:
                 if act and tl > 0:
                     act.tss = int(tl)
                     act.tss_updated = 1
-                    db.commit()
+                    commit_or_flush(db)
             except Exception:
-                db.rollback()
+                rollback_or_abort(db)
 
         result['status']= self._update_athlete_status(db, athlete, activity.start_date)
         return result
@@ -642,6 +663,7 @@ class ActivityService:
         session_data: Optional[Dict[str, Any]] = None,
         activity_type: Optional[str] = None,
         use_cache: bool = True,
+        context: Optional[AnalysisContext] = None,
     ) -> Optional[Dict[str, Any]]:
         from ..infrastructure.cache_manager import activity_cache_manager
         
@@ -653,7 +675,7 @@ class ActivityService:
                 return None
         
         from ..metrics.activities.power import compute_power_info
-        return compute_power_info(stream_data, int(pair[1].ftp), session_data, activity_type)
+        return compute_power_info(stream_data, int(pair[1].ftp), session_data, activity_type, context)
 
     def get_heartrate(
         self,
@@ -664,6 +686,7 @@ class ActivityService:
         session_data: Optional[Dict[str, Any]] = None,
         activity_type: Optional[str] = None,
         use_cache: bool = True,
+        context: Optional[AnalysisContext] = None,
     ) -> Optional[Dict[str, Any]]:
         from ..infrastructure.cache_manager import activity_cache_manager
         
@@ -675,7 +698,7 @@ class ActivityService:
                 return None
         
         from ..metrics.activities.heartrate import compute_heartrate_info
-        result = compute_heartrate_info(stream_data, bool(stream_data.get('power')), session_data, activity_type)
+        result = compute_heartrate_info(stream_data, bool(stream_data.get('power')), session_data, activity_type, context)
 
         # ! 在数据库中更新EF指数
         if result and result.get('efficiency_index') is not None:
@@ -690,6 +713,7 @@ class ActivityService:
         stream_data: Optional[Dict[str, Any]] = None,
         session_data: Optional[Dict[str, Any]] = None,
         use_cache: bool = True,
+        context: Optional[AnalysisContext] = None,
     ) -> Optional[Dict[str, Any]]:
         from ..infrastructure.cache_manager import activity_cache_manager
         
@@ -701,7 +725,7 @@ class ActivityService:
                 return None
         
         from ..metrics.activities.speed import compute_speed_info
-        return compute_speed_info(stream_data, session_data)
+        return compute_speed_info(stream_data, session_data, context)
 
     def get_cadence(
         self,
@@ -712,6 +736,7 @@ class ActivityService:
         session_data: Optional[Dict[str, Any]] = None,
         activity_type: Optional[str] = None,
         use_cache: bool = True,
+        context: Optional[AnalysisContext] = None,
     ) -> Optional[Dict[str, Any]]:
         from ..infrastructure.cache_manager import activity_cache_manager
         
@@ -722,7 +747,7 @@ class ActivityService:
             if not activity_cache_manager.has_cache(db, activity_id):
                 return None
         from ..metrics.activities.cadence import compute_cadence_info
-        return compute_cadence_info(stream_data, session_data, activity_type)
+        return compute_cadence_info(stream_data, session_data, activity_type, context)
 
     def get_altitude(
         self,
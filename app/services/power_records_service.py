@@ -0,0 +1,99 @@
+"""
+Power Records Service（功率纪录回填服务）
+
+职责：
+- 为尚未写入 tb_activity_best_power 窄表的历史骑行活动，从已上传的 FIT 文件回填
+  各时间窗最佳功率、距离与爬升（与本地分析路径同一口径）
+- 回填后 rebuild_power_records 即可完全基于窄表重建 Top3
+"""
+
+from typing import Optional
+import logging
+
+import requests
+from sqlalchemy.orm import Session
+
+from ..config import ELEVATION_HYSTERESIS_M
+from ..core.analytics.altitude import elevation_gain as elevation_gain_m
+from ..core.analytics.wbal import tau_model_for
+from ..db.models import TbActivity, TbActivityBestPower, TbAthlete
+from ..repositories.activity_best_power_repo import save_activity_best_powers
+from ..streams.crud import stream_crud
+from .activity_service import activity_service, normalize_best_power_keys
+
+logger = logging.getLogger(__name__)
+
+RIDE_TYPES = ('ride', 'virtualride', 'ebikeride')
+
+
+def _backfill_activity(db: Session, activity: TbActivity) -> bool:
+    """下载并解析单个活动的 FIT 文件，骑行活动写入窄表；返回是否写入。"""
+    response = requests.get(activity.upload_fit_url, timeout=30)
+    response.raise_for_status()
+    file_data = response.content
+
+    # 先解析 session 判断运动类型，跑步等活动不做整份流解析
+    session_data = stream_crud._parse_session_from_bytes(file_data)
+    if activity_service._get_activity_type(session_data=session_data) not in RIDE_TYPES:
+        return False
+
+    athlete = db.query(TbAthlete).filter(TbAthlete.id == activity.athlete_id).first()
+    athlete_info = {
+        'ftp': int(athlete.ftp) if athlete and athlete.ftp else 0,
+        'wj': athlete.w_balance if athlete else None,
+        'tau_model': tau_model_for(activity.athlete_id),
+    }
+    parsed = stream_crud.fit_parser.parse_fit_file(file_data, athlete_info)
+    if getattr(parsed, "_parse_failed", False):
+        return False
+
+    stream_raw = {
+        'best_power': parsed.best_power,
+        'power': parsed.power,
+    }
+    best_powers = activity_service._extract_best_powers_from_stream(stream_raw)
+    if not best_powers:
+        return False
+    distance_m = int(parsed.distance[-1] or 0) if parsed.distance else 0
+    elevation_gain = int(elevation_gain_m(parsed.altitude, ELEVATION_HYSTERESIS_M))
+    save_activity_best_powers(
+        db, activity.athlete_id, activity.id, normalize_best_power_keys(best_powers), distance_m, elevation_gain
+    )
+    return True
+
+
+def backfill_activity_best_powers(
+    db: Session,
+    athlete_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> int:
+    """回填窄表中没有任何数据的活动（athlete_id 为空时处理全部运动员），返回写入的活动数。
+
+    每个活动只下载一次 FIT 文件、不写入进程内流缓存；单个活动失败只记录日志并继续。
+    limit 限制本次处理的活动数，便于分批执行。
+    """
+    covered = db.query(TbActivityBestPower.activity_id).distinct()
+    query = db.query(TbActivity).filter(
+        TbActivity.upload_fit_url.isnot(None),
+        TbActivity.upload_fit_url != '',
+        TbActivity.id.notin_(covered),
+    )
+    if athlete_id is not None:
+        query = query.filter(TbActivity.athlete_id == athlete_id)
+    query = query.order_by(TbActivity.id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    activities = query.all()
+    written = 0
+    for activity in activities:
+        try:
+            if _backfill_activity(db, activity):
+                written += 1
+        except Exception as e:
+            logger.error("[power-records][backfill] activity_id=%s err=%s", activity.id, e)
+    logger.info(
+        "[power-records][backfill] athlete_id=%s candidates=%s written=%s",
+        athlete_id, len(activities), written,
+    )
+    return written
@@ -0,0 +1,195 @@
+"""
+流数据二进制传输格式（按 Accept 头协商，JSON 仍为默认格式）
+
+客户端请求头 Accept: application/vnd.fitapi.streams 时，/streams、/multi-streams 与 /all
+的流数据以小端定长数组打包返回，体积与解析耗时远小于 JSON 数值数组。
+
+容器布局（所有整数均为小端）：
+    magic      4 字节  b"FSTR"
+    version    uint16  当前为 1
+    flags      uint16  保留，恒为 0
+    header_len uint32  header 的字节数
+    header     UTF-8 JSON：
+        {
+          "version": 1,
+          "meta": {...},          # 非流数据部分（/all 的汇总字段等），无则为 {}
+          "channels": [
+            {
+              "type": "watts",
+              "dtype": "int16",   # int16 / int32 / float32
+              "scale": 1,         # 实际值 = 原始值 * scale
+              "length": 14400,    # 元素总个数
+              "shape": [14400],   # 数组形状（行主序）；latlng 等成对通道为 [n, 2]，缺省视为 [length]
+              "offset": 0,        # 相对数据区起点的字节偏移
+              "nbytes": 28800,
+              "null": -32768,     # 缺失值哨兵；float32 以 NaN 表示缺失，此处为 null
+              ...                 # 其余字段原样保留（series_type、original_size、resolution 等）
+            }
+          ]
+        }
+    padding    补齐到 8 字节边界
+    data       各通道数组依次排列，每个通道起点 8 字节对齐
+
+编码规则：
+    - 数值可按 10 的幂（1、0.1 … 1e-7）精确量化且范围可容纳时，存为 int16/int32 + scale（无损）；
+    - 否则存为 float32；
+    - 多维通道（如 latlng 的 [[lat, lng], ...]）按行主序展平写入，"shape" 记录原形状；
+    - 无法转为数值的通道不进入数据区，原值放在通道描述的 "values" 中。
+"""
+
+import json
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..infrastructure import fast_json
+
+MEDIA_TYPE = "application/vnd.fitapi.streams"
+MAGIC = b"FSTR"
+VERSION = 1
+
+_PREAMBLE = struct.Struct("<4sHHI")
+_ALIGN = 8
+# 候选量化步长（由粗到细）；量化误差须小于步长的 1/1000 才视为精确
+_SCALES = (1, 0.1, 0.01, 0.001, 1e-4, 1e-5, 1e-6, 1e-7)
+_QUANT_TOLERANCE = 1e-3
+_INT_DTYPES = (("int16", np.dtype("<i2")), ("int32", np.dtype("<i4")))
+_FLOAT_DTYPE = ("float32", np.dtype("<f4"))
+_DTYPES = {name: dtype for name, dtype in (*_INT_DTYPES, _FLOAT_DTYPE)}
+
+
+def wants_binary(accept: Optional[str]) -> bool:
+    """Accept 头中显式包含（且 q>0）二进制流媒体类型时返回 True；*/* 不算。"""
+    for token in (accept or "").lower().split(","):
+        media, _, params = token.strip().partition(";")
+        if media.strip() != MEDIA_TYPE:
+            continue
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _pad(size: int) -> int:
+    return (-size) % _ALIGN
+
+
+def _quantize(values: np.ndarray, valid: np.ndarray) -> Optional[Tuple[str, np.dtype, float, np.ndarray]]:
+    """尝试无损量化为整数数组；不可行时返回 None。"""
+    finite = values[valid]
+    for scale in _SCALES:
+        scaled = finite / scale
+        rounded = np.rint(scaled)
+        if finite.size and np.max(np.abs(scaled - rounded)) >= _QUANT_TOLERANCE:
+            continue
+        lo = rounded.min() if finite.size else 0
+        hi = rounded.max() if finite.size else 0
+        for name, dtype in _INT_DTYPES:
+            info = np.iinfo(dtype)
+            # 最小值保留为缺失值哨兵
+            if info.min < lo and hi <= info.max:
+                out = np.full(values.shape, info.min, dtype=dtype)
+                out[valid] = rounded.astype(dtype)
+                return name, dtype, scale, out
+        return None
+    return None
+
+
+def encode_channel(values: Any) -> Tuple[Dict[str, Any], bytes]:
+    """编码单个通道，返回（通道描述，数组字节）。"""
+    try:
+        grid = np.asarray(values if values is not None else [], dtype=np.float64)
+    except (TypeError, ValueError):
+        return {"dtype": "json", "length": len(values), "values": values}, b""
+    arr = grid.ravel()
+    valid = np.isfinite(arr)
+    quantized = _quantize(arr, valid)
+    if quantized is not None:
+        name, dtype, scale, out = quantized
+        null = int(np.iinfo(dtype).min)
+    else:
+        name, dtype = _FLOAT_DTYPE
+        scale, null = 1, None
+        out = np.where(valid, arr, np.nan).astype(dtype)
+    descriptor = {"dtype": name, "scale": scale, "length": int(arr.size), "shape": list(grid.shape), "null": null}
+    return descriptor, out.tobytes()
+
+
+def encode(channels: Iterable[Dict[str, Any]], meta: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    打包多个通道。
+
+    channels 中每个元素为 {"type": ..., "data": [...], ...}，除 data 外的字段原样写入通道描述。
+    """
+    descriptors: List[Dict[str, Any]] = []
+    chunks: List[bytes] = []
+    offset = 0
+    for item in channels:
+        descriptor = {k: v for k, v in item.items() if k != "data"}
+        encoded, raw = encode_channel(item.get("data"))
+        descriptor.update(encoded)
+        descriptor["offset"] = offset
+        descriptor["nbytes"] = len(raw)
+        descriptors.append(descriptor)
+        padding = b"\0" * _pad(len(raw))
+        chunks.extend((raw, padding))
+        offset += len(raw) + len(padding)
+
+    header = fast_json.dumps({"version": VERSION, "meta": meta or {}, "channels": descriptors})
+    header_padding = b"\0" * _pad(_PREAMBLE.size + len(header))
+    return b"".join((_PREAMBLE.pack(MAGIC, VERSION, 0, len(header)), header, header_padding, *chunks))
+
+
+def encode_all_payload(payload: Dict[str, Any]) -> bytes:
+    """/all 结果：streams 进入数据区，其余字段放在 header.meta。"""
+    meta = {k: v for k, v in payload.items() if k != "streams"}
+    return encode(payload.get("streams") or [], meta)
+
+
+def encode_all_json(raw: bytes) -> bytes:
+    """由 /all 的缓存 JSON 字节生成二进制容器（供缓存副本使用）。"""
+    return encode_all_payload(json.loads(raw))
+
+
+def decode(buf: bytes) -> Dict[str, Any]:
+    """
+    解码容器（供 Python 客户端与校验使用）。
+
+    返回 {"meta": {...}, "channels": [{...描述..., "data": ndarray}]}；
+    整数通道按 scale 还原为 float64（scale 为 1 时保持整数），缺失值还原为 NaN；
+    数组按 "shape" 还原形状（无该字段的旧容器为一维）。
+    """
+    magic, version, _flags, header_len = _PREAMBLE.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("不是有效的流数据容器")
+    header_end = _PREAMBLE.size + header_len
+    header = json.loads(bytes(buf[_PREAMBLE.size:header_end]))
+    data_start = header_end + _pad(header_end)
+    channels = []
+    for descriptor in header["channels"]:
+        channel = dict(descriptor)
+        dtype = _DTYPES.get(descriptor["dtype"])
+        if dtype is not None:
+            start = data_start + descriptor["offset"]
+            raw = np.frombuffer(buf, dtype=dtype, count=descriptor["length"], offset=start)
+            if dtype.kind == "i":
+                missing = raw == descriptor["null"]
+                if descriptor["scale"] == 1 and not missing.any():
+                    channel["data"] = raw.astype(np.int64)
+                else:
+                    values = raw.astype(np.float64) * descriptor["scale"]
+                    values[missing] = np.nan
+                    channel["data"] = values
+            else:
+                channel["data"] = raw.astype(np.float64)
+            channel["data"] = channel["data"].reshape(descriptor.get("shape") or -1)
+        else:
+            channel["data"] = descriptor.get("values")
+        channels.append(channel)
+    return {"meta": header.get("meta") or {}, "channels": channels}
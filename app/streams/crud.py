@@ -4,10 +4,13 @@
 提供：
 1) 流数据的获取与统一返回格式；
 2) 从 FIT 文件解析 records，并构建 StreamData；
-3) 重采样（分辨率 high/medium/low）与 best_power 的附加处理（含可选写库）。
+3) 降采样（分辨率 high/medium/low/overview 或 target_points，算法见 streams/downsample.py；
+   各分辨率层在解析时预计算为金字塔；可按 start/end 时间或距离窗口截取后再降采样）
+   与 best_power 的附加处理（含可选写库）。
 """
 
 import base64
+import hashlib
 import json
 import requests
 import logging
@@ -17,6 +20,9 @@ from . import models
 from .fit_parser import FitParser
 from .models import SeriesType
 from ..db.models import TbActivity, TbAthlete
+from ..config import ELEVATION_HYSTERESIS_M
+from ..core.analytics.altitude import elevation_gain as elevation_gain_m
+from ..core.analytics.wbal import tau_model_for
 from fitparse import FitFile
 from io import BytesIO
 
@@ -31,6 +37,15 @@ class StreamCRUD:
         self._parsed_cache: Dict[int, models.StreamData] = {}
         self._session_cache: Dict[int, Optional[Dict[str, Any]]] = {}
         self._raw_fit_cache: Dict[int, bytes] = {}
+        # FIT 内容哈希：下载时记录（与原始字节是否缓存无关），用于 HTTP ETag
+        self._fit_hashes: Dict[int, str] = {}
+
+    def fit_content_hash(self, activity_id: int) -> Optional[str]:
+        """本进程下载过的 FIT 文件内容哈希（sha256），未下载过返回 None。"""
+        return self._fit_hashes.get(activity_id)
+
+    def _remember_fit_hash(self, activity_id: int, file_data: bytes) -> None:
+        self._fit_hashes[activity_id] = hashlib.sha256(file_data).hexdigest()
 
     def _parse_session_from_bytes(self, file_data: bytes) -> Optional[Dict[str, Any]]:
         """从 FIT 文件字节流中解析 session 数据（支持 fitparse -> fitdecode fallback）"""
@@ -181,6 +196,7 @@ class StreamCRUD:
             try:
                 response = requests.get(fit_url, timeout=30)
                 response.raise_for_status()
+                self._remember_fit_hash(activity_id, response.content)
                 session_data = self._parse_session_from_bytes(response.content)
                 if use_cache:
                     self._raw_fit_cache[activity_id] = response.content
@@ -196,7 +212,12 @@ class StreamCRUD:
         db: Session, 
         activity_id: int, 
         keys: List[str], 
-        resolution: models.Resolution = models.Resolution.HIGH
+        resolution: models.Resolution = models.Resolution.HIGH,
+        target_points: Optional[int] = None,
+        algorithm: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        axis: str = "time",
     ) -> List[Dict[str, Any]]:
         activity = db.query(TbActivity).filter(TbActivity.id == activity_id).first()
         if not activity:
@@ -205,16 +226,34 @@ class StreamCRUD:
         stream_data = self.load_stream_data(db, activity_id, activity=activity)
         if not stream_data:
             return []
-        
+
+        # 时间/距离窗口：换算为下标区间，窗口内按同样的目标点数降采样
+        window = None
+        window_info = None
+        if start is not None or end is not None:
+            try:
+                window = stream_data.window_indices(start, end, axis)
+            except ValueError as e:
+                from fastapi import HTTPException
+                raise HTTPException(status_code=400, detail=str(e))
+            rounded_start, rounded_end = models.round_window(start, end, axis)
+            window_info = {
+                "axis": axis,
+                "start": rounded_start,
+                "end": rounded_end,
+                "start_index": window[0],
+                "end_index": window[1],
+            }
+
         result = []
         for key in keys:
             if key in self.fit_parser.supported_fields:
                 try:
-                    # 对于 best_power，强制使用 high 分辨率，忽略传入的 resolution 参数
+                    # 对于 best_power，强制使用 high 分辨率，忽略传入的 resolution / target_points 参数
                     if key == 'best_power':
                         stream_obj = stream_data.get_stream(key, models.Resolution.HIGH)
                     else:
-                        stream_obj = stream_data.get_stream(key, resolution)
+                        stream_obj = stream_data.get_stream(key, resolution, target_points, algorithm, window)
                 except ValueError as e:
                     from fastapi import HTTPException
                     raise HTTPException(status_code=400, detail=str(e))
@@ -237,6 +276,8 @@ class StreamCRUD:
                     "original_size": original_size,
                     "resolution": actual_resolution.value
                 }
+                if window_info is not None and key != 'best_power':
+                    item["window"] = window_info
 
                 # 如果请求 best_power，则计算并更新数据库的最佳分段，同时把信息附加到返回中
                 if key == 'best_power':
@@ -251,18 +292,8 @@ class StreamCRUD:
                             except Exception:
                                 distance_m = 0
 
-                        # 计算总爬升（正向增量求和）
-                        elevation_gain = 0
-                        if stream_data.altitude and len(stream_data.altitude) > 1:
-                            prev = stream_data.altitude[0]
-                            gain = 0
-                            for h in stream_data.altitude[1:]:
-                                if h is not None and prev is not None:
-                                    delta = h - prev
-                                    if delta > 0:
-                                        gain += delta
-                                    prev = h
-                            elevation_gain = int(gain)
+                        # 计算总爬升（与活动概览同一口径：异常值过滤后正向增量求和）
+                        elevation_gain = int(elevation_gain_m(stream_data.altitude, ELEVATION_HYSTERESIS_M))
 
                         activity_data_stub = {
                             'distance': distance_m,
@@ -346,13 +377,15 @@ class StreamCRUD:
                 response = requests.get(activity.upload_fit_url, timeout=30)
                 response.raise_for_status()
                 file_data = response.content
+                self._remember_fit_hash(activity.id, file_data)
                 if use_cache:
                     self._raw_fit_cache[activity.id] = file_data
 
             athlete = db.query(TbAthlete).filter(TbAthlete.id == activity.athlete_id).first()
             athlete_info = {
                 'ftp': int(athlete.ftp),
-                'wj': athlete.w_balance
+                'wj': athlete.w_balance,
+                'tau_model': tau_model_for(athlete.id),
             }
             parsed = self.fit_parser.parse_fit_file(file_data, athlete_info)
             if getattr(parsed, "_parse_failed", False):
@@ -364,6 +397,8 @@ class StreamCRUD:
                     self._raw_fit_cache.pop(activity.id, None)
                     self._parsed_cache.pop(activity.id, None)
                 return None
+            # 解析时一次性构建分辨率金字塔，后续任意通道 × 分辨率均为查表
+            parsed.build_pyramid()
             if use_cache:
                 self._parsed_cache[activity.id] = parsed
                 self._session_cache[activity.id] = self._parse_session_from_bytes(file_data)
@@ -0,0 +1,180 @@
+"""
+流数据降采样引擎（保形）
+
+原先 medium/low 分辨率按固定步长抽点（data[::step]），会丢掉冲刺峰值等关键形状。
+此处提供三种算法，均返回所选样本的原始下标（升序），取值时沿用原始数据（int/float/None 类型不变）：
+
+- minmax：按等宽桶取每桶最小值与最大值（每桶 2 点），保留峰谷，适合功率/心率/踏频等高频抖动通道；
+          对单调递增的时间/距离通道等价于取每桶首尾样本；
+- lttb  ：Largest-Triangle-Three-Buckets，按视觉面积选点，适合海拔/速度等平滑曲线；
+- stride：等间隔抽样，用于经纬度等需要成对对齐的通道。
+
+n 小于原长度时，各算法均恰好返回 n 个互不相同的下标，第 k 个点落在原始序列约 k·N/n 附近
+（误差不超过一个桶宽），与前端按下标对齐多通道绘图的方式兼容。
+各通道按 CHANNEL_ALGORITHMS 独立选择算法（请求可指定 algorithm 覆盖），结果按
+(通道, 算法, 点数, 窗口) 缓存在 StreamData 上。
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+LTTB = "lttb"
+MINMAX = "minmax"
+STRIDE = "stride"
+ALGORITHMS = (LTTB, MINMAX, STRIDE)
+
+# LTTB 平均桶宽不超过该值时走标量选点（窄桶下比逐桶 NumPy 调用更快）
+_LTTB_SCALAR_MAX_BUCKET = 64
+
+# 各通道默认算法；未列出的通道使用 LTTB
+CHANNEL_ALGORITHMS: Dict[str, str] = {
+    "power": MINMAX,
+    "heart_rate": MINMAX,
+    "cadence": MINMAX,
+    "torque": MINMAX,
+    "timestamp": MINMAX,
+    "elapsed_time": MINMAX,
+    "time": MINMAX,
+    "distance": MINMAX,
+    "position_lat": STRIDE,
+    "position_long": STRIDE,
+    "left_right_balance": STRIDE,
+    "left_torque_effectiveness": STRIDE,
+    "right_torque_effectiveness": STRIDE,
+    "left_pedal_smoothness": STRIDE,
+    "right_pedal_smoothness": STRIDE,
+}
+
+
+def default_algorithm(channel: str) -> str:
+    return CHANNEL_ALGORITHMS.get(channel, LTTB)
+
+
+def _as_float(values: Sequence[Any]) -> np.ndarray:
+    """转为 float64 数组，None 转为 NaN。"""
+    return np.asarray(values, dtype=np.float64)
+
+
+def stride_indices(size: int, n: int) -> np.ndarray:
+    if n >= size:
+        return np.arange(size)
+    return np.unique(np.linspace(0, size - 1, max(n, 1)).round().astype(np.int64))
+
+
+def minmax_indices(y: np.ndarray, n: int) -> np.ndarray:
+    """
+    每桶取最小值与最大值的下标（桶内按下标先后排列），共 n 个点。
+
+    n 为奇数时首个样本单独保留，其余样本分为 n // 2 个桶（每桶至少 2 个样本）；
+    桶内取值恒定或无有效样本时 argmin 与 argmax 相同，另取桶首/桶尾补足 2 点。
+    """
+    size = y.size
+    if n >= size:
+        return np.arange(size)
+    if n < 2:
+        return stride_indices(size, n)
+    head = n % 2
+    buckets = n // 2
+    edges = np.linspace(head, size, buckets + 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    width = int((ends - starts).max())
+    idx = starts[:, None] + np.arange(width)[None, :]
+    inside = idx < ends[:, None]
+    vals = y[np.minimum(idx, size - 1)]
+    usable = inside & np.isfinite(vals)
+    lo = starts + np.argmin(np.where(usable, vals, np.inf), axis=1)
+    hi = starts + np.argmax(np.where(usable, vals, -np.inf), axis=1)
+    hi = np.where(lo != hi, hi, np.where(lo == starts, ends - 1, starts))
+    pairs = np.column_stack((np.minimum(lo, hi), np.maximum(lo, hi))).ravel()
+    return np.concatenate(([0], pairs)) if head else pairs
+
+
+def lttb_indices(y: np.ndarray, n: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    LTTB：首尾点固定，中间 n-2 个桶各选 1 点，使其与上一选中点、下一桶均值构成的三角形面积最大。
+
+    桶边界、下一桶均值一次性向量化计算；逐桶的选点依赖上一桶结果，只保留桶级循环
+    （窄桶走标量循环，宽桶每桶一次向量化面积计算）。
+    """
+    size = y.size
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return stride_indices(size, n)
+    x = np.arange(size, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    finite = np.isfinite(y)
+    y_filled = np.where(finite, y, 0.0)
+
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    counts = np.add.reduceat(finite.astype(np.int64), starts)
+    sum_y = np.add.reduceat(y_filled, starts)
+    sum_x = np.add.reduceat(np.where(finite, x, 0.0), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_y = np.where(counts > 0, sum_y / counts, np.nan)
+        avg_x = np.where(counts > 0, sum_x / counts, (x[starts] + x[ends - 1]) / 2)
+    # 下一桶均值；最后一个桶以终点为参照
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y_filled[-1] if finite[-1] else np.nan)
+
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    if size <= n * _LTTB_SCALAR_MAX_BUCKET:
+        out[1:-1] = _lttb_pick_scalar(x, y, starts, ends, next_x, next_y)
+        return out
+    a = 0
+    for i in range(n - 2):
+        lo, hi = starts[i], ends[i]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        area = np.where(np.isfinite(area), area, -1.0)
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _lttb_pick_scalar(
+    x: np.ndarray, y: np.ndarray, starts: np.ndarray, ends: np.ndarray, next_x: np.ndarray, next_y: np.ndarray
+) -> List[int]:
+    """
+    桶较窄时的逐桶选点：总计 O(N) 次标量运算，避免每桶多次 NumPy 调用的固定开销。
+
+    面积 |(ax-cx)(yj-ay) - (ax-xj)(cy-ay)| 展开为 |A·yj + B·xj - K|；NaN 样本的面积为 NaN，不会被选中。
+    """
+    xs, ys = x.tolist(), y.tolist()
+    picks: List[int] = []
+    a = 0
+    for lo, hi, cx, cy in zip(starts.tolist(), ends.tolist(), next_x.tolist(), next_y.tolist()):
+        ax, ay = xs[a], ys[a]
+        coef_y, coef_x = ax - cx, cy - ay
+        k = coef_y * ay + coef_x * ax
+        best, pick = -1.0, lo
+        for j in range(lo, hi):
+            area = coef_y * ys[j] + coef_x * xs[j] - k
+            if area < 0:
+                area = -area
+            if area > best:
+                best, pick = area, j
+        a = pick
+        picks.append(pick)
+    return picks
+
+
+def downsample_indices(values: Sequence[Any], n: int, algorithm: str) -> np.ndarray:
+    """返回降采样后保留样本的下标。"""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"不支持的降采样算法: {algorithm}，可选 {', '.join(ALGORITHMS)}")
+    if algorithm == STRIDE:
+        return stride_indices(len(values), n)
+    y = _as_float(values)
+    if algorithm == MINMAX:
+        return minmax_indices(y, n)
+    return lttb_indices(y, n)
+
+
+def downsample(values: List[Any], n: int, algorithm: str) -> List[Any]:
+    """按算法降采样到 n 个点；n 不小于原长度时原样返回。"""
+    if not values or n >= len(values):
+        return values
+    return [values[i] for i in downsample_indices(values, n, algorithm)]
@@ -12,9 +12,16 @@ from fitparse import FitFile
 import numpy as np
 
 from .models import StreamData, Resolution
+from ..core.analytics.rolling import best_mean_curve
+from ..core.analytics.derived import DERIVED_CHANNELS, derive_streams, elapsed_time
 
 
 logger = logging.getLogger(__name__)
+
+# 坡度调整配速（gap）只对跑步活动计算（FIT session/sport 消息的 sport 字段）
+RUNNING_SPORTS = frozenset({'running'})
+_NON_RUNNING_CHANNELS = tuple(c for c in DERIVED_CHANNELS if c != 'gap')
+
 _FITDECODE: Optional[Any] = None
 _FITDECODE_TRIED = False
 
@@ -24,7 +31,7 @@ class FitParser:
     def __init__(self):
         """初始化解析器"""
         self.supported_fields = {
-            'timestamp', 'position_lat', 'position_long', 'distance', 'enhanced_altitude', 'altitude', 'enhanced_speed', 'speed', 'power', 'heart_rate', 'cadence', 'left_right_balance', 'left_torque_effectiveness', 'right_torque_effectiveness', 'left_pedal_smoothness', 'right_pedal_smoothness', 'temperature', 'best_power', 'power_hr_ratio', 'elapsed_time', 'torque', 'spi', 'w_balance', 'vam'
+            'timestamp', 'position_lat', 'position_long', 'distance', 'enhanced_altitude', 'altitude', 'enhanced_speed', 'speed', 'power', 'heart_rate', 'cadence', 'left_right_balance', 'left_torque_effectiveness', 'right_torque_effectiveness', 'left_pedal_smoothness', 'right_pedal_smoothness', 'temperature', 'best_power', 'power_hr_ratio', 'elapsed_time', 'torque', 'spi', 'w_balance', 'vam', 'gap'
         }
     
     def parse_fit_file(
@@ -144,6 +151,13 @@ class FitParser:
             rps = record.get_value('right_pedal_smoothness')
             right_pedal_smoothness.append(float(rps) if rps is not None else 0.0)
 
+        # 记录消息已全部解析，再次遍历只读取已缓存的消息
+        sport = None
+        for message in fitfile.get_messages(('session', 'sport')):
+            sport = message.get_value('sport')
+            if sport is not None:
+                break
+
         result = self._finalize_stream_data(
             timestamp,
             position_lat,
@@ -163,6 +177,7 @@ class FitParser:
             right_pedal_smoothness,
             temperature,
             athlete_info,
+            sport,
         )
         object.__setattr__(result, "_fit_backend", "fitparse")
         return result
@@ -201,6 +216,7 @@ class FitParser:
             
             timestamp, position_lat, position_long, distance, enhanced_altitude, altitude, enhanced_speed, speed, power, heart_rate, cadence, left_right_balance, left_torque_effectiveness, right_torque_effectiveness, left_pedal_smoothness, right_pedal_smoothness, temperature = ([] for _ in range(17))
             start_time = None
+            sport = None
 
             def _get(frame: Any, field: str) -> Any:
                 try:
@@ -212,6 +228,10 @@ class FitParser:
                 for frame in reader:
                     if not isinstance(frame, fitdecode_module.records.FitDataMessage):
                         continue
+                    if frame.name in ('session', 'sport'):
+                        if sport is None:
+                            sport = _get(frame, 'sport')
+                        continue
                     if frame.name != 'record':
                         continue
 
@@ -288,6 +308,7 @@ class FitParser:
             right_pedal_smoothness,
             temperature,
             athlete_info,
+            sport,
         )
         object.__setattr__(result, "_fit_backend", "fitdecode")
         return result
@@ -312,35 +333,15 @@ class FitParser:
         right_pedal_smoothness: List[float],
         temperature: List[float],
         athlete_info: Optional[Dict[str, Any]],
+        sport: Optional[Any] = None,
     ) -> StreamData:
-        timestamp_np = np.asarray(timestamp, dtype=np.int32)
-        if timestamp_np.size:
-            diffs = np.diff(timestamp_np, prepend=timestamp_np[0])
-            diffs = np.clip(diffs, 0, 1)
-            elapsed_time = np.cumsum(diffs).astype(int).tolist()
-        else:
-            elapsed_time = []
-
         power_np = np.asarray(power, dtype=np.float64)
-        heart_rate_np = np.asarray(heart_rate, dtype=np.float64)
-        cadence_np = np.asarray(cadence, dtype=np.float64)
-
-        with np.errstate(divide='ignore', invalid='ignore'):
-            ratio = np.divide(power_np, heart_rate_np, out=np.zeros_like(power_np), where=(power_np > 0) & (heart_rate_np > 0))
-        power_hr_ratio = np.round(ratio, 2).tolist()
-
-        torque_np = np.zeros_like(power_np)
-        mask = (power_np > 0) & (cadence_np > 0)
-        torque_np[mask] = power_np[mask] / (cadence_np[mask] * 2 * np.pi / 60)
-        torque = np.round(torque_np).astype(int).tolist()
-
-        spi_np = np.zeros_like(power_np)
-        spi_np[mask] = power_np[mask] / cadence_np[mask]
-        spi = np.round(spi_np, 2).tolist()
-
         best_power = self._calculate_best_power_curve(power_np)
-        w_balance = self._calculate_w_balance(power_np.tolist(), athlete_info)
-        vam = self._calculate_vam(timestamp_np, np.asarray(altitude, dtype=np.float64))
+        channels = DERIVED_CHANNELS if str(sport).lower() in RUNNING_SPORTS else _NON_RUNNING_CHANNELS
+        derived = derive_streams(
+            timestamp, altitude, power_np, heart_rate, cadence, athlete_info, channels,
+            speed=enhanced_speed, distance=distance, enhanced_altitude=enhanced_altitude,
+        )
 
         return StreamData(
             timestamp=timestamp,
@@ -361,68 +362,14 @@ class FitParser:
             right_pedal_smoothness=right_pedal_smoothness,
             temperature=temperature,
             best_power=best_power,
-            power_hr_ratio=power_hr_ratio,
-            elapsed_time=elapsed_time,
-            torque=torque,
-            spi=spi,
-            w_balance=w_balance,
-            vam=vam,
+            power_hr_ratio=derived['power_hr_ratio'],
+            elapsed_time=elapsed_time(timestamp),
+            torque=derived['torque'],
+            spi=derived['spi'],
+            w_balance=derived['w_balance'],
+            vam=derived['vam'],
+            gap=derived.get('gap', []),
         )
 
     def _calculate_best_power_curve(self, powers: np.ndarray) -> List[int]:
-        max_duration = min(len(powers), 3600)
-        if max_duration == 0:
-            return []
-        prefix = np.concatenate(([0.0], powers.cumsum()))
-        best = np.zeros(max_duration, dtype=np.int32)
-        for window in range(1, max_duration + 1):
-            window_sums = prefix[window:] - prefix[:-window]
-            best[window - 1] = int(round(window_sums.max() / window))
-        return best.tolist()
-
-    def _calculate_w_balance(
-        self, 
-        powers: list, 
-        athlete_info: Optional[Dict[str, Any]] = None
-    ) -> list:
-
-        if not (athlete_info and athlete_info.get('ftp') and athlete_info.get('wj')):
-            return [0.0] * len(powers)
-        
-        W_prime = athlete_info['wj']
-        CP = int(athlete_info['ftp'])
-        tau = 546.0
-        balance = W_prime
-        w_balance = []
-        
-        for p in powers:
-            if p > CP * 1.05:
-                balance -= (p - CP)
-            elif p < CP * 0.95:
-                recovery = (W_prime - balance) / tau
-                balance += recovery
-            
-            balance = max(0.0, min(W_prime, balance))
-            w_balance.append(round(balance / 1000, 1))
-        
-        return w_balance
-
-    def _calculate_vam(
-        self, 
-        timestamps: np.ndarray, 
-        altitudes: np.ndarray, 
-        window_seconds: int = 50
-    ) -> List[int]:
-        if timestamps.size == 0 or altitudes.size == 0:
-            return []
-        start_times = timestamps - window_seconds
-        idx = np.searchsorted(timestamps, start_times, side='left')
-        idx = np.minimum(idx, np.arange(timestamps.size))
-        delta_time = timestamps - timestamps[idx]
-        delta_alt = altitudes - altitudes[idx]
-        vam = np.zeros_like(delta_alt)
-        valid = delta_time >= window_seconds * 0.5
-        with np.errstate(divide='ignore', invalid='ignore'):
-            vam[valid] = (delta_alt[valid] / (delta_time[valid] / 3600.0)) * 1.4
-        vam = np.clip(vam, -5000, 5000)
-        return np.round(vam).astype(int).tolist()
+        return np.rint(best_mean_curve(powers, 3600)).astype(np.int32).tolist()
@@ -8,16 +8,62 @@
 4. 数据库模型 - tb_activity和tb_athlete表的映射
 """
 
-from typing import List, Optional, Union, Dict, Any
+from typing import List, Optional, Union, Dict, Any, Tuple
 from pydantic import BaseModel, Field
 from enum import Enum
+from collections import OrderedDict
+import threading
+import math
 import sys
 
+import numpy as np
+
+from . import downsample
+
+# 每个活动（StreamData 实例）缓存的降采样结果数上限
+_DOWNSAMPLE_CACHE_SIZE = 64
+_downsample_lock = threading.Lock()
+
 class Resolution(str, Enum):
     """数据分辨率枚举"""
     LOW = "low"
     MEDIUM = "medium"
     HIGH = "high"
+    OVERVIEW = "overview"
+
+
+# 分辨率金字塔：high 全量、medium 1/4、low 1/20、overview 固定点数
+RESOLUTION_RATIOS = {Resolution.MEDIUM: 0.25, Resolution.LOW: 0.05}
+OVERVIEW_POINTS = 1000
+PYRAMID_LEVELS = (Resolution.MEDIUM, Resolution.LOW, Resolution.OVERVIEW)
+
+
+def resolution_points(resolution: Resolution, original_size: int) -> int:
+    """某分辨率层的目标点数；high 返回原长度。"""
+    if resolution == Resolution.OVERVIEW:
+        return min(OVERVIEW_POINTS, original_size)
+    ratio = RESOLUTION_RATIOS.get(resolution)
+    if ratio is None:
+        return original_size
+    return max(1, int(original_size * ratio))
+
+# 结果依赖运动员阈值或数据库状态的通道（w_balance 依赖 FTP/W′，best_power 附带功率纪录）；
+# 其余通道只由 FIT 内容决定
+ATHLETE_DEPENDENT_STREAMS = frozenset({"w_balance", "best_power"})
+
+# 时间窗口截取：坐标轴 -> 所用通道（timestamp 为相对起点的秒数，distance 为米）
+WINDOW_AXES = {"time": "timestamp", "distance": "distance"}
+# 窗口边界向外取整的粒度（秒 / 米）；取整后的边界作为缓存键，相近的缩放请求共用结果
+WINDOW_ROUNDING = {"time": 5, "distance": 10}
+
+
+def round_window(start: Optional[float], end: Optional[float], axis: str) -> Tuple[Optional[float], Optional[float]]:
+    """窗口边界按 WINDOW_ROUNDING 向外取整（start 向下、end 向上）；重复取整结果不变。"""
+    step = WINDOW_ROUNDING[axis]
+    lo = math.floor(start / step) * step if start is not None else None
+    hi = math.ceil(end / step) * step if end is not None else None
+    return lo, hi
+
 
 class SeriesType(str, Enum):
     """系列类型枚举"""
@@ -98,6 +144,10 @@ class VAMStream(BaseStream):
     data: List[int] = Field(...)
     series_type: SeriesType = Field(default=SeriesType.DISTANCE)
 
+class GAPStream(BaseStream):
+    data: List[float] = Field(...)
+    series_type: SeriesType = Field(default=SeriesType.TIME)
+
 class LeftRightBalanceStream(BaseStream):
     data: List[float] = Field(...)
     series_type: SeriesType = Field(default=SeriesType.DISTANCE)
@@ -148,12 +198,22 @@ class StreamData(BaseModel):
     spi                        : List[float] = Field(default_factory=list)
     w_balance                  : List[float] = Field(default_factory=list)
     vam                        : List[int]   = Field(default_factory=list)
+    gap                        : List[float] = Field(default_factory=list)
     
     def get_stream(
         self, 
         stream_type: str, 
-        resolution: Resolution
+        resolution: Resolution,
+        target_points: Optional[int] = None,
+        algorithm: Optional[str] = None,
+        window: Optional[Tuple[int, int]] = None,
     ) -> Optional[BaseStream]:
+        """
+        获取某通道按分辨率降采样后的流。
+
+        window 为 window_indices 返回的下标区间 [lo, hi)：只在窗口内降采样，
+        目标点数仍按整条流计算，因此各缩放级别返回的点数大致相同。
+        """
         available = self.get_available_streams()
         if stream_type not in available:
             raise ValueError('该流类型在当前活动中不可用，请通过 available_streams 接口获取可用流类型')
@@ -166,7 +226,7 @@ class StreamData(BaseModel):
             return None
         
        
-        resampled_data = self._resample_data(data, resolution)
+        resampled_data = self._resample_data(data, resolution, stream_type, target_points, algorithm, window)
         stream_classes = {
             'distance'                  : DistanceStream,
             'time'                      : TimeStream,
@@ -194,9 +254,11 @@ class StreamData(BaseModel):
             'spi'                       : SPIStream,
             'w_balance'                 : WBalanceStream,
             'vam'                       : VAMStream,
+            'gap'                       : GAPStream,
         }
         if stream_type in stream_classes:
-            return stream_classes[stream_type](
+            # 数据来自已校验的 StreamData（降采样只挑选原值），无需再逐元素校验
+            return stream_classes[stream_type].model_construct(
                 original_size = len(data) ,
                 resolution    = resolution ,
                 data          = resampled_data ,
@@ -207,24 +269,94 @@ class StreamData(BaseModel):
     def _resample_data(
         self, 
         data: List[Union[int, float]], 
-        resolution: Resolution
+        resolution: Resolution,
+        stream_type: Optional[str] = None,
+        target_points: Optional[int] = None,
+        algorithm: Optional[str] = None,
+        window: Optional[Tuple[int, int]] = None,
     ) -> List[Union[int, float]]:
+        """
+        按分辨率（见 resolution_points）或 target_points 降采样；target_points 优先。
+
+        默认算法下的 medium/low/overview 直接取自解析时预计算的金字塔（build_pyramid）；
+        其余组合按 (通道, 算法, 点数, 窗口) 缓存在当前对象上（即按活动缓存），重复请求不再重算。
+        指定 window 时先截取 data[lo:hi]，点数按整条流计算。
+        """
         if not data:
             return []
         original_size = len(data)
-        if resolution == Resolution.HIGH:
+        if window is None and target_points is None and (algorithm is None or algorithm == downsample.default_algorithm(stream_type or "")):
+            level = self.__dict__.get("_pyramid", {}).get((stream_type, resolution))
+            if level is not None:
+                return level
+        points = max(1, int(target_points)) if target_points is not None else resolution_points(resolution, original_size)
+        if window is not None:
+            data = data[window[0]:window[1]]
+        if points >= len(data):
             return data
-        elif resolution == Resolution.MEDIUM:
-            target_size = max(1, int(original_size * 0.25))
-            step        = max(1, original_size // target_size)
-            result      = data[::step]
-            return result[:target_size]
-        elif resolution == Resolution.LOW:
-            target_size = max(1, int(original_size * 0.05))
-            step        = max(1, original_size // target_size)
-            result      = data[::step]
-            return result[:target_size]
+        algorithm = algorithm or downsample.default_algorithm(stream_type or "")
+        cache_key = (stream_type, algorithm, points, window)
+        with _downsample_lock:
+            cache = self.__dict__.get("_downsample_cache")
+            if cache is None:
+                cache = OrderedDict()
+                object.__setattr__(self, "_downsample_cache", cache)
+            hit = cache.get(cache_key)
+            if hit is not None:
+                cache.move_to_end(cache_key)
+                return hit
+        result = downsample.downsample(data, points, algorithm)
+        with _downsample_lock:
+            cache[cache_key] = result
+            while len(cache) > _DOWNSAMPLE_CACHE_SIZE:
+                cache.popitem(last=False)
+        return result
     
+    def window_indices(self, start: Optional[float], end: Optional[float], axis: str = "time") -> Tuple[int, int]:
+        """
+        将 [start, end]（秒或米，见 WINDOW_AXES）换算为下标区间 [lo, hi)。
+
+        边界先按 round_window 向外取整，再在坐标轴通道上 np.searchsorted；
+        坐标轴按累计最大值处理（缺失值/回退不影响单调性），数组缓存在当前对象上。
+        """
+        if axis not in WINDOW_AXES:
+            raise ValueError(f"不支持的窗口坐标轴: {axis}，可选 {', '.join(WINDOW_AXES)}")
+        start, end = round_window(start, end, axis)
+        with _downsample_lock:
+            axis_cache = self.__dict__.get("_axis_cache")
+            if axis_cache is None:
+                axis_cache = {}
+                object.__setattr__(self, "_axis_cache", axis_cache)
+            values = axis_cache.get(axis)
+        if values is None:
+            raw = getattr(self, WINDOW_AXES[axis], None)
+            if not raw:
+                raise ValueError(f"当前活动缺少 {WINDOW_AXES[axis]} 数据，无法按 {axis} 截取窗口")
+            values = np.asarray([v if v is not None else np.nan for v in raw], dtype=np.float64)
+            values = np.maximum.accumulate(np.where(np.isfinite(values), values, -np.inf))
+            with _downsample_lock:
+                axis_cache[axis] = values
+        lo = 0 if start is None else int(np.searchsorted(values, start, side="left"))
+        hi = values.size if end is None else int(np.searchsorted(values, end, side="right"))
+        return lo, max(lo, hi)
+
+    def build_pyramid(self) -> None:
+        """
+        解析完成后一次性预计算各通道的 medium/low/overview 层（按通道默认算法），
+        与 StreamData 一起驻留在解析缓存中；之后任意通道子集 × 分辨率均为查表。
+        """
+        pyramid: Dict[Any, List[Union[int, float]]] = {}
+        for name in self.get_available_streams():
+            data = getattr(self, name, None)
+            # best_power 为按时长索引的曲线，始终返回全量
+            if not data or name == 'best_power':
+                continue
+            algorithm = downsample.default_algorithm(name)
+            for level in PYRAMID_LEVELS:
+                points = resolution_points(level, len(data))
+                pyramid[(name, level)] = data if points >= len(data) else downsample.downsample(data, points, algorithm)
+        object.__setattr__(self, "_pyramid", pyramid)
+
     def get_available_streams(self) -> List[str]:
         cached = getattr(self, "_available_cache", None)
         if cached is not None:
@@ -16,6 +16,7 @@ class Resolution(str, Enum):
     LOW = "low"
     MEDIUM = "medium"
     HIGH = "high"
+    OVERVIEW = "overview"
 
 class SeriesType(str, Enum):
     """系列类型枚举"""
@@ -0,0 +1,96 @@
+"""
+/all 未命中路径的序列化基准（非 pytest 用例，直接运行）
+
+用法：
+    python -m tests.bench_all_serialization [--hours 4] [--runs 50]
+
+以 data/activity_cache 中的一个 /all 结果为模板，将 14 条流平铺扩展到 hours 小时（1Hz），
+分别测量：
+    before：AllActivityDataResponse(**data) → model_dump → json.dumps(indent=2) 写缓存
+            → jsonable_encoder + JSONResponse 编码响应（三次遍历）
+    after ：汇总字段校验 + model_construct → fast_json.dumps 一次（缓存与响应共用字节）
+输出 p50/p99（毫秒）与字节数。
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.infrastructure import fast_json
+from app.schemas.activities import AllActivityDataResponse, BestPowerCurveRecord
+
+TEMPLATE_GLOB = os.path.join("data", "activity_cache", "*.json")
+
+
+def _load_template(hours: float) -> dict:
+    candidates = sorted(glob.glob(TEMPLATE_GLOB), key=os.path.getsize, reverse=True)
+    if not candidates:
+        raise SystemExit(f"未找到模板文件：{TEMPLATE_GLOB}")
+    with open(candidates[0], "r", encoding="utf-8") as f:
+        data = json.load(f)
+    target = int(hours * 3600)
+    for stream in data.get("streams") or []:
+        values = stream.get("data") or [0]
+        reps = target // len(values) + 1
+        stream["data"] = (values * reps)[:target]
+        stream["original_size"] = target
+    return data
+
+
+def _before(data: dict) -> bytes:
+    result = AllActivityDataResponse(**data)
+    json.dumps(result.model_dump(), ensure_ascii=False, indent=2)
+    return JSONResponse(jsonable_encoder(result)).body
+
+
+def _after(data: dict) -> bytes:
+    data = dict(data)
+    streams = data.pop("streams", None)
+    best_power_record = data.pop("best_power_record", None)
+    if isinstance(best_power_record, dict):
+        best_power_record = BestPowerCurveRecord.model_construct(**best_power_record)
+    summary = AllActivityDataResponse(**data)
+    result = AllActivityDataResponse.model_construct(
+        **{**dict(summary), "streams": streams, "best_power_record": best_power_record}
+    )
+    return fast_json.dumps(fast_json.model_payload(result))
+
+
+def _percentiles(samples: list) -> tuple:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2]
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return p50 * 1000, p99 * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=4.0)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    data = _load_template(args.hours)
+    streams = data.get("streams") or []
+    print(f"streams={len(streams)} samples/stream={len(streams[0]['data']) if streams else 0} "
+          f"backend={'orjson' if fast_json.orjson is not None else 'stdlib json'}")
+
+    before_body, after_body = _before(data), _after(data)
+    assert json.loads(before_body) == json.loads(after_body), "before/after 输出不一致"
+
+    for name, fn in (("before", _before), ("after", _after)):
+        samples = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            body = fn(data)
+            samples.append(time.perf_counter() - started)
+        p50, p99 = _percentiles(samples)
+        print(f"{name:<7} p50={p50:8.1f}ms  p99={p99:8.1f}ms  bytes={len(body)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+滑动窗口内核基准（非 pytest 用例，直接运行）
+
+用法：
+    python -m tests.bench_rolling [--hours 4] [--runs 20]
+
+分别测量改造前后实现的 p50 耗时（毫秒）；改造前实现与逐值一致性校验见 tests/test_rolling.py。
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.core.analytics import rolling
+from app.core.analytics.hr import filter_hr_smooth, recovery_rate
+from app.core.analytics.interval_detection import _moving_average, _rolling_median
+from app.core.analytics.power import normalized_power
+from app.core.analytics.training import anaerobic_effect
+from tests.test_rolling import (
+    legacy_anaerobic_effect,
+    legacy_ewma,
+    legacy_max_drop,
+    legacy_moving_average,
+    legacy_normalized_power,
+    legacy_rolling_median,
+    synthetic,
+)
+
+
+def _time(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=4.0)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    seconds = int(args.hours * 3600)
+    power, hr = synthetic(seconds, 0)
+    p_list, h_list, f = power.tolist(), hr.tolist(), power.astype(float)
+    cases = (
+        ("normalized_power", lambda: legacy_normalized_power(p_list), lambda: normalized_power(p_list)),
+        ("anaerobic_effect", lambda: legacy_anaerobic_effect(p_list, 250), lambda: anaerobic_effect(p_list, 250)),
+        ("recovery_rate", lambda: legacy_max_drop(filter_hr_smooth(h_list)), lambda: recovery_rate(h_list)),
+        ("moving_average", lambda: legacy_moving_average(f, 31), lambda: _moving_average(f, 31)),
+        ("rolling_median", lambda: legacy_rolling_median(f, 151), lambda: _rolling_median(f, 151)),
+        ("ewma(25)", lambda: legacy_ewma(f, 25.0), lambda: rolling.ewma(f, 25.0)),
+        ("rolling_max(30)", lambda: np.lib.stride_tricks.sliding_window_view(f, 30).max(axis=1),
+         lambda: rolling.rolling_max(f, 30)),
+    )
+    print(f"samples={seconds}")
+    for name, before, after in cases:
+        runs = max(3, args.runs // 5) if name == "rolling_median" else args.runs
+        print(f"{name:<18} before={_time(before, runs):9.2f}ms  after={_time(after, runs):8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""功率纪录整体重建：窄表未覆盖的历史纪录保留，已删除活动出局，无剩余候选的运动员清空。"""
+
+import pytest
+from sqlalchemy import BIGINT, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+from app.db.models import TbActivity, TbActivityBestPower, TbAthletePowerRecords
+from app.repositories.activity_best_power_repo import rebuild_power_records, save_activity_best_powers
+
+
+@compiles(BIGINT, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    # SQLite 只有 INTEGER PRIMARY KEY 才自增
+    return "INTEGER"
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://")
+
+    # pysqlite 默认自行管理事务，需交给 SQLAlchemy 才能正确使用 SAVEPOINT
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, _record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    tables = [TbActivity.__table__, TbActivityBestPower.__table__, TbAthletePowerRecords.__table__]
+    TbActivity.metadata.create_all(engine, tables=tables)
+    session = Session(engine)
+    yield session
+    session.close()
+
+
+def _record(db, athlete_id):
+    db.expire_all()
+    return db.query(TbAthletePowerRecords).filter(TbAthletePowerRecords.athlete_id == athlete_id).one()
+
+
+def _top3(rec, prefix):
+    return [
+        (getattr(rec, f"{prefix}_{s}"), getattr(rec, f"{prefix}_{s}_activity_id"))
+        for s in ("1st", "2nd", "3rd")
+    ]
+
+
+def test_partial_coverage_keeps_history(db):
+    # 活动 1–3 为上线前的历史活动（只在 Top3 中），活动 2 已删除；活动 4 重新分析后写入了窄表
+    db.add_all([TbActivity(id=i, athlete_id=7) for i in (1, 3, 4)])
+    db.add(TbAthletePowerRecords(
+        athlete_id=7,
+        power_5s_1st=900, power_5s_1st_activity_id=1,
+        power_5s_2nd=850, power_5s_2nd_activity_id=2,
+        power_5s_3rd=800, power_5s_3rd_activity_id=3,
+        longest_ride_1st=120, longest_ride_1st_activity_id=3,
+    ))
+    db.commit()
+    save_activity_best_powers(db, 7, 4, {"5s": 820, "1m": 400}, distance_m=60_400)
+
+    assert rebuild_power_records(db, 7) == 1
+    rec = _record(db, 7)
+    assert _top3(rec, "power_5s") == [(900, 1), (820, 4), (800, 3)]
+    assert _top3(rec, "power_1m") == [(400, 4), (None, None), (None, None)]
+    assert _top3(rec, "longest_ride") == [(120, 3), (60, 4), (None, None)]
+
+
+def test_narrow_rows_replace_stale_values_of_covered_activity(db):
+    db.add_all([TbActivity(id=i, athlete_id=7) for i in (1, 2)])
+    db.add(TbAthletePowerRecords(
+        athlete_id=7,
+        power_5s_1st=900, power_5s_1st_activity_id=1,
+        power_5s_2nd=700, power_5s_2nd_activity_id=2,
+    ))
+    db.commit()
+    # 活动 1 重新上传/分析后数值下降：以窄表为准
+    save_activity_best_powers(db, 7, 1, {"5s": 650})
+
+    rebuild_power_records(db, 7)
+    assert _top3(_record(db, 7), "power_5s") == [(700, 2), (650, 1), (None, None)]
+
+
+def test_athlete_without_remaining_candidates_is_cleared(db):
+    db.add(TbActivity(id=10, athlete_id=8))
+    db.add(TbAthletePowerRecords(
+        athlete_id=9,
+        power_5s_1st=900, power_5s_1st_activity_id=1,
+        max_elevation_1st=1500, max_elevation_1st_activity_id=2,
+    ))
+    db.commit()
+    save_activity_best_powers(db, 8, 10, {"20m": 300})
+
+    assert rebuild_power_records(db) == 2
+    assert _top3(_record(db, 9), "power_5s") == [(None, None)] * 3
+    assert _top3(_record(db, 9), "max_elevation") == [(None, None)] * 3
+    assert _top3(_record(db, 8), "power_20m") == [(300, 10), (None, None), (None, None)]
+
+
+def test_nothing_to_rebuild(db):
+    assert rebuild_power_records(db) == 0
@@ -0,0 +1,89 @@
+"""海拔分析：异常值掩码、死区滤波与爬升/下降，与逐点循环参考实现比对。"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.core.analytics.altitude import (
+    altitude_valid_mask,
+    deadband,
+    elevation_gain,
+    elevation_profile,
+    total_descent,
+)
+
+
+def legacy_mask(altitude):
+    """逐点规则：None/非有限值、超出 [-500, 5000] m、与上一个保留样本相差超过 100 m 的样本剔除。"""
+    keep, last = [], None
+    for v in altitude:
+        ok = v is not None and math.isfinite(v) and -500 <= v <= 5000 and (last is None or abs(v - last) <= 100)
+        keep.append(ok)
+        if ok:
+            last = v
+    return keep
+
+
+def legacy_deadband(values, threshold):
+    half = threshold / 2.0
+    out = [values[0]]
+    for v in values[1:]:
+        out.append(min(max(out[-1], v - half), v + half))
+    return out
+
+
+def test_mask_rules():
+    altitude = [100, None, 105, 250, 260, 110, float("nan"), -600, 5200, 120, 4000, 125]
+    expected = [True, False, True, False, False, True, False, False, False, True, False, True]
+    assert altitude_valid_mask(altitude).tolist() == expected
+
+
+def test_mask_resumes_only_near_last_kept_sample():
+    # 断点后的样本彼此接近，但须与断点前的保留值（100）重新接上才恢复
+    altitude = [100, 300, 310, 320, 190, 150, 90]
+    assert altitude_valid_mask(altitude).tolist() == [True, False, False, False, True, True, True]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_mask_matches_legacy(seed):
+    rng = np.random.default_rng(seed)
+    altitude = (300 + np.cumsum(rng.normal(0, 2, 5000))).tolist()
+    for i in rng.choice(len(altitude), 80, replace=False):
+        altitude[i] = rng.choice([None, float("nan"), -900.0, 9000.0, altitude[i] + rng.choice([-400, 250, 150])])
+    assert altitude_valid_mask(altitude).tolist() == legacy_mask(altitude)
+
+
+def test_mask_empty_and_all_invalid():
+    assert altitude_valid_mask([]).size == 0
+    assert not altitude_valid_mask([None, -1000, 6000]).any()
+
+
+@pytest.mark.parametrize("threshold", [0.5, 2.0, 5.0, 17.0])
+def test_deadband_matches_loop(threshold):
+    values = (100 + np.cumsum(np.random.default_rng(1).normal(0, 1, 3000))).tolist()
+    np.testing.assert_allclose(deadband(values, threshold), legacy_deadband(values, threshold), rtol=0, atol=1e-9)
+
+
+def test_deadband_zero_threshold_is_identity():
+    values = np.array([1.0, 3.0, 2.0, 5.0])
+    assert np.array_equal(deadband(values, 0), values)
+    assert np.array_equal(deadband(values[:1], 4.0), values[:1])
+
+
+def test_hysteresis_suppresses_noise():
+    noise = 100 + np.tile([0.0, 1.0], 500)
+    assert elevation_gain(noise) == 500.0
+    assert elevation_gain(noise, hysteresis=2.0) == 0.0
+    climb = np.concatenate((noise, 100 + np.arange(1, 51, dtype=float)))
+    assert elevation_gain(climb, hysteresis=2.0) == pytest.approx(49.0)
+    assert total_descent(climb[::-1], hysteresis=2.0) == 49
+
+
+def test_profile_gain_matches_positive_diff_sum():
+    altitude = [100, 102, None, 101, 105, 400, 107, 103]
+    kept = [a for a, ok in zip(altitude, legacy_mask(altitude)) if ok]
+    diffs = np.diff(kept)
+    profile = elevation_profile(altitude)
+    assert profile.gain == diffs[diffs > 0].sum()
+    assert profile.descent == -diffs[diffs < 0].sum()
@@ -0,0 +1,47 @@
+"""流数据二进制容器：编码/解码往返，含 latlng 等二维通道。"""
+
+import numpy as np
+
+from app.streams import binary_format
+
+
+def _roundtrip(channels, meta=None):
+    return binary_format.decode(binary_format.encode(channels, meta))
+
+
+def test_one_dimensional_channels_roundtrip():
+    watts = [200, 250, None, 0, 1200]
+    distance = [0.0, 4.2, 8.75, 13.1, 17.0]
+    result = _roundtrip(
+        [{"type": "watts", "data": watts}, {"type": "distance", "data": distance, "series_type": "time"}],
+        {"activity_id": 1},
+    )
+    assert result["meta"] == {"activity_id": 1}
+    w, d = result["channels"]
+    assert w["shape"] == [5] and w["length"] == 5
+    np.testing.assert_array_equal(w["data"], [200, 250, np.nan, 0, 1200])
+    np.testing.assert_allclose(d["data"], distance)
+    assert d["series_type"] == "time"
+
+
+def test_pair_channel_keeps_shape():
+    rng = np.random.default_rng(0)
+    latlng = np.round(np.column_stack((30 + rng.random(50), 120 + rng.random(50))), 6).tolist()
+    (channel,) = _roundtrip([{"type": "latlng", "data": latlng}])["channels"]
+    assert channel["shape"] == [50, 2]
+    assert channel["length"] == 100
+    assert channel["data"].shape == (50, 2)
+    np.testing.assert_allclose(channel["data"], latlng, rtol=0, atol=1e-9)
+
+
+def test_ragged_channel_falls_back_to_json_values():
+    latlng = [[30.0, 120.0], None, [30.1, 120.1]]
+    (channel,) = _roundtrip([{"type": "latlng", "data": latlng}])["channels"]
+    assert channel["dtype"] == "json"
+    assert channel["data"] == latlng
+
+
+def test_empty_channel():
+    (channel,) = _roundtrip([{"type": "watts", "data": []}])["channels"]
+    assert channel["shape"] == [0]
+    assert channel["data"].size == 0
@@ -0,0 +1,67 @@
+"""缓存 GC：字节预算计入 .json.gz/.json.bin 派生副本。"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import BIGINT, create_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+from app.db.models import TbActivityCache
+from app.infrastructure.cache_gc import ActivityCacheGC
+from app.infrastructure.cache_manager import BINARY_SUFFIX, COMPRESSED_SUFFIX, ActivityCacheManager
+
+
+@compiles(BIGINT, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    # SQLite 只有 INTEGER PRIMARY KEY 才自增
+    return "INTEGER"
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://")
+    TbActivityCache.metadata.create_all(engine, tables=[TbActivityCache.__table__])
+    session = Session(engine)
+    yield session
+    session.close()
+
+
+def _entry(db, cache_dir, activity_id, size, accessed, variants=()):
+    path = os.path.join(cache_dir, f"{activity_id}_key.json")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    for suffix, variant_size in variants:
+        with open(path + suffix, "wb") as f:
+            f.write(b"y" * variant_size)
+    now = datetime.now()
+    db.add(TbActivityCache(
+        activity_id=activity_id, cache_key="key", file_path=path, file_size=size,
+        created_at=now, updated_at=now, last_accessed_at=now - timedelta(minutes=accessed),
+    ))
+    db.commit()
+    return path
+
+
+def test_budget_counts_variant_files(db, tmp_path):
+    manager = ActivityCacheManager(str(tmp_path))
+    # 主文件合计 300 B 未超出 500 B 预算，但加上派生副本后为 700 B
+    oldest = _entry(db, str(tmp_path), 1, 100, 30, [(COMPRESSED_SUFFIX, 100), (BINARY_SUFFIX, 100)])
+    middle = _entry(db, str(tmp_path), 2, 100, 20, [(COMPRESSED_SUFFIX, 100)])
+    newest = _entry(db, str(tmp_path), 3, 100, 10)
+
+    gc = ActivityCacheGC(manager, max_bytes=500, batch_size=10)
+    result = gc._collect_over_budget(db, 10)
+
+    assert result == {"entries": 1, "bytes": 300}
+    assert not any(os.path.exists(oldest + s) for s in ("", COMPRESSED_SUFFIX, BINARY_SUFFIX))
+    assert os.path.exists(middle + COMPRESSED_SUFFIX) and os.path.exists(newest)
+    assert gc.summary(db)["entry_bytes"] == 300
+
+
+def test_within_budget_keeps_entries(db, tmp_path):
+    manager = ActivityCacheManager(str(tmp_path))
+    _entry(db, str(tmp_path), 1, 100, 10, [(COMPRESSED_SUFFIX, 50)])
+    gc = ActivityCacheGC(manager, max_bytes=150, batch_size=10)
+    assert gc._collect_over_budget(db, 10) == {"entries": 0, "bytes": 0}
@@ -0,0 +1,67 @@
+"""降采样：各算法恰好返回 n 个点；每个通道按自身（或请求指定的）算法独立选点。"""
+
+import numpy as np
+import pytest
+
+from app.streams import downsample
+from app.streams.models import PYRAMID_LEVELS, Resolution, StreamData, resolution_points
+
+
+@pytest.mark.parametrize("algorithm", downsample.ALGORITHMS)
+@pytest.mark.parametrize("size,n", [(14441, 721), (14441, 720), (1000, 999), (17, 3), (17, 2), (17, 1)])
+def test_exactly_n_distinct_indices(algorithm, size, n):
+    rng = np.random.default_rng(size + n)
+    for values in (rng.normal(size=size), np.zeros(size), np.full(size, np.nan), np.arange(size, dtype=float)):
+        idx = downsample.downsample_indices(values.tolist(), n, algorithm)
+        assert idx.size == n
+        assert np.all(np.diff(idx) > 0)
+        assert idx[0] >= 0 and idx[-1] < size
+
+
+def test_minmax_keeps_peaks():
+    y = np.zeros(1000)
+    y[123], y[876] = 900.0, -50.0
+    idx = downsample.minmax_indices(y, 101)
+    assert 123 in idx and 876 in idx
+
+
+def _stream_data(size=5000):
+    rng = np.random.default_rng(0)
+    return StreamData(
+        timestamp=list(range(size)),
+        distance=np.cumsum(rng.uniform(5, 10, size)).tolist(),
+        power=rng.integers(0, 800, size).tolist(),
+        heart_rate=rng.integers(90, 190, size).tolist(),
+        altitude=(100 + np.cumsum(rng.normal(size=size))).astype(int).tolist(),
+        speed=rng.uniform(20, 40, size).tolist(),
+    )
+
+
+def _picked(stream_data, name, algorithm, points, window=None):
+    """按指定算法在（窗口内）单通道上直接降采样的结果。"""
+    data = getattr(stream_data, name)
+    if window is not None:
+        data = data[window[0]:window[1]]
+    return [data[i] for i in downsample.downsample_indices(data, points, algorithm)]
+
+
+def test_pyramid_uses_each_channel_default_algorithm():
+    stream_data = _stream_data()
+    stream_data.build_pyramid()
+    assert downsample.default_algorithm("power") == downsample.MINMAX
+    assert downsample.default_algorithm("altitude") == downsample.LTTB
+    for level in PYRAMID_LEVELS:
+        for name in ("power", "heart_rate", "altitude", "speed", "distance"):
+            points = resolution_points(level, 5000)
+            expected = _picked(stream_data, name, downsample.default_algorithm(name), points)
+            assert stream_data.get_stream(name, level).data == expected
+
+
+@pytest.mark.parametrize("algorithm", downsample.ALGORITHMS)
+def test_algorithm_applies_to_requested_channel(algorithm):
+    stream_data = _stream_data()
+    window = stream_data.window_indices(100, 3000)
+    for name in ("power", "altitude", "speed"):
+        data = stream_data.get_stream(name, Resolution.LOW, 721, algorithm, window).data
+        assert data == _picked(stream_data, name, algorithm, 721, window)
+        assert len(stream_data.get_stream(name, Resolution.LOW, 721, algorithm).data) == 721
@@ -0,0 +1,38 @@
+"""FIT 解析：衍生流按运动类型计算（坡度调整配速只用于跑步）。"""
+
+import os
+
+import pytest
+
+from app.streams.fit_parser import FitParser
+
+FIT_PATH = os.path.join(os.path.dirname(__file__), "fits", "1760622831991_20251016215351A007.fit")
+ATHLETE = {"ftp": 250, "wj": 20000}
+
+
+def _finalize(sport):
+    n = 120
+    zeros = [0.0] * n
+    return FitParser()._finalize_stream_data(
+        list(range(n)), zeros, zeros, [i * 3.0 for i in range(n)], [100.0 + i * 0.1 for i in range(n)],
+        [100 + i // 10 for i in range(n)], [3.0] * n, [10.8] * n, [200] * n, [150] * n, [85] * n,
+        zeros, zeros, zeros, zeros, zeros, zeros, ATHLETE, sport,
+    )
+
+
+@pytest.mark.parametrize("sport", ["cycling", None, "training"])
+def test_gap_skipped_for_non_running(sport):
+    stream_data = _finalize(sport)
+    assert stream_data.gap == []
+    assert len(stream_data.w_balance) == len(stream_data.vam) == 120
+
+
+def test_gap_computed_for_running():
+    assert len(_finalize("running").gap) == 120
+
+
+def test_running_fit_file_has_gap():
+    with open(FIT_PATH, "rb") as f:
+        stream_data = FitParser().parse_fit_file(f.read(), ATHLETE)
+    assert len(stream_data.gap) == len(stream_data.timestamp) > 0
+    assert "gap" in stream_data.get_available_streams()
@@ -0,0 +1,44 @@
+"""FTP 估算：近期窗口曲线覆盖不足时回退历史全局曲线。"""
+
+import numpy as np
+import pytest
+
+from app.core.analytics import ftp_estimator
+from app.repositories import activity_curve_repo, best_power_file_repo
+
+ALL_TIME = np.linspace(900, 250, 3600)
+
+
+def _curve(seconds, watts):
+    return np.linspace(watts * 3, watts, seconds)
+
+
+@pytest.fixture()
+def curves(monkeypatch):
+    recent = {}
+    monkeypatch.setattr(best_power_file_repo, "load_best_curve_array", lambda athlete_id, base_dir=None: ALL_TIME)
+    monkeypatch.setattr(
+        activity_curve_repo, "query_best_curve",
+        lambda athlete_id, start=None, end=None: (recent.get("curve"), recent.get("count", 0)),
+    )
+    return recent
+
+
+def test_sufficient_window_is_preferred(curves):
+    curves.update(curve=_curve(3600, 200), count=5)
+    estimate = ftp_estimator.estimate_ftp_from_best_curve(1, window_days=90)
+    assert estimate.notes.startswith("last 90d curve")
+    assert estimate.ftp < ftp_estimator.estimate_ftp_from_best_curve(1).ftp
+
+
+@pytest.mark.parametrize("seconds, count", [(600, 5), (3600, 1)])
+def test_partial_window_falls_back_to_all_time(curves, seconds, count):
+    curves.update(curve=_curve(seconds, 200), count=count)
+    estimate = ftp_estimator.estimate_ftp_from_best_curve(1, window_days=90)
+    assert estimate.notes.startswith("all-time curve (last 90d coverage insufficient)")
+    assert estimate.ftp == ftp_estimator.estimate_ftp_from_best_curve(1).ftp
+
+
+def test_no_window_uses_all_time(curves):
+    estimate = ftp_estimator.estimate_ftp_from_best_curve(1)
+    assert estimate.notes.startswith("all-time curve;")
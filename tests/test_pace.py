@@ -0,0 +1,119 @@
+"""
+跑步坡度/NGP/GAP：与改造前的逐点循环逐值比对（含停止时距离重复的平台）。
+
+legacy_* 为改造前实现的原样拷贝（GAP 为新增通道，参考实现按同一逐点坡度与调整因子构造），仅用于对照。
+"""
+
+import numpy as np
+import pytest
+
+from app.core.analytics.pace import (
+    calculate_grade_from_track,
+    calculate_normalized_graded_pace,
+    grade_adjusted_pace,
+)
+
+
+def legacy_grade_from_track(altitudes, distances, window_meters=30.0):
+    if not altitudes or not distances or len(altitudes) != len(distances):
+        return []
+    n = len(altitudes)
+    if n < 2:
+        return [0.0] * n
+    grades = []
+    for i in range(n):
+        target_dist = distances[i]
+        start_idx = i
+        end_idx = i
+        while start_idx > 0 and (target_dist - distances[start_idx]) < window_meters / 2:
+            start_idx -= 1
+        while end_idx < n - 1 and (distances[end_idx] - target_dist) < window_meters / 2:
+            end_idx += 1
+        if end_idx > start_idx:
+            delta_alt = altitudes[end_idx] - altitudes[start_idx]
+            delta_dist = distances[end_idx] - distances[start_idx]
+            grades.append((delta_alt / delta_dist) * 100.0 if delta_dist > 0 else 0.0)
+        else:
+            grades.append(0.0)
+    if len(grades) > 3:
+        smoothed = []
+        for i in range(len(grades)):
+            start = max(0, i - 1)
+            end = min(len(grades), i + 2)
+            smoothed.append(np.mean(grades[start:end]))
+        return smoothed
+    return grades
+
+
+def legacy_adjustment_factor(grade_pct):
+    g = np.clip(grade_pct, -15.0, 15.0) / 100.0
+    if g >= 0:
+        adj = 1.0 + 4.5 * g + 2.0 * (g ** 2)
+    else:
+        adj = 1.0 + 1.5 * g + 3.0 * (g ** 2)
+    return float(adj)
+
+
+def legacy_ngp(speeds, altitudes, distances, window_meters=30.0):
+    n = min(len(speeds), len(altitudes), len(distances))
+    if n < 2:
+        return None
+    grades = legacy_grade_from_track(list(altitudes[:n]), list(distances[:n]), window_meters)
+    if not grades:
+        return None
+    time_eq = sum(legacy_adjustment_factor(g) for g in grades)
+    total_distance = distances[n - 1] - distances[0]
+    if time_eq <= 0 or total_distance <= 0:
+        return None
+    return float(1000.0 / (total_distance / time_eq))
+
+
+def legacy_gap(speeds, altitudes, distances, window_meters=30.0, min_speed=0.5):
+    grades = legacy_grade_from_track(list(altitudes), list(distances), window_meters)
+    out = []
+    for v, g in zip(speeds, grades):
+        flat = v * legacy_adjustment_factor(g)
+        out.append(round(1000.0 / flat, 1) if v >= min_speed and flat > 0 else 0.0)
+    return out
+
+
+def track_with_stops(seed, seconds=1500):
+    """1 Hz 跑步轨迹：距离保留 1 位小数（与 FIT 记录一致），含若干原地停止（距离重复）的片段。"""
+    rng = np.random.default_rng(seed)
+    speed = np.clip(rng.normal(3.2, 0.6, seconds), 0.0, None)
+    for start in rng.choice(seconds - 60, 8, replace=False):
+        speed[start:start + rng.integers(3, 40)] = 0.0
+    distance = np.round(np.cumsum(speed), 1)
+    altitude = np.round(100 + np.cumsum(rng.normal(0, 0.4, seconds)), 1)
+    return speed.tolist(), altitude.tolist(), distance.tolist()
+
+
+def test_repeated_boundary_distance_matches_loop():
+    # 517.3 − 502.3 = 14.999999…，原循环越过两个 517.3 取到 518.6
+    distances = [487.0, 495.1, 502.3, 510.0, 517.3, 517.3, 518.6, 525.0]
+    altitudes = [10.0, 10.4, 10.9, 11.5, 12.0, 12.0, 12.1, 12.6]
+    assert calculate_grade_from_track(altitudes, distances) == legacy_grade_from_track(altitudes, distances)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_grade_matches_loop_on_tracks_with_stops(seed):
+    speed, altitude, distance = track_with_stops(seed)
+    assert calculate_grade_from_track(altitude, distance) == legacy_grade_from_track(altitude, distance)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("window", [10.0, 30.0, 55.5])
+def test_ngp_and_gap_match_loop(seed, window):
+    speed, altitude, distance = track_with_stops(seed, 900)
+    assert calculate_normalized_graded_pace(speed, altitude, distance, window) == pytest.approx(
+        legacy_ngp(speed, altitude, distance, window), rel=1e-12
+    )
+    assert grade_adjusted_pace(speed, altitude, distance, window) == legacy_gap(speed, altitude, distance, window)
+
+
+def test_short_and_invalid_tracks():
+    assert calculate_grade_from_track([], []) == []
+    assert calculate_grade_from_track([100.0], [0.0]) == [0.0]
+    assert calculate_grade_from_track([100.0, 101.0], [0.0]) == []
+    assert calculate_normalized_graded_pace([3.0], [100.0], [0.0]) is None
+    assert calculate_normalized_graded_pace([0.0, 0.0], [100.0, 100.0], [5.0, 5.0]) is None
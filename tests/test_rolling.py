@@ -0,0 +1,216 @@
+"""
+滑动窗口内核：与改造前的逐点实现逐值比对。
+
+legacy_* 为改造前代码的原样拷贝，仅用于对照（tests/bench_rolling.py 复用它们测量改造前耗时）。
+"""
+
+from collections import deque
+
+import numpy as np
+import pytest
+
+from app.core.analytics import rolling
+from app.core.analytics.context import AnalysisContext
+from app.core.analytics.hr import filter_hr_smooth, recovery_rate
+from app.core.analytics.interval_detection import _moving_average, _rolling_median
+from app.core.analytics.power import normalized_power, x_power
+from app.core.analytics.training import anaerobic_effect
+from app.streams.fit_parser import FitParser
+
+
+def legacy_normalized_power(powers, window=30):
+    if not powers:
+        return 0
+    q = deque()
+    s = 0.0
+    rolling_vals = []
+    for p in powers:
+        v = float(p or 0)
+        q.append(v)
+        s += v
+        if len(q) > window:
+            s -= q.popleft()
+        rolling_vals.append(s / len(q))
+    fourth_powers = [x ** 4 for x in rolling_vals]
+    return int(round((sum(fourth_powers) / len(fourth_powers)) ** 0.25))
+
+
+def legacy_anaerobic_effect(power_data, ftp):
+    n = len(power_data)
+    if n < 30:
+        return 0.0
+    window = 30
+    window_sum = sum(power_data[:window])
+    max_avg = window_sum / window
+    for i in range(1, n - window + 1):
+        window_sum = window_sum - power_data[i - 1] + power_data[i + window - 1]
+        avg = window_sum / window
+        if avg > max_avg:
+            max_avg = avg
+    anaerobic_capacity = sum(max(0, p - ftp) for p in power_data if p is not None) / 1000.0
+    return round(min(4.0, 0.1 * (max_avg / ftp) + 0.05 * anaerobic_capacity), 1)
+
+
+def legacy_max_drop(valid, window=60):
+    max_drop = 0
+    for i in range(len(valid) - window):
+        drop = valid[i] - valid[i + window]
+        if drop > max_drop:
+            max_drop = drop
+    return int(max_drop) if max_drop > 0 else 0
+
+
+def legacy_best_curve(powers, limit=3600):
+    max_duration = min(len(powers), limit)
+    prefix = np.concatenate(([0.0], powers.cumsum()))
+    best = np.zeros(max_duration, dtype=np.int32)
+    for window in range(1, max_duration + 1):
+        best[window - 1] = int(round((prefix[window:] - prefix[:-window]).max() / window))
+    return best.tolist()
+
+
+def legacy_moving_average(series, window):
+    if window <= 1 or series.size < window:
+        return series.astype(float)
+    pad_left = window // 2
+    padded = np.pad(series, (pad_left, window - 1 - pad_left), mode="edge")
+    return np.convolve(padded, np.ones(window, dtype=float) / window, mode="valid")
+
+
+def legacy_rolling_median(series, window):
+    half = window // 2
+    padded = np.pad(series, (half, half), mode="edge")
+    return np.array([float(np.median(padded[i:i + window])) for i in range(series.size)])
+
+
+def legacy_ewma(values, span):
+    out, y = [], 0.0
+    for v in values:
+        y += (v - y) / span
+        out.append(y)
+    return np.array(out)
+
+
+def loop_time_window(timestamps, values, window):
+    """逐点参考：(t − window, t] 内样本的和与个数。"""
+    sums, counts = [], []
+    for t in timestamps:
+        inside = [v for s, v in zip(timestamps, values) if t - window < s <= t]
+        sums.append(float(sum(inside)))
+        counts.append(len(inside))
+    return np.array(sums), np.array(counts)
+
+
+def gappy_timestamps(seconds, seed):
+    """1 Hz 记录中插入若干暂停（5–600 s 缺口）的时间戳。"""
+    rng = np.random.default_rng(seed)
+    steps = np.ones(seconds, dtype=int)
+    steps[rng.choice(seconds, 6, replace=False)] = rng.integers(5, 600, 6)
+    steps[0] = 0
+    return np.cumsum(steps)
+
+
+def synthetic(seconds, seed):
+    """分段随机功率（含 0 W 与冲刺）与随机游走心率，整数 1 Hz 序列。"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.choice([0, 120, 180, 230, 260, 320, 450, 800], seconds // 20 + 1)
+    power = np.clip(np.repeat(blocks, 20)[:seconds] + rng.normal(0, 30, seconds), 0, 1600).round().astype(int)
+    hr = np.clip(120 + np.cumsum(rng.normal(0, 0.8, seconds)), 60, 200).round().astype(int)
+    return power, hr
+
+
+SEEDS = range(10)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_power_peaks_match_legacy(seed):
+    power, _ = synthetic(3600, seed)
+    p_list = power.tolist()
+    assert normalized_power(p_list) == legacy_normalized_power(p_list)
+    assert anaerobic_effect(p_list, 250) == legacy_anaerobic_effect(p_list, 250)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_recovery_rate_matches_legacy(seed):
+    h_list = synthetic(3600, seed)[1].tolist()
+    assert recovery_rate(h_list) == legacy_max_drop(filter_hr_smooth(h_list))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_window_kernels_match_legacy(seed):
+    f = synthetic(3600, seed)[0].astype(float)
+    assert np.allclose(_moving_average(f, 31), legacy_moving_average(f, 31), rtol=0, atol=1e-9)
+    windows = np.lib.stride_tricks.sliding_window_view(f, 30)
+    assert np.array_equal(rolling.rolling_max(f, 30), windows.max(axis=1))
+    assert np.array_equal(rolling.rolling_min(f, 30), windows.min(axis=1))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_best_curve_and_median_match_legacy(seed):
+    f = synthetic(3600, seed)[0].astype(float)
+    assert FitParser()._calculate_best_power_curve(f) == legacy_best_curve(f)
+    assert np.array_equal(_rolling_median(f, 151), legacy_rolling_median(f, 151))
+
+
+def test_moving_average_propagates_nan():
+    f = synthetic(600, 0)[0].astype(float)
+    f[100] = np.nan
+    assert np.array_equal(np.isnan(_moving_average(f, 31)), np.isnan(legacy_moving_average(f, 31)))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_ewma_matches_loop(seed):
+    f = synthetic(5000, seed)[0].astype(float)
+    for span in (1.0, 7.0, 25.0, 300.0):
+        np.testing.assert_allclose(rolling.ewma(f, span), legacy_ewma(f, span), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_time_rolling_matches_loop(seed):
+    power = synthetic(800, seed)[0]
+    t = gappy_timestamps(800, seed)
+    sums, counts = loop_time_window(t.tolist(), power.tolist(), 30)
+    assert np.array_equal(rolling.time_rolling_sum(t, power, 30), sums)
+    np.testing.assert_allclose(rolling.time_rolling_mean(t, power, 30), sums / counts, rtol=0, atol=1e-9)
+
+
+def test_fill_gaps_expands_to_1hz_grid():
+    grid, values = rolling.fill_gaps([10, 11, 14, 14.4, 16], [1, 2, 3, 4, 5], fill=-1)
+    assert grid.tolist() == list(range(10, 17))
+    assert values.tolist() == [1, 2, -1, -1, 4, -1, 5]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_x_power_matches_loop(seed):
+    p_list = synthetic(3600, seed)[0].tolist()
+    expected = int(round(float(np.mean(legacy_ewma(p_list, 25.0) ** 4)) ** 0.25))
+    assert x_power(p_list) == expected
+    assert x_power(p_list, timestamps=np.arange(3600) + 42) == expected
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_time_aware_peaks_over_recording_gaps(seed):
+    power = synthetic(3600, seed)[0]
+    t = gappy_timestamps(3600, seed)
+    p_list = power.tolist()
+    assert normalized_power(p_list, timestamps=np.arange(3600)) == normalized_power(p_list)
+
+    sums, counts = loop_time_window(t.tolist(), p_list, 30)
+    assert normalized_power(p_list, timestamps=t) == int(round(float(np.mean((sums / counts) ** 4)) ** 0.25))
+
+    # xPower：EWMA 在 0 W 填充的 1 Hz 网格上跨缺口衰减，只对记录样本取四次方均值
+    grid = np.zeros(t[-1] + 1)
+    grid[t] = power
+    smoothed = legacy_ewma(grid, 25.0)[t]
+    assert x_power(p_list, timestamps=t) == int(round(float(np.mean(smoothed ** 4)) ** 0.25))
+
+
+def test_context_x_power_uses_timestamps():
+    power = synthetic(1200, 1)[0].tolist()
+    t = gappy_timestamps(1200, 1).tolist()
+    context = AnalysisContext.from_stream_data({"power": power, "timestamp": t})
+    assert context.x_power == x_power(power, timestamps=t)
+    strava = AnalysisContext.from_strava({"watts": {"data": power}, "time": {"data": t}})
+    assert strava.x_power == context.x_power
+    # 时间戳长度不一致时按等间隔处理
+    assert AnalysisContext.from_stream_data({"power": power, "timestamp": t[:-1]}).x_power == x_power(power)
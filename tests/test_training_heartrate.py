@@ -0,0 +1,137 @@
+"""
+心率训练效果：去掉 pandas 后与原实现逐值一致。
+
+legacy_* 为改造前实现的逐点拷贝（pandas 滚动平均以循环参考实现代替），仅用于对照。
+"""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from app.core.analytics.training_heartrate import (
+    aerobic_effect,
+    anaerobic_effect,
+    compute_training_effect,
+    detect_intervals,
+    preprocess_hr,
+    training_focus,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_rolling_mean(values, window):
+    """pandas Series.rolling(window, min_periods=1, center=True).mean()：窗口 [i − w//2, i + (w−1)//2]。"""
+    n = len(values)
+    out = np.full(n, np.nan)
+    for i in range(n):
+        chunk = values[max(0, i - window // 2):min(n, i + (window - 1) // 2 + 1)]
+        chunk = chunk[~np.isnan(chunk)]
+        if chunk.size:
+            out[i] = chunk.mean()
+    return out
+
+
+def legacy_preprocess_hr(hr, smooth_win=5):
+    return legacy_rolling_mean(np.clip(np.asarray(hr, dtype=float), 40, 240), smooth_win)
+
+
+def legacy_detect_intervals(hr, hr_max, fthr=None, s_threshold=0.90, min_len=10.0, max_len=120.0, dt=1.0):
+    s = np.clip(hr / hr_max, 0.0, 1.0)
+    s_thr = max(fthr / hr_max, 0.88) if fthr else s_threshold
+    mask = (s >= s_thr).astype(int)
+    idx = np.where(np.diff(np.r_[0, mask, 0]) != 0)[0]
+    segments = [(idx[i], idx[i + 1]) for i in range(0, len(idx), 2)]
+    return [(a, b) for a, b in segments if min_len <= (b - a) * dt <= max_len], s
+
+
+def legacy_anaerobic_effect(hr, hr_max, fthr, dt=1.0):
+    segments, s = legacy_detect_intervals(hr, hr_max, fthr, dt=dt)
+    if not segments:
+        return 0.0, 0.0, []
+    s_ftp = fthr / hr_max
+    a_total = 0.0
+    for start, end in segments:
+        u_i = max(0.0, (np.median(s[start:end]) - s_ftp) / (1.0 - s_ftp))
+        if end > start + 1:
+            r_i = np.clip(np.percentile(np.diff(hr[start:end]), 80) / 10.0, 0.0, 1.0)
+        else:
+            r_i = 0.0
+        a_total += (end - start) * dt * (u_i ** 2.0) * (1.0 + 0.5 * r_i)
+    intervals = []
+    for i in range(len(segments) - 1):
+        work_len = (segments[i][1] - segments[i][0]) * dt
+        rest_len = (segments[i + 1][0] - segments[i][1]) * dt
+        intervals.append(rest_len / work_len if work_len > 0 else 0)
+    R = np.mean(intervals) if intervals else 0
+    A = (1.0 + 0.3 * max(0.0, 1.5 - R)) * a_total
+    return min(5.0, 5.0 * (1.0 - np.exp(-A / 12.0))), A, segments
+
+
+def legacy_compute_training_effect(hr_series, hr_max, fthr=None, dt=1.0):
+    hr = legacy_preprocess_hr(hr_series)
+    te_aero, hr_tss, trimp = aerobic_effect(hr, hr_max, fthr or hr_max * 0.90, dt)
+    te_ana, ana_load, segments = legacy_anaerobic_effect(hr, hr_max, fthr or hr_max * 0.90, dt)
+    return {
+        "TE_Aerobic": round(te_aero, 2),
+        "TE_Anaerobic": round(te_ana, 2),
+        "Training_Focus": training_focus(te_aero, te_ana, len(hr) * dt / 60.0),
+        "hrTSS_like": round(hr_tss, 1),
+        "TRIMP": round(trimp, 1),
+        "Ana_Load": round(ana_load, 2),
+        "HI_segments": [(int(a), int(b)) for a, b in segments],
+    }
+
+
+def interval_session(seed, minutes=60):
+    """热身 + 随机间歇（20–150 s 高强度 / 30–180 s 恢复）的 1 Hz 心率，含噪声。"""
+    rng = np.random.default_rng(seed)
+    hr = list(rng.normal(130, 4, 600))
+    while len(hr) < minutes * 60:
+        hr += list(rng.normal(rng.uniform(168, 188), 3, int(rng.integers(20, 150))))
+        hr += list(rng.normal(rng.uniform(120, 150), 4, int(rng.integers(30, 180))))
+    return np.round(hr).tolist()
+
+
+def test_import_app_does_not_load_pandas():
+    code = "import sys, app.main; sys.exit(1 if 'pandas' in sys.modules else 0)"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    assert subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env).returncode == 0
+
+
+@pytest.mark.parametrize("window", [1, 2, 4, 5, 10, 15])
+def test_preprocess_hr_matches_pandas_semantics(window):
+    rng = np.random.default_rng(window)
+    for _ in range(20):
+        hr = rng.normal(150, 30, int(rng.integers(1, 400)))
+        hr[rng.random(hr.size) < 0.05] = np.nan
+        np.testing.assert_allclose(preprocess_hr(hr, window), legacy_preprocess_hr(hr, window), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("window", [2, 4, 5, 10])
+def test_preprocess_hr_matches_pandas(window):
+    pd = pytest.importorskip("pandas")
+    hr = np.random.default_rng(0).normal(150, 30, 300)
+    hr[::17] = np.nan
+    expected = pd.Series(np.clip(hr, 40, 240)).rolling(window=window, min_periods=1, center=True).mean().values
+    np.testing.assert_allclose(preprocess_hr(hr, window), expected, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_compute_training_effect_matches_legacy(seed):
+    hr_series = interval_session(seed)
+    for fthr in (None, 170):
+        assert compute_training_effect(hr_series, 195, fthr) == legacy_compute_training_effect(hr_series, 195, fthr)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_detect_intervals_matches_legacy(seed):
+    hr = legacy_preprocess_hr(interval_session(seed))
+    segments, s = detect_intervals(hr, 195, 170)
+    legacy_segments, legacy_s = legacy_detect_intervals(hr, 195, 170)
+    assert segments == [(int(a), int(b)) for a, b in legacy_segments]
+    assert np.array_equal(s, legacy_s)
+    assert anaerobic_effect(hr, 195, 170)[:2] == legacy_anaerobic_effect(hr, 195, 170)[:2]
@@ -0,0 +1,74 @@
+"""工作单元：附属写入失败只回滚自身保存点，核心写入照常提交。"""
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, event
+from sqlalchemy.orm import Session, declarative_base
+
+from app.db.unit_of_work import ancillary_write, commit_or_flush, unit_of_work
+
+Base = declarative_base()
+
+
+class Core(Base):
+    __tablename__ = "core"
+    id = Column(Integer, primary_key=True)
+
+
+class Ancillary(Base):
+    __tablename__ = "ancillary"
+    id = Column(Integer, primary_key=True)
+    key = Column(String(10), unique=True)
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://")
+
+    # pysqlite 默认自行管理事务，需交给 SQLAlchemy 才能正确使用 SAVEPOINT
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, _record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    session.add(Ancillary(id=1, key="taken"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_failed_ancillary_write_keeps_core_writes(db):
+    with unit_of_work(db, "test") as uow:
+        db.add(Core(id=1))
+        commit_or_flush(db)
+        with pytest.raises(Exception):
+            with ancillary_write(db, "duplicate"):
+                db.add(Ancillary(id=2, key="taken"))
+                commit_or_flush(db)
+        with pytest.raises(OSError):
+            with ancillary_write(db, "disk"):
+                db.add(Ancillary(id=3, key="disk"))
+                commit_or_flush(db)
+                raise OSError("disk full")
+        with ancillary_write(db, "ok"):
+            db.add(Ancillary(id=4, key="ok"))
+            commit_or_flush(db)
+        db.add(Core(id=2))
+        commit_or_flush(db)
+
+    assert not uow.failed
+    assert uow.ancillary_failures == 2
+    assert sorted(r.id for r in db.query(Core)) == [1, 2]
+    assert sorted(r.id for r in db.query(Ancillary)) == [1, 4]
+
+
+def test_ancillary_write_outside_unit_of_work_rolls_back(db):
+    with pytest.raises(Exception):
+        with ancillary_write(db, "duplicate"):
+            db.add(Ancillary(id=2, key="taken"))
+            commit_or_flush(db)
+    assert sorted(r.id for r in db.query(Ancillary)) == [1]
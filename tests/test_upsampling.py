@@ -0,0 +1,32 @@
+"""Strava 低精度流补齐：按真实时间轴展开，不修改传入的原始流字典。"""
+
+import copy
+
+from app.analyzers.strava.upsampling import upsample_low_resolution
+
+
+def _payload():
+    return {
+        'time': {'data': list(range(0, 600, 10)), 'series_type': 'time'},
+        'watts': {'data': [200 + i for i in range(60)], 'series_type': 'time'},
+        'altitude': {'data': [float(i) for i in range(60)], 'series_type': 'time'},
+        'latlng': {'data': [[30.0, 120.0 + i * 1e-4] for i in range(60)], 'series_type': 'time'},
+    }
+
+
+def test_returns_new_dict_without_mutating_input():
+    raw = _payload()
+    before = copy.deepcopy(raw)
+    result = upsample_low_resolution(raw, 600)
+    assert raw == before
+    assert result is not raw
+    assert upsample_low_resolution(raw, 600) == result
+
+
+def test_channels_follow_time_grid():
+    result = upsample_low_resolution(_payload(), 600)
+    assert result['time']['data'] == list(range(591))
+    assert result['time']['original_size'] == 60
+    assert result['watts']['data'][:11] == [200] * 10 + [201]
+    assert result['altitude']['data'][:3] == [0.0, 0.1, 0.2]
+    assert result['latlng']['data'][4:6] == [[30.0, 120.0], [30.0, 120.0001]]
@@ -0,0 +1,94 @@
+"""W′bal 引擎：与逐点循环参考实现逐值比对。"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.core.analytics import wbal
+from app.core.analytics.wbal import (
+    TAU_DIFFERENTIAL,
+    TAU_FIXED,
+    TAU_SKIBA,
+    skiba_tau,
+    tau_model_for,
+    w_balance,
+    w_balance_differential,
+    w_balance_integral,
+    w_balance_stream,
+)
+
+CP = 250
+W_PRIME = 20000
+
+
+def _legacy_stream(powers, cp, w_prime):
+    """原 FitParser._calculate_w_balance 的逐点循环（τ 固定 546 s，kJ 保留 1 位小数）。"""
+    balance = w_prime
+    out = []
+    for p in powers:
+        if p > cp * 1.05:
+            balance -= p - cp
+        elif p < cp * 0.95:
+            balance += (w_prime - balance) / 546.0
+        balance = max(0.0, min(w_prime, balance))
+        out.append(round(balance / 1000, 1))
+    return out
+
+
+def _ride(seed, n):
+    rng = np.random.default_rng(seed)
+    return np.clip(rng.normal(230, 120, n), 0, None).astype(int).tolist()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_stream_matches_legacy_loop(seed):
+    powers = _ride(seed, 100_000)
+    assert w_balance_stream(powers, CP, W_PRIME, TAU_FIXED, "differential") == _legacy_stream(powers, CP, W_PRIME)
+
+
+def test_stream_without_thresholds_is_zero():
+    assert w_balance_stream([300, None, 100], None, W_PRIME) == [0.0, 0.0, 0.0]
+    assert w_balance_stream([300, 100], CP, 0) == [0.0, 0.0]
+
+
+def test_differential_tau_matches_loop():
+    powers = np.asarray(_ride(3, 5000), dtype=float)
+    balance = float(W_PRIME)
+    expected = []
+    for p in powers:
+        if p > CP * 1.05:
+            balance = max(0.0, balance - (p - CP))
+        elif p < CP * 0.95:
+            balance = W_PRIME - (W_PRIME - balance) * math.exp(-(CP - p) / W_PRIME)
+        expected.append(balance)
+    np.testing.assert_allclose(w_balance_differential(powers, CP, W_PRIME, TAU_DIFFERENTIAL), expected, atol=1e-6)
+
+
+def test_integral_matches_direct_sum():
+    powers = np.asarray(_ride(4, 2000), dtype=float)
+    tau = skiba_tau(powers, CP)
+    expend = np.maximum(powers - CP, 0.0)
+    t = np.arange(powers.size)
+    expected = [
+        min(W_PRIME, max(0.0, W_PRIME - float((expend[: i + 1] * np.exp(-(i - t[: i + 1]) / tau)).sum())))
+        for i in range(powers.size)
+    ]
+    np.testing.assert_allclose(w_balance_integral(powers, CP, W_PRIME), expected, atol=1e-6)
+
+
+@pytest.mark.parametrize("configured", ["bogus", ""])
+def test_invalid_configured_tau_model_falls_back_to_fixed(monkeypatch, configured):
+    monkeypatch.setattr(wbal, "WBAL_TAU_MODEL", configured)
+    powers = _ride(5, 3000)
+    fixed = w_balance(powers, CP, W_PRIME, tau_model=TAU_FIXED)
+    assert tau_model_for(None) == TAU_FIXED
+    assert np.array_equal(w_balance(powers, CP, W_PRIME), fixed)
+    assert np.array_equal(w_balance(powers, CP, W_PRIME, tau_model="unknown"), fixed)
+    assert not np.array_equal(w_balance(powers, CP, W_PRIME, tau_model=TAU_SKIBA), fixed)
+
+
+def test_configured_tau_model_is_default(monkeypatch):
+    monkeypatch.setattr(wbal, "WBAL_TAU_MODEL", TAU_SKIBA)
+    powers = _ride(6, 3000)
+    assert np.array_equal(w_balance(powers, CP, W_PRIME), w_balance(powers, CP, W_PRIME, tau_model=TAU_SKIBA))